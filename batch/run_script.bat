@@ -7,7 +7,6 @@ set "ENV_NAME=base"
 set "SCRIPTS_DIR=M:\ML\ChatGPT\gennote\batch\scripts"
 set "LOGS_DIR=M:\ML\ChatGPT\gennote\batch\batch_logs"
 set "PYTHON_EXE=%CONDA_PATH%\python.exe"
-set "MAX_LOGS=30"
 
 REM ========== 事前チェック ==========
 if not exist "%CONDA_PATH%" (
@@ -29,11 +28,6 @@ if not exist "%LOGS_DIR%\" (
     )
 )
 
-REM 古いログ削除（最新30件を保持）
-for /f "skip=%MAX_LOGS% eol=: delims=" %%F in ('dir /b /o-d "%LOGS_DIR%\*.log"') do (
-    del "%LOGS_DIR%\%%F"
-)
-
 REM ========== Conda環境設定 ==========
 call "%CONDA_PATH%\condabin\conda.bat" activate %ENV_NAME%
 if errorlevel 1 (
@@ -42,23 +36,15 @@ if errorlevel 1 (
 )
 
 REM ========== スクリプト実行 ==========
-set "timestamp=%date:/=-%_%time::=-%"
-set "log=%LOGS_DIR%\%timestamp:.=%.log"
+REM 本日対象のジョブを締切順に並列実行（休場日の市場ジョブはスキップ/劣化実行、ログはjob_runner.pyと同じ）
+"%PYTHON_EXE%" "%SCRIPTS_DIR%\scheduler.py" once
+set "RESULT=%errorlevel%"
 
-for %%f in ("%SCRIPTS_DIR%\search_*.py") do (
-    echo [%time%] START: %%~nxf >> "%log%"
-    
-    "%PYTHON_EXE%" "%%f" >> "%log%" 2>&1
-    
-    if errorlevel 1 (
-        echo [ERROR] FAILED: %%~nxf >> "%log%"
-    ) else (
-        echo [SUCCESS] COMPLETED: %%~nxf >> "%log%"
-    )
-)
+REM 投稿キューをはてなブログへ投稿（失敗したエントリはキューに残り次回再試行）
+"%PYTHON_EXE%" "%SCRIPTS_DIR%\publish_worker.py"
+if errorlevel 1 set "RESULT=1"
 
 REM ========== 後処理 ==========
 call "%CONDA_PATH%\condabin\conda.bat" deactivate
-echo All processes completed. Log: %log%
 
-endlocal
+endlocal & exit /b %RESULT%
@@ -0,0 +1,72 @@
+# bench_dossier_modes.py
+# カテゴリ毎の検索と複合プロンプト（複数カテゴリを1回で検索）の比較
+#
+# 同じ銘柄について、グループ内のカテゴリを個別に並行検索した場合と、複合プロンプト1回で
+# まとめて検索した場合の所要時間・リクエスト数・トークン数・充足率（null以外の値の割合）を比較する。
+# 実際にPerplexity APIを呼び出す（応答キャッシュは使わない）。結果を見て
+# stock_search_and_post.CATEGORY_GROUPS のグループ分けを決める。
+#
+# 例: python bench_dossier_modes.py 7203 トヨタ自動車 \
+#         --group basic_info,business_info,management_strategy --group financial_info,analyst_evaluation
+
+import time
+import argparse
+
+from telemetry import get_telemetry
+from composite_prompt import completeness
+from stock_search_and_post import StockSearcherPosterFull, CATEGORIES_TO_SEARCH
+
+
+def measure(searcher, label, fetch):
+    """fetch() の所要時間とAPI呼び出しの集計を返す（集計は検索クラス名をlabelにして分ける）"""
+    searcher.job_name = label
+    start = time.perf_counter()
+    data = fetch() or {}
+    elapsed = time.perf_counter() - start
+    return elapsed, get_telemetry().totals(label), data
+
+
+def per_category(searcher, stock_name, ticker_code, group):
+    results = searcher.search_many([
+        lambda category=category: searcher.search_detailed_info_by_category(stock_name, ticker_code, category)
+        for category in group
+    ], max_workers=len(group))
+    return {category: result for category, result in zip(group, results)
+            if result and not isinstance(result, Exception)}
+
+
+def report(group, results):
+    print(f"\nグループ: {'+'.join(group)}")
+    print(f"{'方式':<8}{'時間(秒)':>10}{'リクエスト':>8}{'入力トークン':>10}{'出力トークン':>10}{'充足率':>8}  欠損")
+    for mode, (elapsed, totals, data) in results.items():
+        ratio = sum(completeness(data.get(category)) for category in group) / len(group)
+        missing = ', '.join(category for category in group if category not in data) or '-'
+        print(f"{mode:<8}{elapsed:>12.1f}{totals['requests']:>12}{totals['prompt_tokens']:>14}"
+              f"{totals['completion_tokens']:>14}{ratio:>10.1%}  {missing}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ドシエ検索方式（カテゴリ毎/複合）の比較')
+    parser.add_argument('ticker_code')
+    parser.add_argument('stock_name')
+    parser.add_argument('--group', action='append', help='カンマ区切りのカテゴリ（複数指定可、省略時は全カテゴリで1グループ）')
+    args = parser.parse_args(argv)
+
+    groups = [group.split(',') for group in args.group] if args.group else [list(CATEGORIES_TO_SEARCH)]
+    searcher = StockSearcherPosterFull()
+    # 2回目以降の実行でもキャッシュ応答を使わない
+    searcher.cache_ttl = 0
+    searcher.estimated_calls = sum(len(group) + 1 for group in groups)
+    for index, group in enumerate(groups):
+        results = {
+            'カテゴリ毎': measure(searcher, f"DossierBench{index}PerCategory",
+                              lambda: per_category(searcher, args.stock_name, args.ticker_code, group)),
+            '複合': measure(searcher, f"DossierBench{index}Composite",
+                          lambda: searcher.search_detailed_info_by_categories(
+                              args.stock_name, args.ticker_code, group, fallback=False)),
+        }
+        report(group, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# bench_http_session.py
+# 共有セッション(keep-alive)と都度requests.postのハンドシェイクコスト比較
+#
+# ローカルにTLSサーバーを立ててPerplexity APIの代わりとし、
+# 同じ件数のPOSTを「毎回新規接続」と「SearchBase共有セッション」で送って比較する。
+# 自己署名証明書の生成に openssl コマンドを使用する。
+
+import os
+import ssl
+import json
+import time
+import tempfile
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from search_base import SearchBase
+
+REQUEST_COUNT = 50
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        body = json.dumps({'choices': [{'message': {'content': 'ok'}}]}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create_certificate(directory):
+    """localhost用の自己署名証明書を生成"""
+    cert_file = os.path.join(directory, 'cert.pem')
+    key_file = os.path.join(directory, 'key.pem')
+    subprocess.run([
+        'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+        '-keyout', key_file, '-out', cert_file, '-days', '1',
+        '-subj', '/CN=localhost', '-addext', 'subjectAltName=DNS:localhost'
+    ], check=True, capture_output=True)
+    return cert_file, key_file
+
+
+def start_server(cert_file, key_file):
+    """TLSスタブサーバーを別スレッドで起動"""
+    server = ThreadingHTTPServer(('localhost', 0), StubHandler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_file, key_file)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(post, url, cert_file):
+    payload = {'model': 'stub', 'messages': [{'role': 'user', 'content': 'ping'}]}
+    start = time.perf_counter()
+    for _ in range(REQUEST_COUNT):
+        response = post(url, json=payload, verify=cert_file, timeout=10)
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        cert_file, key_file = create_certificate(directory)
+        server = start_server(cert_file, key_file)
+        url = f'https://localhost:{server.server_address[1]}/chat/completions'
+        try:
+            fresh = measure(requests.post, url, cert_file)
+            pooled = measure(SearchBase.get_session().post, url, cert_file)
+        finally:
+            server.shutdown()
+
+    print(f"リクエスト数: {REQUEST_COUNT}")
+    print(f"都度接続    : {fresh:.3f}秒 ({fresh / REQUEST_COUNT * 1000:.1f}ms/件)")
+    print(f"共有セッション: {pooled:.3f}秒 ({pooled / REQUEST_COUNT * 1000:.1f}ms/件)")
+    print(f"短縮率      : {(1 - pooled / fresh) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# bench_json_extract.py
+# LLM応答からのJSON抽出: 従来の貪欲な正規表現（\{.*\} + json.loads）と json_extract の比較
+#
+# test/output・test/gemini_output の保存済み出力をコーパスとし、次の形の応答を作って
+# 正しく抽出できた件数と所要時間を比べる。
+#   そのまま        : 保存済みファイルの内容
+#   think+コードブロック: <think>内の下書きJSON + 説明文 + ```json本体``` + 引用番号
+#   説明文の括弧     : 本体の前後に {注記} を含む説明文
+# 最後に途中で切れた応答（閉じない括弧が続く）の長さを変えて所要時間の伸び方を比べる。
+
+import os
+import re
+import json
+import time
+
+from json_extract import extract_json
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+CORPUS_DIRS = [os.path.join(BASE_DIR, 'test', 'output'), os.path.join(BASE_DIR, 'test', 'gemini_output')]
+REPEAT = 20
+TRUNCATED_SIZES = (1000, 2000, 4000, 8000)
+
+
+def legacy_extract(text):
+    """従来の stock_search_and_post._call_perplexity_api と同じ抽出"""
+    match = re.search(r'\{.*\}', text, re.DOTALL)
+    if not match:
+        return None
+    try:
+        return json.loads(match.group(0))
+    except ValueError:
+        return None
+
+
+def load_corpus():
+    """(ファイル名, 内容, 期待するJSON) の一覧（JSON以外のファイルは期待値None）"""
+    corpus = []
+    for directory in CORPUS_DIRS:
+        for name in sorted(os.listdir(directory)):
+            with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+                text = f.read()
+            corpus.append((name, text, json.loads(text) if name.endswith('.json') else None))
+    return corpus
+
+
+def variants(text, expected):
+    yield 'そのまま', text, expected
+    if expected is None:
+        return
+    body = json.dumps(expected, ensure_ascii=False, indent=2)
+    yield 'think+コードブロック', (
+        '<think>\nまず {"法人名": "下書き"} の形で整理する。\n</think>\n'
+        f'調査結果は以下のとおりです。\n```json\n{body}\n```\n出典: [1][2]'
+    ), expected
+    yield '説明文の括弧', f'結果{{注記: 単位は百万円}}を示します。\n{body}\n以上{{終}}', expected
+
+
+def measure(extract, text):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        value = extract(text)
+    return value, (time.perf_counter() - start) / REPEAT
+
+
+def main():
+    corpus = load_corpus()
+    totals = {}
+    for name, text, expected in corpus:
+        for variant, response, answer in variants(text, expected):
+            row = totals.setdefault(variant, {'count': 0, 'legacy': [0, 0.0], 'new': [0, 0.0]})
+            row['count'] += 1
+            for method, extract in (('legacy', legacy_extract), ('new', extract_json)):
+                value, elapsed = measure(extract, response)
+                row[method][0] += value == answer
+                row[method][1] += elapsed
+
+    print(f"コーパス: {len(corpus)}ファイル ({', '.join(CORPUS_DIRS)})")
+    print(f"{'応答の形':<16}{'件数':>4}{'従来 正解':>10}{'従来 ms':>10}{'新 正解':>10}{'新 ms':>10}")
+    for variant, row in totals.items():
+        print(f"{variant:<16}{row['count']:>6}{row['legacy'][0]:>12}{row['legacy'][1] * 1000:>12.3f}"
+              f"{row['new'][0]:>12}{row['new'][1] * 1000:>12.3f}")
+
+    print("\n途中で切れた応答（閉じない括弧が続く）")
+    print(f"{'繰り返し':>8}{'文字数':>10}{'従来 ms':>12}{'新 ms':>12}")
+    for size in TRUNCATED_SIZES:
+        response = '<think>確認中</think>\n{"企業データ": [' + '{"項目": "値", ' * size
+        _, legacy = measure(legacy_extract, response)
+        _, new = measure(extract_json, response)
+        print(f"{size:>10}{len(response):>12}{legacy * 1000:>12.2f}{new * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# budget.py
+import os
+import time
+import sqlite3
+
+ALLOW = 'allow'
+DEGRADE = 'degrade'
+DEFER = 'defer'
+
+
+class BudgetManager:
+    """実行(run)単位のトークン・コスト・実行時間の予算管理
+
+    状態はSQLiteに保存し、同じrun_idを使う全プロセスで共有する。
+    各ジョブは最初のAPI呼び出し前に admit() で入場判定を受ける。
+    残り予算の割合が優先度毎の reserve を下回る場合、低優先度のジョブから
+    degrade（安価なモデルへ切替）→ defer（後回し）の順に制限する。
+    入場済みのジョブは途中で止めない。
+    """
+
+    def __init__(self, db_path, run_id, token_budget, cost_budget, time_budget,
+                 prices=None, reserve=None, default_reserve=0.0):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        self.run_id = run_id
+        self.token_budget = token_budget
+        self.cost_budget = cost_budget
+        self.time_budget = time_budget
+        self.prices = prices or {}
+        self.reserve = reserve or {}
+        self.default_reserve = default_reserve
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                "run_id TEXT PRIMARY KEY, started REAL NOT NULL, prompt_tokens INTEGER NOT NULL, "
+                "completion_tokens INTEGER NOT NULL, cost REAL NOT NULL, requests INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS admissions ("
+                "run_id TEXT NOT NULL, job TEXT NOT NULL, priority INTEGER NOT NULL, "
+                "decision TEXT NOT NULL, remaining REAL NOT NULL, created REAL NOT NULL)"
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO runs VALUES (?, ?, 0, 0, 0.0, 0)", (run_id, time.time())
+            )
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def cost_of(self, model, prompt_tokens, completion_tokens, requests=1):
+        """モデル毎の単価（100万トークンあたり・1リクエストあたり）から費用を計算"""
+        price = self.prices.get(model, {})
+        return (
+            (prompt_tokens or 0) * price.get('input', 0.0) / 1_000_000
+            + (completion_tokens or 0) * price.get('output', 0.0) / 1_000_000
+            + requests * price.get('request', 0.0)
+        )
+
+    def usage(self):
+        conn = self._connect()
+        try:
+            started, prompt_tokens, completion_tokens, cost, requests = conn.execute(
+                "SELECT started, prompt_tokens, completion_tokens, cost, requests FROM runs WHERE run_id = ?",
+                (self.run_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+        return {
+            'elapsed': time.time() - started,
+            'tokens': prompt_tokens + completion_tokens,
+            'cost': cost,
+            'requests': requests
+        }
+
+    def remaining_ratio(self, estimated_tokens=0, estimated_cost=0.0):
+        """トークン・費用・時間のうち最も逼迫している残り割合（見積り分を差し引く）"""
+        usage = self.usage()
+        ratios = []
+        if self.token_budget:
+            ratios.append(1 - (usage['tokens'] + estimated_tokens) / self.token_budget)
+        if self.cost_budget:
+            ratios.append(1 - (usage['cost'] + estimated_cost) / self.cost_budget)
+        if self.time_budget:
+            ratios.append(1 - usage['elapsed'] / self.time_budget)
+        return min(ratios) if ratios else 1.0
+
+    def admit(self, job, priority, estimated_tokens=0, model=None, degrade_model=None):
+        """ジョブの入場判定。ALLOW / DEGRADE / DEFER を返す"""
+        reserve = self.reserve.get(priority, self.default_reserve)
+        estimated_cost = self.cost_of(model, estimated_tokens, 0, requests=0)
+        remaining = self.remaining_ratio(estimated_tokens, estimated_cost)
+        if remaining >= reserve:
+            decision = ALLOW
+        elif degrade_model and remaining >= reserve / 2:
+            decision = DEGRADE
+        else:
+            decision = DEFER
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO admissions VALUES (?, ?, ?, ?, ?, ?)",
+                (self.run_id, job, priority, decision, remaining, time.time())
+            )
+        finally:
+            conn.close()
+        return decision
+
+    def consume(self, model, prompt_tokens, completion_tokens):
+        cost = self.cost_of(model, prompt_tokens, completion_tokens)
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE runs SET prompt_tokens = prompt_tokens + ?, completion_tokens = completion_tokens + ?, "
+                "cost = cost + ?, requests = requests + 1 WHERE run_id = ?",
+                (prompt_tokens or 0, completion_tokens or 0, cost, self.run_id)
+            )
+        finally:
+            conn.close()
+        return cost
+
+    def deferred_jobs(self):
+        """このrunで後回しにされ、その後入場できていないジョブ"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT job, priority FROM admissions a WHERE run_id = ? AND decision = ? "
+                "AND NOT EXISTS (SELECT 1 FROM admissions b WHERE b.run_id = a.run_id AND b.job = a.job "
+                "AND b.decision != ? AND b.created > a.created) GROUP BY job ORDER BY priority, job",
+                (self.run_id, DEFER, DEFER)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [job for job, _ in rows]
@@ -0,0 +1,75 @@
+# composite_prompt.py
+import re
+
+# 行頭の ``` で囲まれたスキーマ（本文中の「例: ```json」は対象外）
+SCHEMA_PATTERN = re.compile(r'^```(?:json)?[ \t]*\r?\n(.*?)^```', re.MULTILINE | re.DOTALL)
+
+
+def section(text, heading):
+    """「## heading」から次の「## 」までの本文"""
+    match = re.search(rf'^## {re.escape(heading)}[^\n]*\n(.*?)(?=^## |\Z)', text, re.MULTILINE | re.DOTALL)
+    return match.group(1).strip() if match else ''
+
+
+def extract_schema(text):
+    """カテゴリ別プロンプトの出力スキーマから最外の {} を除いた中身（"基本情報": {...}）を返す"""
+    match = SCHEMA_PATTERN.search(text)
+    if not match:
+        return None
+    body = match.group(1).strip()
+    if not (body.startswith('{') and body.endswith('}')):
+        return None
+    return body[1:-1].strip('\r\n')
+
+
+def build_composite_prompt(template, prompts):
+    """カテゴリ別プロンプトのスキーマ・情報ソースを1つのプロンプトにまとめる
+
+    template: {categories} {sources} {schema} を含む複合プロンプト
+    prompts: {JSONのキー（例: 基本情報）: 置換済みのカテゴリ別プロンプト}
+    スキーマを取り出せないプロンプトがあればNone。
+    """
+    schemas, sources = [], []
+    for key, text in prompts.items():
+        schema = extract_schema(text)
+        if schema is None:
+            return None
+        schemas.append(schema)
+        items = [line for line in section(text, '情報ソース').splitlines() if re.match(r'\s*\d+\.', line)]
+        sources.append('\n'.join([f"### {key}", *items]))
+    return (template
+            .replace('{categories}', ''.join(f"「{key}」" for key in prompts))
+            .replace('{sources}', '\n\n'.join(sources))
+            .replace('{schema}', ',\n'.join(schemas)))
+
+
+def split_composite(data, keys):
+    """複合プロンプトの応答をカテゴリ毎に分ける
+
+    keys: {カテゴリ名: JSONのキー}。キーが無い・値が空のカテゴリは含めない。
+    """
+    if not isinstance(data, dict):
+        return {}
+    result = {}
+    for category, key in keys.items():
+        value = data.get(key)
+        if value not in (None, {}, [], ''):
+            result[category] = value
+    return result
+
+
+def completeness(value):
+    """null・空文字・空配列以外の値の割合（値が無い場合は0.0）"""
+    filled, total = _count_leaves(value)
+    return filled / total if total else 0.0
+
+
+def _count_leaves(value):
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, list):
+        if not value:
+            return 0, 1
+        counts = [_count_leaves(item) for item in value]
+        return sum(count[0] for count in counts), sum(count[1] for count in counts)
+    return (0 if value in (None, '') else 1), 1
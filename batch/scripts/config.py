@@ -17,16 +17,83 @@ BASE_CONFIG = {
 RATE_LIMIT_CONFIG = {
     'rate_limit': 10,
     'time_window': 60,
+    # 全プロセスで共有するバケットの保存先
+    'db_path': f"{BASE_CONFIG['base_path']}/state/rate_limit.db",
+    # モデル毎のバケット（未指定のモデルは上記の既定値）
+    'model_limits': {
+        'sonar-reasoning-pro': {'rate_limit': 10, 'time_window': 60}
+    },
     'retry_config': {
         'max_retries': 3,
         'backoff_factor': 1.5,
-        'retry_delay': 2
+        'retry_delay': 2,
+        'max_delay': 60,
+        'jitter': 0.5,
+        'retry_statuses': [429, 500, 502, 503, 504]
     }
 }
 
+# HTTP接続設定（全検索クラスで共有するセッションのプールサイズ）
+HTTP_CONFIG = {
+    'pool_connections': 4,
+    'pool_maxsize': 10,
+    'timeout': 180,
+    # 送信中のAPI呼び出し数の上限（プロセス内の全検索・全スレッドで共有）
+    'max_concurrency': 4
+}
+
 # キャッシュ設定
 CACHE_CONFIG = {
-    'duration': 3600
+    'duration': 3600,
+    'dir': f"{BASE_CONFIG['base_path']}/output/.cache",
+    'max_bytes': 50 * 1024 * 1024,
+    'max_entries': 1000
+}
+
+# 同一リクエストの合流設定（プロセス間はロックファイルで検出）
+SINGLE_FLIGHT_CONFIG = {
+    'lock_dir': f"{BASE_CONFIG['base_path']}/state/inflight",
+    'wait_timeout': 600,
+    'poll_interval': 1.0
+}
+
+# API呼び出しの記録（JSONL + Prometheus textfile collector）
+TELEMETRY_CONFIG = {
+    'jsonl_dir': f"{BASE_CONFIG['base_path']}/telemetry",
+    'prom_dir': f"{BASE_CONFIG['base_path']}/telemetry/prom"
+}
+
+# 実行(run)単位の予算と検索クラス毎の優先度（数値が小さいほど優先）
+BUDGET_CONFIG = {
+    'db_path': f"{BASE_CONFIG['base_path']}/state/budget.db",
+    'token_budget': 2000000,
+    'cost_budget': 10.0,  # USD
+    'time_budget': 3 * 3600,  # 秒
+    'estimated_tokens_per_call': 20000,
+    # 予算逼迫時の切替先モデル
+    'degrade_model': 'sonar',
+    # 100万トークンあたりの単価と1リクエストあたりの検索料金（USD）
+    'prices': {
+        'sonar-reasoning-pro': {'input': 2.0, 'output': 8.0, 'request': 0.006},
+        'sonar-pro': {'input': 3.0, 'output': 15.0, 'request': 0.006},
+        'sonar': {'input': 1.0, 'output': 1.0, 'request': 0.005}
+    },
+    'priorities': {
+        'StockSearcherPosterFull': 1,
+        'JPSearcher': 1,
+        'GlobalMacroSearcher': 2,
+        'ChinaSearcher': 2,
+        'CryptoSearcher': 2,
+        'EnergyMarketsSearcher': 3,
+        'RealEstateSearcher': 4,
+        'RealEstateHiddenValueSearcher': 4,
+        'BOOTHSearcher': 5,
+        # 全銘柄巡回は別枠の予算（SWEEP_CONFIG['budget']）で実行する
+        'DossierSweep': 5
+    },
+    'default_priority': 3,
+    # 優先度毎に入場に必要な残り予算の割合（低優先度ほど早く制限される）
+    'reserve': {1: 0.0, 2: 0.15, 3: 0.3, 4: 0.45, 5: 0.6}
 }
 
 # ブログ投稿設定
@@ -38,33 +105,140 @@ BLOG_CONFIG = {
     }
 }
 
+# 実行ジャーナル設定（ステージ毎の出力を保存し、再実行時は完了済みステージを省略）
+JOURNAL_CONFIG = {
+    'dir': f"{BASE_CONFIG['base_path']}/state/journal"
+}
+
+# 投稿キュー設定（検索側はキューへ追加し、publish_worker.pyがはてなブログへ投稿）
+PUBLISH_CONFIG = {
+    'mode': 'queue',  # 'queue' または 'direct'（その場で投稿）
+    'db_path': f"{BASE_CONFIG['base_path']}/state/publish_queue.db",
+    'max_workers': 2,
+    'max_attempts': 5,
+    'retry_delay': 60,  # 秒（試行毎にbackoff_factor倍）
+    'backoff_factor': 2.0,
+    'max_delay': 3600,
+    # 投稿中のまま放置されたエントリをHOLDにするまでの秒数。1回の投稿にかかり得る時間
+    # （タイムアウト × 試行回数 + 試行間の待機の上限 × 再試行回数）より余裕(300秒)を持って長くする
+    'lease': HTTP_CONFIG['timeout'] * (RATE_LIMIT_CONFIG['retry_config']['max_retries'] + 1)
+             + RATE_LIMIT_CONFIG['retry_config']['max_delay'] * RATE_LIMIT_CONFIG['retry_config']['max_retries'] + 300,
+    'poll_interval': 30
+}
+
+# バッチ実行設定（job_runner.pyで検索スクリプトを並列実行）
+RUNNER_CONFIG = {
+    'scripts_dir': 'M:/ML/ChatGPT/gennote/batch/scripts',
+    'logs_dir': 'M:/ML/ChatGPT/gennote/batch/batch_logs',
+    'pattern': 'search_*.py',
+    'max_workers': 4,
+    'max_logs': 30,
+    'timeout': 1800,  # 秒（ジョブ毎の既定値）
+    # スクリプト毎のタイムアウト（秒）
+    'timeouts': {
+        'search_estate_value.py': 3600
+    }
+}
+
+# 日次パイプライン設定（pipeline.py: レポート毎に search -> post、全レポート保存後にGemini要約）
+PIPELINE_CONFIG = {
+    'max_workers': 4,
+    # レポート名: '検索モジュール.クラス'
+    'reports': {
+        'jp': 'search_jp.JPSearcher',
+        'china': 'search_china.ChinaSearcher',
+        'crypto': 'search_crypto.CryptoSearcher',
+        'energy': 'search_energy.EnergyMarketsSearcher',
+        'globalmacro': 'search_grobalmacro.GlobalMacroSearcher',
+        'real_estate': 'search_estate.RealEstateSearcher',
+        'real_estate_hidden_value': 'search_estate_value.RealEstateHiddenValueSearcher'
+    }
+}
+
+# 常駐ワーカー設定（worker_daemon.py serve で起動。各スクリプトのmain()は起動中ならワーカーへ依頼）
+WORKER_CONFIG = {
+    'address': ('127.0.0.1', 47800),
+    # 認証キー（16文字以上）。環境変数 GENNOTE_WORKER_KEY かキーファイルで指定し、無ければワーカーは起動しない
+    'authkey': os.getenv('GENNOTE_WORKER_KEY'),
+    'authkey_file': os.getenv('GENNOTE_WORKER_KEY_FILE', f"{BASE_CONFIG['base_path']}/state/worker.key"),
+    'max_workers': 4,
+    # 依頼を受け付けるジョブのモジュール（これ以外の 'module.Class' は実行しない）
+    'job_modules': [
+        'search_jp', 'search_china', 'search_crypto', 'search_energy', 'search_grobalmacro',
+        'search_estate', 'search_estate_value', 'stock_search_and_post', 'summary_gemini'
+    ],
+    # 起動時に一度だけ読み込むライブラリ（job_modulesも読み込む）
+    'preload': ['yfinance', 'pandas', 'bs4', 'markdown', 'dotenv', 'google.generativeai'],
+    # 依頼元の切断（タイムアウトによる終了等）を確認する間隔（秒）。切断されたジョブは中止する
+    'poll_interval': 1.0
+}
+
+# 出力・投稿の鮮度判定（本日の出力が完了済み・投稿済みなら再実行しない。GENNOTE_FORCE=1 または --force で無効）
+FRESHNESS_CONFIG = {
+    'dir': f"{BASE_CONFIG['base_path']}/state/freshness",
+    # 出力ファイルを再利用できる最大経過秒数
+    'max_age': 24 * 3600
+}
+
+# ジョブキュー設定（複数ノードで実行する場合は backend='file' とし、dir を共有フォルダにする）
+JOB_QUEUE_CONFIG = {
+    'backend': 'sqlite',
+    'db_path': f"{BASE_CONFIG['base_path']}/state/job_queue.db",
+    'dir': f"{BASE_CONFIG['base_path']}/state/job_queue",
+    'max_workers': 2,
+    'max_attempts': 3,
+    'retry_delay': 120,
+    'backoff_factor': 2.0,
+    'max_delay': 3600,
+    # この秒数ハートビートが無いジョブは他のワーカーが再取得する
+    'visibility_timeout': 900,
+    'heartbeat_interval': 60,
+    'poll_interval': 30
+}
+
+# 全銘柄ドシエ巡回設定（stock_search_and_post.py --sweep）
+SWEEP_CONFIG = {
+    # JPXの「東証上場銘柄一覧」をCSVで保存したもの
+    'universe_file': f"{BASE_CONFIG['base_path']}/state/tse_universe.csv",
+    'markets': ['プライム（内国株式）', 'スタンダード（内国株式）', 'グロース（内国株式）'],
+    # この日数以上更新していない銘柄を巡回する（未作成・古い順）
+    'refresh_days': 30,
+    # 1晩に作成するドシエの上限と、1ジョブで処理する銘柄数
+    'nightly_limit': 130,
+    'shard_size': 10,
+    'max_workers': 4,
+    # 予算の優先度・計測で使うジョブ名
+    'job_name': 'DossierSweep',
+    # 日次バッチとは別枠の予算（run_id: sweep-{日付}）。BUDGET_CONFIG の同名の値を上書きする
+    # 巡回だけのrunのため他のジョブ向けの残り予算（reserve）は確保せず、上限近くまで通常のモデルで実行する
+    'budget': {'token_budget': 3000000, 'cost_budget': 15.0, 'time_budget': 8 * 3600, 'reserve': {}},
+    # 予算超過で中断した作業単位を再実行するまでの秒数（試行回数には数えない）
+    'defer_delay': 1800
+}
+
+# スケジュール設定（scheduler.py）
+# cron: 分 時 日 月 曜日（日曜=0）、market: 'jpx'/'us' の休場日は on_closed（skip/degrade）に従う
+# deadline: 投稿の締切（JST）。締切の早いジョブから実行する
+# 記載の無い search_*.py は毎日実行する
+# stock_search_and_post.py 等 search_*.py 以外のスクリプトは既定では実行しない（追加する場合は予算の優先度も設定する）
+SCHEDULE_CONFIG = {
+    # 臨時休場日（'YYYY-MM-DD'）
+    'extra_holidays': {'jpx': [], 'us': []},
+    'jobs': {
+        'search_jp.py': {'cron': '0 7 * * *', 'market': 'jpx', 'on_closed': 'skip', 'deadline': '08:30'},
+        'search_estate_value.py': {'cron': '0 7 * * *', 'market': 'jpx', 'on_closed': 'skip', 'deadline': '12:00'},
+        'search_grobalmacro.py': {'cron': '0 7 * * *', 'market': 'us', 'on_closed': 'degrade', 'deadline': '09:00'},
+        'search_energy.py': {'cron': '0 7 * * *', 'market': 'us', 'on_closed': 'degrade', 'deadline': '10:00'},
+        'search_china.py': {'cron': '0 7 * * *', 'deadline': '10:00'},
+        'search_crypto.py': {'cron': '0 7 * * *', 'deadline': '10:00'},
+        'search_estate.py': {'cron': '0 7 * * *', 'deadline': '12:00'},
+    }
+}
+
 # 検索ドメイン設定
 SEARCH_DOMAINS = {
-    'jp_market': {
-        'primary': {
-            'domains': ["jpx.co.jp", "nikkei.com", "bloomberg.co.jp"],
-            'weight': 2.0
-        },
-        'secondary': {
-            'domains': ["reuters.co.jp", "quick.co.jp", "minkabu.jp"],
-            'weight': 1.0
-        }
-    },
-    'china_market': [
-        "etnet.com.hk",
-        "yahoo.com",
-        "aastocks.com",
-        "hsbc.com.hk",
-        "bochk.com",
-        "hangseng.com",
-        "tradingview.com",
-        "investing.com",
-        "coinmarketcap.com"
-    ],
     'booth': ["booth.pm"],
 
-# 更新後のSEARCH_DOMAINS設定
-
     # 国際機関・マクロデータ
     'global_institutions': {
         'primary': {
@@ -181,12 +355,345 @@ SEARCH_DOMAINS = {
             ],
             'weight': 1.0
         }
-    }
+    },
 
+    # 検索クラス毎の設定（DomainRegistryでdomain_filterへコンパイル）
+    'jp_stock': {
+        'primary': {
+            'domains': [
+                "kabutan.jp",
+                "minkabu.jp",
+                "finance.yahoo.co.jp",
+                "jpx.co.jp",
+                "disclosure.edinet-fsa.go.jp",  # EDINET
+                "release.tdnet.info"            # TDnet
+            ],
+            'weight': 2.0
+        },
+        'news': {
+            'domains': [
+                "reuters.com",
+                "wsj.com",
+                "bloomberg.co.jp",
+                "nikkei.com"           # 日本経済新聞
+            ],
+            'weight': 1.5
+        },
+        'research': {
+            'domains': [
+                "boj.or.jp",           # 日本銀行
+                "mof.go.jp",           # 財務省
+                "nli-research.co.jp",  # ニッセイ基礎研究所
+                "dlri.co.jp",          # 第一生命経済研究所
+                "jcer.or.jp",          # 日本経済研究センター
+                "jeri.co.jp"           # 日本経済研究所
+            ],
+            'weight': 1.2
+        },
+        'individual': {
+            'domains': [
+                "shenmacro.com",
+                "globalmacroresearch.org/jp",
+                "muragoe-makoto.blog.jp",
+                "note.com/utbuffett",  # 東大ぱふぇっと
+                "note.com/goto_finance",  # 後藤達也
+                "note.com/hirosetakao",   # 広瀬隆雄
+                "note.com/cjdbx883"       # 村松一之
+            ],
+            'weight': 0.8
+        }
+    },
 
+    'crypto': {
+        'global': {
+            'domains': [
+                "cointelegraph.com",   # 月間1280万訪問者（1位）
+                "utoday.com",          # 月間880万訪問者（2位）
+                "coindesk.com",        # 月間500万訪問者（3位）
+                "coincodex.com",       # 月間450万訪問者（4位）
+                "coingape.com",        # 月間450万訪問者（5位）
+                "ambcrypto.com",       # 月間430万訪問者（6位）
+                "crypto.news",         # 月間410万訪問者（7位）
+                "bitcoinist.com",      # 月間370万訪問者（8位）
+                "dailyhodl.com",       # 月間350万訪問者（9位）
+                "beincrypto.com"       # 月間330万訪問者（10位）
+            ],
+            'weight': 1.5
+        },
+        'regional': {
+            'domains': [
+                "bitcoin.com",         # アジア市場に強み（news.bitcoin.comを含む）
+                "decrypt.co"           # Web3/NFT分野に特化
+            ],
+            'weight': 1.0
+        },
+        'institutional': {
+            'domains': [
+                "blockworks.co",       # 機関投資家向け分析
+                "theblock.co"          # 深い市場分析
+            ],
+            'weight': 1.2
+        },
+        'japan': {
+            'domains': [
+                "coinpost.jp",         # 日本語主要サイト
+                "cryptowatch.jp"       # 日本語市場分析
+            ],
+            'weight': 1.2
+        },
+        'official': {
+            'domains': [
+                "sec.gov",             # 米国証券取引委員会
+                "finra.org",           # 金融業規制当局
+                "bis.org"              # 国際決済銀行
+            ],
+            'weight': 1.0
+        }
+    },
 
+    'energy': {
+        'policy': {
+            'domains': [
+                "iea.org",             # 国際エネルギー機関
+                "eia.gov",             # 米国エネルギー情報局
+                "energy.gov",          # 米国エネルギー省
+                "enecho.meti.go.jp",   # 経済産業省資源エネルギー庁
+                "ferc.gov"             # 米国連邦エネルギー規制委員会
+            ],
+            'weight': 2.0
+        },
+        'oil_gas': {
+            'domains': [
+                "opec.org",            # 石油輸出国機構
+                "ief.org",             # 国際エネルギーフォーラム
+                "cedigaz.org",         # 天然ガス情報センター
+                "ogj.com"              # Oil & Gas Journal
+            ],
+            'weight': 1.5
+        },
+        'renewables': {
+            'domains': [
+                "irena.org",           # 国際再生可能エネルギー機関
+                "ren21.net",           # 再生可能エネルギー政策ネットワーク
+                "seia.org",            # 米国太陽エネルギー産業協会
+                "gwec.net"             # 世界風力エネルギー協会
+            ],
+            'weight': 1.2
+        },
+        'nuclear': {
+            'domains': [
+                "iaea.org",            # 国際原子力機関
+                "world-nuclear.org",   # 世界原子力協会
+                "nei.org"              # 米国原子力エネルギー協会
+            ],
+            'weight': 1.0
+        },
+        'markets': {
+            'domains': [
+                "cmegroup.com",        # シカゴ・マーカンタイル取引所
+                "ice.com",             # インターコンチネンタル取引所
+                "platts.com",          # S&Pグローバル・プラッツ
+                "argusmedia.com"       # アーガスメディア
+            ],
+            'weight': 1.5
+        },
+        'news': {
+            'domains': [
+                "bloomberg.com",
+                "reuters.com",
+                "spglobal.com",
+                "rystadenergy.com",
+                "woodmac.com"          # ウッド・マッケンジー
+            ],
+            'weight': 1.2
+        },
+        'companies': {
+            'domains': [
+                "bp.com",
+                "exxonmobil.com",
+                "shell.com",
+                "chevron.com",
+                "total.com",
+                "nexteraenergy.com",
+                "iberdrola.com"
+            ],
+            'weight': 0.5
+        }
+    },
 
+    'global_macro': {
+        'institutions': {
+            'domains': [
+                "worldbank.org",
+                "imf.org",
+                "bis.org",
+                "oecd.org",
+                "fred.stlouisfed.org",
+                "ecb.europa.eu",
+                "boj.or.jp"
+            ],
+            'weight': 2.0
+        },
+        'markets': {
+            'domains': [
+                "bloomberg.com",
+                "reuters.com",
+                "ft.com",
+                "wsj.com",
+                "nasdaq.com",
+                "nyse.com",
+                "jpx.co.jp"
+            ],
+            'weight': 1.5
+        },
+        'macro_data': {
+            'domains': [
+                "tradingeconomics.com",
+                "investing.com",
+                "marketwatch.com",
+                "finance.yahoo.com"
+            ],
+            'weight': 1.0
+        },
+        'jp_market': {
+            'domains': [
+                "nikkei.com",
+                "quick.co.jp",
+                "minkabu.jp",
+                "mof.go.jp",
+                "esri.cao.go.jp"
+            ],
+            'weight': 1.2
+        },
+        'china_market': {
+            'domains': [
+                "stats.gov.cn",
+                "pbc.gov.cn",
+                "sse.com.cn",
+                "aastocks.com",
+                "etnet.com.hk"
+            ],
+            'weight': 0.8
+        },
+        'commodities': {
+            'domains': [
+                "cmegroup.com",
+                "ice.com",
+                "lme.com",
+                "eia.gov",
+                "gold.org"
+            ],
+            'weight': 1.2
+        }
+    },
+
+    'real_estate': {
+        'data': {
+            'domains': [
+                "zillow.com",          # 米国不動産データ
+                "redfin.com",          # 米国不動産市場分析
+                "realtor.com",         # 全米不動産協会
+                "corelogic.com",       # 不動産データ分析
+                "spglobal.com",        # S&P不動産指数
+                "realestate.co.jp",    # 日本不動産情報
+                "athome.co.jp",        # 日本不動産ポータル
+                "homes.co.jp",         # LIFULL HOME'S
+                "suumo.jp"             # SUUMO
+            ],
+            'weight': 1.2
+        },
+        'reit': {
+            'domains': [
+                "nareit.com",          # 全米REIT協会
+                "reit.or.jp",          # 日本REIT協会
+                "ares.or.jp",          # 不動産証券化協会
+                "greenstreet.com",     # 不動産投資分析
+                "msci.com",            # MSCI不動産指数
+                "smtri.jp",            # 三井住友トラスト基礎研究所
+                "jreit.jp"             # J-REIT.jp
+            ],
+            'weight': 2.0
+        },
+        'reports': {
+            'domains': [
+                "cbre.com",            # CBREグローバル不動産
+                "jll.com",             # JLL不動産サービス
+                "cushmanwakefield.com", # クッシュマン不動産
+                "colliers.com",        # コリアーズ不動産
+                "savills.com",         # サヴィルズ不動産
+                "miki-shoji.co.jp",    # 三鬼商事
+                "xymax.co.jp"          # ザイマックス
+            ],
+            'weight': 1.8
+        },
+        'government': {
+            'domains': [
+                "mlit.go.jp",          # 国土交通省
+                "reins.or.jp",         # 不動産流通機構
+                "huduser.gov",         # 米国住宅都市開発省
+                "freddiemac.com",      # フレディマック
+                "fanniemae.com",       # ファニーメイ
+                "retpc.jp",            # 不動産投資市場調査会
+                "tdb.co.jp"            # 帝国データバンク
+            ],
+            'weight': 1.5
+        },
+        'news': {
+            'domains': [
+                "nar.realtor",         # 全米不動産協会
+                "inman.com",           # 不動産ニュース
+                "housingwire.com",     # 住宅市場ニュース
+                "fudosankeisei.co.jp", # 不動産経済研究所
+                "nli-research.co.jp",  # ニッセイ基礎研究所
+                "fudousan-keizai.co.jp", # 不動産経済
+                "ken-eyenet.jp"        # 不動産流通研究所
+            ],
+            'weight': 1.0
+        },
+        'international': {
+            'domains': [
+                "globalpropertyguide.com", # グローバル不動産ガイド
+                "knightfrank.com",     # ナイトフランク不動産
+                "juwai.com",           # 中国系国際不動産
+                "propertyfinder.ae",   # 中東不動産
+                "domain.com.au",       # オーストラリア不動産
+                "rightmove.co.uk",     # イギリス不動産
+                "immobilienscout24.de" # ドイツ不動産
+            ],
+            'weight': 0.8
+        }
+    },
+
+    'estate_value': [
+        "nikkei.com",
+        "reuters.com",
+        "bloomberg.co.jp",
+        "minkabu.jp",
+        "morningstar.co.jp",
+        "kabutan.jp",
+        "jpx.co.jp",
+        "tdb.co.jp",
+        "mlit.go.jp",
+        "fsa.go.jp",
+        "mof.go.jp",
+        "ir-bank.jp",
+        "buffett-code.com",
+        "kabudragon.com",
+        "ullet.com",
+        "kabupro.jp",
+        "zaimu-express.net"
+    ],
+
+    'stock_pick': [
+        "nikkei.com", "bloomberg.co.jp", "finance.yahoo.co.jp",
+        "kabutan.jp", "minkabu.jp", "toyokeizai.net", "diamond.jp",
+        "reuters.co.jp", "disclosure.edinet-fsa.go.jp", "jpx.co.jp"
+    ]
+}
 
+# domain_filterの設定（Perplexity APIのsearch_domain_filterは最大20件）
+DOMAIN_FILTER_CONFIG = {
+    'max_domains': 20
 }
 
 def get_file_paths(type='default'):
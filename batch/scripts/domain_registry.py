@@ -0,0 +1,124 @@
+# domain_registry.py
+import re
+import logging
+from urllib.parse import urlsplit
+
+_LABEL = r'[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?'
+_DOMAIN_PATTERN = re.compile(rf'^(?:{_LABEL}\.)+[a-z][a-z0-9-]*[a-z0-9]$')
+
+
+def normalize_domain(entry):
+    """URL等の記述を「ホスト名」または「ホスト名/パス」に正規化する
+
+    ホスト名は小文字化し、スキーム/www./ポート/クエリを除去する。
+    パス（note.com/<著者> 等）はAPIがURL単位の指定を受け付けるため残す。
+    正規化後もドメインとして不正な場合はNoneを返す。
+    """
+    if not isinstance(entry, str):
+        return None
+    text = entry.strip()
+    if not text:
+        return None
+    parts = urlsplit(text if '://' in text else f'//{text}')
+    try:
+        host = (parts.hostname or '').rstrip('.')
+    except ValueError:
+        return None
+    if host.startswith('www.'):
+        host = host[4:]
+    if len(host) > 253 or not _DOMAIN_PATTERN.match(host):
+        return None
+    path = parts.path.rstrip('/')
+    return f'{host}{path}' if path else host
+
+
+def _covering(domain):
+    """domainを包含するフィルタ候補（パス付きならホスト自身、以降は親ドメイン）"""
+    host, _, path = domain.partition('/')
+    labels = host.split('.')
+    if path:
+        yield host
+    for i in range(1, len(labels) - 1):
+        yield '.'.join(labels[i:])
+
+
+class DomainRegistry:
+    """SEARCH_DOMAINSを検索クラス毎のdomain_filterへコンパイルする
+
+    各キーの値はドメインのリスト（重み1.0）または
+    {tier: {'domains': [...], 'weight': w}} 形式の重み付きティア。
+    正規化・重複除去の上、親ドメインで包含されるサブドメイン・パスは親に統合し、
+    重みの高い順（同じ重みは記述順）に並べる。max_domains を超える場合は
+    各ティアの先頭を優先して残し（ティアごと消えないように）、除外分は警告する。
+    """
+
+    def __init__(self, search_domains, max_domains=20):
+        self.max_domains = max_domains
+        self.logger = logging.getLogger(__name__)
+        self.invalid = []
+        self.dropped = {}
+        self._filters = {name: self._compile(name, spec) for name, spec in search_domains.items()}
+
+    def _entries(self, spec):
+        """(ドメイン記述, 重み, ティア名) を記述順に列挙"""
+        if isinstance(spec, (list, tuple)):
+            for domain in spec:
+                yield domain, 1.0, None
+            return
+        for tier_name, tier in spec.items():
+            weight = tier.get('weight', 1.0)
+            for domain in tier.get('domains', []):
+                yield domain, weight, tier_name
+
+    def _compile(self, name, spec):
+        weights = {}
+        tiers = {}
+        for entry, weight, tier in self._entries(spec):
+            domain = normalize_domain(entry)
+            if domain is None:
+                self.logger.warning(f"不正なドメインを除外 [{name}]: {entry!r}")
+                self.invalid.append((name, entry))
+                continue
+            if domain != entry:
+                self.logger.debug(f"ドメインを正規化 [{name}]: {entry} -> {domain}")
+            if weight > weights.get(domain, float('-inf')):
+                tiers[domain] = tier
+            weights[domain] = max(weight, weights.get(domain, weight))
+
+        # 親ドメインが含まれていればサブドメイン・パスは不要（フィルタはその配下にも一致する）
+        for domain in list(weights):
+            for parent in _covering(domain):
+                if parent in weights:
+                    weights[parent] = max(weights[parent], weights.pop(domain))
+                    break
+
+        order = {domain: i for i, domain in enumerate(weights)}
+        ranked = sorted(weights, key=lambda domain: (-weights[domain], order[domain]))
+        if not self.max_domains or len(ranked) <= self.max_domains:
+            return ranked
+
+        # 各ティアの最上位を先に確保し、残り枠を重み順で埋める
+        kept = []
+        for domain in ranked:
+            if tiers[domain] not in {tiers[k] for k in kept}:
+                kept.append(domain)
+        kept = kept[:self.max_domains]
+        for domain in ranked:
+            if len(kept) >= self.max_domains:
+                break
+            if domain not in kept:
+                kept.append(domain)
+        kept = set(kept)
+        self.dropped[name] = [domain for domain in ranked if domain not in kept]
+        self.logger.warning(
+            f"ドメイン数が上限({self.max_domains})を超えたため除外 [{name}]: "
+            f"{', '.join(self.dropped[name])}"
+        )
+        return [domain for domain in ranked if domain in kept]
+
+    def get(self, name):
+        """コンパイル済みのdomain_filter（呼び出し側で変更しても影響しないようコピーを返す）"""
+        return list(self._filters[name])
+
+    def names(self):
+        return list(self._filters)
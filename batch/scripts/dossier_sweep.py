@@ -0,0 +1,91 @@
+# dossier_sweep.py
+import os
+import re
+import csv
+from datetime import date, datetime
+
+# 保存済みドシエ（StockSearcherPosterFull.save_to_json）のファイル名: {YYYYMMDD}_{法人名}_{証券コード}.json
+DOSSIER_PATTERN = re.compile(r'^(\d{8})_.*_([0-9][0-9A-Z]{3})\.json$')
+# 英字を含む新しい証券コード（例: 130A）も対象
+CODE_PATTERN = re.compile(r'^[0-9][0-9A-Z]{3}$')
+SWEEP_JOB = 'stock_search_and_post.StockSearcherPosterFull'
+SWEEP_METHOD = 'execute_sweep_shard'
+# 日次バッチと予算・ジャーナルを分けるためのrun_idの接頭辞
+SWEEP_RUN_PREFIX = 'sweep-'
+
+
+def _open_csv(path):
+    """JPXの一覧をExcelで保存したCSV（cp932）とUTF-8のどちらも読む"""
+    try:
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            return list(csv.DictReader(f))
+    except UnicodeDecodeError:
+        with open(path, 'r', encoding='cp932', newline='') as f:
+            return list(csv.DictReader(f))
+
+
+def load_universe(path, markets=None):
+    """上場銘柄一覧のCSVから [{'法人名', '証券コード'}] を証券コード順に返す
+
+    列名はJPXの「東証上場銘柄一覧」（コード・銘柄名・市場・商品区分）か code・name。
+    markets を指定した場合は市場区分が一致する銘柄のみ（ETF・REIT等を除く）。
+    """
+    stocks = {}
+    for row in _open_csv(path):
+        code = str(row.get('コード') or row.get('code') or '').strip().upper()
+        name = (row.get('銘柄名') or row.get('name') or '').strip()
+        market = (row.get('市場・商品区分') or row.get('market') or '').strip()
+        if not CODE_PATTERN.match(code) or not name:
+            continue
+        if markets and market and market not in markets:
+            continue
+        stocks[code] = {'法人名': name, '証券コード': code}
+    return [stocks[code] for code in sorted(stocks)]
+
+
+def latest_dossiers(output_dir):
+    """証券コード -> 最新のドシエの作成日"""
+    latest = {}
+    try:
+        names = os.listdir(output_dir)
+    except FileNotFoundError:
+        return latest
+    for name in names:
+        match = DOSSIER_PATTERN.match(name)
+        if not match:
+            continue
+        day = datetime.strptime(match.group(1), '%Y%m%d').date()
+        code = match.group(2)
+        if code not in latest or latest[code] < day:
+            latest[code] = day
+    return latest
+
+
+def plan_sweep(universe, latest, today, refresh_days, limit=None):
+    """refresh_days日以上更新していない銘柄を、未作成・古い順に最大limit件返す（同じ日付はコード順）"""
+    due = []
+    for order, stock in enumerate(universe):
+        refreshed = latest.get(stock['証券コード'])
+        if refreshed is None or (today - refreshed).days >= refresh_days:
+            due.append((refreshed or date.min, order, stock))
+    due.sort(key=lambda item: item[:2])
+    return [stock for _, _, stock in due[:limit]]
+
+
+def sweep_run_id(run_id):
+    """日次バッチのrun_id（日付）に対応する巡回のrun_id"""
+    return run_id if run_id.startswith(SWEEP_RUN_PREFIX) else f"{SWEEP_RUN_PREFIX}{run_id}"
+
+
+def shard(stocks, size):
+    """size銘柄ずつの作業単位に分割"""
+    return [stocks[i:i + size] for i in range(0, len(stocks), size)]
+
+
+def enqueue_sweep(queue, shards, run_id):
+    """作業単位毎のジョブを追加し、IDの一覧を返す（同じrunの再投入は無視）"""
+    return [
+        queue.enqueue(SWEEP_JOB, method=SWEEP_METHOD, args=[f"{run_id}:{index:04d}", stocks],
+                      key=f"sweep:{run_id}:{index}")
+        for index, stocks in enumerate(shards)
+    ]
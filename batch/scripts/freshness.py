@@ -0,0 +1,55 @@
+# freshness.py
+import os
+import time
+import hashlib
+
+from publish_queue import DEAD
+
+FORCE_ENV = 'GENNOTE_FORCE'
+
+
+def file_digest(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def output_record(path):
+    """完了した出力ファイルの記録（ハッシュ・サイズ・保存時刻）"""
+    return {'sha256': file_digest(path), 'bytes': os.path.getsize(path), 'saved_at': time.time()}
+
+
+def check_output(path, recorded, max_age=None, now=None):
+    """出力ファイルが再利用できるか判定し (判定, 理由) を返す
+
+    recorded は検索完了時の output_record()。記録が無い・内容が異なる場合は
+    ストリーミング書き込みの途中で終了した可能性があるため作り直す。
+    """
+    if not os.path.exists(path):
+        return False, '出力なし'
+    if os.path.getsize(path) == 0:
+        return False, '出力が空'
+    if not recorded:
+        return False, '完了記録なし'
+    if file_digest(path) != recorded['sha256']:
+        return False, '内容が完了記録と不一致'
+    if max_age is not None and (now or time.time()) - os.path.getmtime(path) > max_age:
+        return False, f'{max_age}秒より古い'
+    return True, '最新'
+
+
+def check_post(path, recorded, queue_status=None):
+    """出力ファイルの現在の内容が投稿済みか判定し (判定, 理由) を返す
+
+    queue_status は投稿キュー上の状態。DEADは投稿に失敗したため投稿し直す。
+    （HOLDは投稿された可能性があるため二重投稿を避けて投稿済みとみなす）
+    """
+    if not recorded:
+        return False, '投稿記録なし'
+    if not os.path.exists(path) or file_digest(path) != recorded['sha256']:
+        return False, '投稿後に内容が変更された'
+    if queue_status == DEAD:
+        return False, '投稿失敗'
+    return True, '投稿済み'
@@ -0,0 +1,541 @@
+# job_queue.py
+import os
+import abc
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from report_specs import load_class
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+DEAD = 'dead'
+
+
+class JobDeferred(Exception):
+    """ジョブを失敗とせずに delay 秒後へ延期する（予算超過等。試行回数に数えない）"""
+
+    def __init__(self, message, delay):
+        super().__init__(message)
+        self.delay = delay
+
+
+def default_worker_id():
+    # ファイル名に使うため区切り文字(~)は除く
+    return f"{socket.gethostname()}-{os.getpid()}".replace('~', '-')
+
+
+def _job_id(key):
+    """同じkeyのジョブは同じIDになる（重複投入の防止）"""
+    if key is None:
+        return uuid.uuid4().hex
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+
+
+def _to_result(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return repr(value)
+
+
+class JobQueue(abc.ABC):
+    """検索・投稿ジョブのキュー
+
+    ジョブは {'job': 'module.Class', 'method': 'execute_search', 'args': [...]}（常駐ワーカーと同じ形式）。
+    claim() したジョブは visibility_timeout 秒以内に heartbeat() か完了報告が無ければ
+    他のワーカーから再び取得できる（ワーカー・ノードの異常終了対策）。
+    fail() は max_attempts 回までバックオフ付きで再試行し、超えたらDEADにする。
+    defer() は試行回数に数えずに実行待ちへ戻す（何度延期してもDEADにはならない）。
+    claim() が返すジョブ辞書をそのまま heartbeat()/complete()/fail()/defer() に渡す。
+    """
+
+    def __init__(self, max_attempts=3, retry_delay=60, backoff_factor=2.0, max_delay=3600):
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.backoff_factor = backoff_factor
+        self.max_delay = max_delay
+        self.logger = logging.getLogger(__name__)
+
+    def _retry_delay(self, attempts):
+        return min(self.max_delay, self.retry_delay * self.backoff_factor ** (attempts - 1))
+
+    @abc.abstractmethod
+    def enqueue(self, job, method='execute_search', args=(), key=None):
+        """ジョブを追加してIDを返す。同じkeyのジョブが既にあれば追加しない"""
+
+    @abc.abstractmethod
+    def claim(self, worker_id, visibility_timeout=600):
+        """実行可能なジョブを1件取得する。無ければNone"""
+
+    @abc.abstractmethod
+    def heartbeat(self, job, visibility_timeout=600):
+        """リースを延長する。既に他のワーカーへ移っていればFalse"""
+
+    @abc.abstractmethod
+    def complete(self, job, result=None):
+        """完了を記録する。既に他のワーカーへ移っていればFalse"""
+
+    @abc.abstractmethod
+    def fail(self, job, error=None):
+        """再試行を予約してPENDINGを返す。試行回数の上限に達したらDEAD"""
+
+    @abc.abstractmethod
+    def defer(self, job, delay, error=None):
+        """試行回数を戻してdelay秒後に実行待ちへ戻す。既に他のワーカーへ移っていればFalse"""
+
+    @abc.abstractmethod
+    def requeue(self):
+        """DEADのジョブを再び実行待ちに戻し、件数を返す"""
+
+    @abc.abstractmethod
+    def counts(self):
+        """状態 -> 件数"""
+
+
+class SQLiteJobQueue(JobQueue):
+    """SQLiteによるジョブキュー（同一マシン上の複数プロセス向け）"""
+
+    def __init__(self, db_path, **kwargs):
+        super().__init__(**kwargs)
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, job TEXT NOT NULL, method TEXT NOT NULL, args TEXT NOT NULL, "
+                "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, next_attempt REAL NOT NULL, "
+                "lease_until REAL, worker TEXT, result TEXT, error TEXT, created REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, next_attempt)")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def enqueue(self, job, method='execute_search', args=(), key=None):
+        job_id = _job_id(key)
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR IGNORE INTO jobs (id, job, method, args, status, next_attempt, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, job, method, json.dumps(list(args)), PENDING, now, now, now)
+            )
+        finally:
+            conn.close()
+        return job_id
+
+    def claim(self, worker_id, visibility_timeout=600):
+        conn = self._connect()
+        try:
+            while True:
+                now = time.time()
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(
+                    "SELECT id, job, method, args, attempts FROM jobs "
+                    "WHERE (status = ? AND next_attempt <= ?) OR (status = ? AND lease_until < ?) "
+                    "ORDER BY next_attempt, created LIMIT 1",
+                    (PENDING, now, RUNNING, now)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                if row[4] >= self.max_attempts:
+                    # リース切れのまま試行回数を使い切ったジョブ
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, error = ?, lease_until = NULL, updated = ? WHERE id = ?",
+                        (DEAD, 'visibility timeout', now, row[0])
+                    )
+                    conn.execute("COMMIT")
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET status = ?, worker = ?, lease_until = ?, attempts = attempts + 1, updated = ? "
+                    "WHERE id = ?",
+                    (RUNNING, worker_id, now + visibility_timeout, now, row[0])
+                )
+                conn.execute("COMMIT")
+                return {
+                    'id': row[0], 'job': row[1], 'method': row[2], 'args': json.loads(row[3]),
+                    'attempts': row[4] + 1, 'worker': worker_id
+                }
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _update_owned(self, job, **fields):
+        """このワーカーが実行中のジョブのみ更新する"""
+        fields['updated'] = time.time()
+        columns = ', '.join(f"{key} = ?" for key in fields)
+        conn = self._connect()
+        try:
+            return conn.execute(
+                f"UPDATE jobs SET {columns} WHERE id = ? AND worker = ? AND status = ?",
+                (*fields.values(), job['id'], job['worker'], RUNNING)
+            ).rowcount == 1
+        finally:
+            conn.close()
+
+    def heartbeat(self, job, visibility_timeout=600):
+        return self._update_owned(job, lease_until=time.time() + visibility_timeout)
+
+    def complete(self, job, result=None):
+        return self._update_owned(
+            job, status=DONE, result=json.dumps(_to_result(result)), error=None, lease_until=None
+        )
+
+    def fail(self, job, error=None):
+        if job['attempts'] >= self.max_attempts:
+            self._update_owned(job, status=DEAD, error=error, lease_until=None)
+            return DEAD
+        self._update_owned(
+            job, status=PENDING, error=error, lease_until=None,
+            next_attempt=time.time() + self._retry_delay(job['attempts'])
+        )
+        return PENDING
+
+    def defer(self, job, delay, error=None):
+        return self._update_owned(
+            job, status=PENDING, attempts=job['attempts'] - 1, error=error, lease_until=None,
+            next_attempt=time.time() + delay
+        )
+
+    def requeue(self):
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "UPDATE jobs SET status = ?, attempts = 0, next_attempt = ?, updated = ? WHERE status = ?",
+                (PENDING, time.time(), time.time(), DEAD)
+            ).rowcount
+        finally:
+            conn.close()
+
+    def counts(self):
+        conn = self._connect()
+        try:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        finally:
+            conn.close()
+
+
+class FileJobQueue(JobQueue):
+    """共有フォルダ上のファイルによるジョブキュー（複数ノード向け）
+
+    ロックを使わず、ファイルの rename（同一ファイルシステム内では原子的）だけで所有権を移す。
+    pending/{実行可能時刻}~{ID}.json                -> 実行待ち
+    running/{ID}~{ワーカー}~{リース期限}.json        -> 実行中（ハートビートは期限部分のrename）
+    done/{ID}.json, dead/{ID}.json                  -> 完了・失敗
+    tmp/{ID}~{ワーカー}.json                        -> 状態を書き換え中（所有者のみ）
+    rename に失敗した場合は他のワーカーが先に取得・回収したものとして扱う。
+    """
+
+    def __init__(self, directory, **kwargs):
+        super().__init__(**kwargs)
+        self.directory = directory
+        for state in (PENDING, RUNNING, DONE, DEAD, 'tmp'):
+            os.makedirs(os.path.join(directory, state), exist_ok=True)
+
+    def _path(self, state, name):
+        return os.path.join(self.directory, state, name)
+
+    def _list(self, state):
+        try:
+            return sorted(name for name in os.listdir(os.path.join(self.directory, state)) if name.endswith('.json'))
+        except FileNotFoundError:
+            return []
+
+    @staticmethod
+    def _read(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write(self, path, record):
+        tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _take(self, path, job_id, worker_id):
+        """ファイルを自分専用のtmpへ移して所有する。他のワーカーが先に移していればNone"""
+        owned = self._path('tmp', f"{job_id}~{worker_id}.json")
+        try:
+            os.rename(path, owned)
+        except OSError:
+            return None
+        return owned
+
+    def _publish(self, owned, record, state, name):
+        self._write(owned, record)
+        os.replace(owned, self._path(state, name))
+
+    def _exists(self, job_id):
+        for state in (PENDING, RUNNING, DONE, DEAD, 'tmp'):
+            if any(job_id in name for name in self._list(state)):
+                return True
+        return False
+
+    def enqueue(self, job, method='execute_search', args=(), key=None):
+        job_id = _job_id(key)
+        if self._exists(job_id):
+            return job_id
+        now = time.time()
+        record = {
+            'id': job_id, 'job': job, 'method': method, 'args': list(args), 'attempts': 0,
+            'worker': None, 'result': None, 'error': None, 'created': now, 'updated': now
+        }
+        self._write(self._path(PENDING, f"{int(now * 1000):015d}~{job_id}.json"), record)
+        return job_id
+
+    def _reclaim_expired(self, worker_id, visibility_timeout):
+        """リース切れの実行中ジョブ・書き換え途中で止まったジョブを実行待ちへ戻す"""
+        now = time.time()
+        for name in self._list(RUNNING):
+            job_id, _, lease_until = name[:-len('.json')].split('~')
+            if int(lease_until) / 1000 >= now:
+                continue
+            owned = self._take(self._path(RUNNING, name), job_id, worker_id)
+            if owned:
+                self._requeue_owned(owned, 'visibility timeout')
+        for name in self._list('tmp'):
+            path = self._path('tmp', name)
+            try:
+                stale = os.path.getmtime(path) + visibility_timeout < now
+            except OSError:
+                continue
+            if stale:
+                job_id = name.split('~')[0]
+                owned = self._take(path, job_id, f"{worker_id}-stale")
+                if owned:
+                    self._requeue_owned(owned, 'stale')
+
+    def _requeue_owned(self, owned, error):
+        record = self._read(owned)
+        record['error'] = error
+        record['updated'] = time.time()
+        if record['attempts'] >= self.max_attempts:
+            self._publish(owned, record, DEAD, f"{record['id']}.json")
+        else:
+            self._publish(owned, record, PENDING, f"{int(time.time() * 1000):015d}~{record['id']}.json")
+
+    def claim(self, worker_id, visibility_timeout=600):
+        self._reclaim_expired(worker_id, visibility_timeout)
+        now_ms = int(time.time() * 1000)
+        for name in self._list(PENDING):
+            next_attempt, job_id = name[:-len('.json')].split('~')
+            if int(next_attempt) > now_ms:
+                # 実行可能時刻順に並んでいるため以降も対象外
+                break
+            owned = self._take(self._path(PENDING, name), job_id, worker_id)
+            if owned is None:
+                continue
+            record = self._read(owned)
+            record['attempts'] += 1
+            record['worker'] = worker_id
+            record['updated'] = time.time()
+            lease = self._path(RUNNING, f"{job_id}~{worker_id}~{int((time.time() + visibility_timeout) * 1000)}.json")
+            self._publish(owned, record, RUNNING, os.path.basename(lease))
+            return {
+                'id': job_id, 'job': record['job'], 'method': record['method'], 'args': record['args'],
+                'attempts': record['attempts'], 'worker': worker_id, 'lease': lease
+            }
+        return None
+
+    def heartbeat(self, job, visibility_timeout=600):
+        lease = self._path(
+            RUNNING, f"{job['id']}~{job['worker']}~{int((time.time() + visibility_timeout) * 1000)}.json"
+        )
+        try:
+            os.rename(job['lease'], lease)
+        except OSError:
+            return False
+        job['lease'] = lease
+        return True
+
+    def _finish(self, job, state, name, **fields):
+        owned = self._take(job['lease'], job['id'], job['worker'])
+        if owned is None:
+            self.logger.warning(f"リース切れのため結果を破棄: {job['job']} ({job['id']})")
+            return False
+        record = self._read(owned)
+        record.update(fields, updated=time.time())
+        self._publish(owned, record, state, name)
+        return True
+
+    def complete(self, job, result=None):
+        return self._finish(job, DONE, f"{job['id']}.json", result=_to_result(result), error=None)
+
+    def fail(self, job, error=None):
+        if job['attempts'] >= self.max_attempts:
+            self._finish(job, DEAD, f"{job['id']}.json", error=error)
+            return DEAD
+        next_attempt = time.time() + self._retry_delay(job['attempts'])
+        self._finish(job, PENDING, f"{int(next_attempt * 1000):015d}~{job['id']}.json", error=error)
+        return PENDING
+
+    def defer(self, job, delay, error=None):
+        next_attempt = time.time() + delay
+        return self._finish(
+            job, PENDING, f"{int(next_attempt * 1000):015d}~{job['id']}.json", attempts=job['attempts'] - 1, error=error
+        )
+
+    def requeue(self):
+        count = 0
+        for name in self._list(DEAD):
+            job_id = name[:-len('.json')]
+            owned = self._take(self._path(DEAD, name), job_id, default_worker_id())
+            if owned is None:
+                continue
+            record = self._read(owned)
+            record['attempts'] = 0
+            self._publish(owned, record, PENDING, f"{int(time.time() * 1000):015d}~{job_id}.json")
+            count += 1
+        return count
+
+    def counts(self):
+        counts = {state: len(self._list(state)) for state in (PENDING, RUNNING, DONE, DEAD)}
+        return {state: count for state, count in counts.items() if count}
+
+class JobWorker:
+    """キューからジョブを取得して実行する
+
+    実行中は heartbeat_interval 秒毎にリースを延長する。
+    戻り値が None/False または例外の場合は失敗として再試行を予約する。
+    JobDeferred の場合は失敗とせずに延期する。
+    """
+
+    def __init__(self, queue, worker_id=None, max_workers=1, visibility_timeout=600, heartbeat_interval=60):
+        self.queue = queue
+        self.worker_id = worker_id or default_worker_id()
+        self.max_workers = max_workers
+        self.visibility_timeout = visibility_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self.processed = {DONE: 0, PENDING: 0, DEAD: 0}
+
+    def _count(self, result):
+        with self._lock:
+            self.processed[result] += 1
+
+    def _heartbeat(self, job, stopped):
+        while not stopped.wait(self.heartbeat_interval):
+            if not self.queue.heartbeat(job, self.visibility_timeout):
+                self.logger.warning(f"リースを失いました: {job['job']} ({job['id']})")
+                return
+
+    def run_job(self, job):
+        stopped = threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(job, stopped), daemon=True)
+        beat.start()
+        deferred = None
+        try:
+            instance = load_class(job['job'])()
+            result = getattr(instance, job['method'])(*job['args'])
+            error = None if result not in (None, False) else f"戻り値: {result}"
+        except JobDeferred as e:
+            result, error, deferred = None, str(e), e.delay
+        except Exception as e:
+            result, error = None, str(e)
+        finally:
+            stopped.set()
+            beat.join()
+        if deferred is not None:
+            self.queue.defer(job, deferred, error)
+            self.logger.warning(f"ジョブ延期: {job['job']} ({deferred}秒後): {error}")
+            self._count(PENDING)
+        elif error is None:
+            self.queue.complete(job, result)
+            self.logger.info(f"ジョブ完了: {job['job']} ({job['attempts']}回目)")
+            self._count(DONE)
+        else:
+            state = self.queue.fail(job, error)
+            self.logger.error(f"ジョブ失敗: {job['job']} ({job['attempts']}回目, {state}): {error}")
+            self._count(state)
+
+    def _drain_one_worker(self, index):
+        # スレッド毎に別のワーカーIDでリースを持つ
+        worker_id = f"{self.worker_id}-{index}"
+        while True:
+            job = self.queue.claim(worker_id, self.visibility_timeout)
+            if job is None:
+                return
+            self.run_job(job)
+
+    def drain(self):
+        """実行可能なジョブが無くなるまで処理し、結果の件数を返す"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for future in [executor.submit(self._drain_one_worker, i) for i in range(self.max_workers)]:
+                future.result()
+        return dict(self.processed)
+
+    def run_forever(self, poll_interval=30):
+        while True:
+            self.drain()
+            time.sleep(poll_interval)
+
+
+def open_job_queue(config):
+    """JOB_QUEUE_CONFIG の backend に応じたキューを返す"""
+    options = {key: config[key] for key in ('max_attempts', 'retry_delay', 'backoff_factor', 'max_delay')}
+    if config['backend'] == 'file':
+        return FileJobQueue(config['dir'], **options)
+    return SQLiteJobQueue(config['db_path'], **options)
+
+
+def enqueue_reports(queue, reports, run_id):
+    """レポート毎の検索・投稿ジョブを追加する（同じrunの再投入は無視）"""
+    return {name: queue.enqueue(job, key=f"{run_id}:{name}") for name, job in reports.items()}
+
+
+def main(argv=None):
+    from config import JOB_QUEUE_CONFIG, PIPELINE_CONFIG
+    from search_base import SearchBase
+
+    parser = argparse.ArgumentParser(description='検索・投稿ジョブのキュー')
+    parser.add_argument('command', choices=['enqueue', 'work', 'status', 'requeue'])
+    parser.add_argument('reports', nargs='*', help='enqueue時のレポート名（省略時は全て）')
+    parser.add_argument('--loop', action='store_true', help='常駐してキューを監視する')
+    parser.add_argument('--max-workers', type=int, default=JOB_QUEUE_CONFIG['max_workers'])
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    queue = open_job_queue(JOB_QUEUE_CONFIG)
+    if args.command == 'enqueue':
+        reports = PIPELINE_CONFIG['reports']
+        if args.reports:
+            reports = {name: reports[name] for name in args.reports}
+        print(enqueue_reports(queue, reports, SearchBase.current_run_id()))
+    elif args.command == 'work':
+        worker = JobWorker(
+            queue,
+            max_workers=args.max_workers,
+            visibility_timeout=JOB_QUEUE_CONFIG['visibility_timeout'],
+            heartbeat_interval=JOB_QUEUE_CONFIG['heartbeat_interval']
+        )
+        if args.loop:
+            worker.run_forever(JOB_QUEUE_CONFIG['poll_interval'])
+        print(f"処理結果: {worker.drain()}")
+    elif args.command == 'requeue':
+        print(f"実行待ちに戻した件数: {queue.requeue()}")
+    print(f"キュー: {queue.counts()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
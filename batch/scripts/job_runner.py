@@ -0,0 +1,206 @@
+# job_runner.py
+import os
+import sys
+import glob
+import time
+import logging
+import argparse
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from freshness import FORCE_ENV
+from report_specs import load_class
+
+SUCCESS = 'success'
+FAILED = 'failed'
+TIMEOUT = 'timeout'
+SKIPPED = 'skipped'
+
+
+def discover_jobs(scripts_dir, pattern='search_*.py'):
+    """scripts_dir内のpatternに一致するスクリプト（名前順）"""
+    return sorted(glob.glob(os.path.join(scripts_dir, pattern)))
+
+
+def up_to_date_scripts(scripts, reports):
+    """本日の出力・投稿が最新のスクリプト名の集合（検索クラスの is_up_to_date() で判定）
+
+    reports: レポート名 -> '検索モジュール.クラス'（PIPELINE_CONFIG['reports']）。
+    対応する検索クラスの無いスクリプト・判定できないスクリプトは実行する。
+    """
+    classes = {f"{path.rsplit('.', 1)[0]}.py": path for path in reports.values()}
+    fresh = set()
+    for script in scripts:
+        name = os.path.basename(script)
+        if name not in classes:
+            continue
+        try:
+            searcher = load_class(classes[name])()
+            if searcher.is_up_to_date():
+                fresh.add(name)
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"鮮度判定エラー: {name} ({str(e)})")
+    return fresh
+
+
+def run_job(script, timeout=None, python=None, env=None):
+    """スクリプトを別プロセスで実行し、標準出力・標準エラーをまとめて取得する"""
+    start = time.monotonic()
+    try:
+        completed = subprocess.run(
+            [python or sys.executable, script],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            cwd=os.path.dirname(os.path.abspath(script)),
+            env=env,
+            timeout=timeout
+        )
+        output = completed.stdout
+        returncode = completed.returncode
+        status = SUCCESS if returncode == 0 else FAILED
+    except subprocess.TimeoutExpired as e:
+        # subprocess.runはタイムアウト時に子プロセスをkillしてから例外を送出する
+        output = e.output or b''
+        returncode = None
+        status = TIMEOUT
+    except Exception as e:
+        output = str(e).encode('utf-8')
+        returncode = None
+        status = FAILED
+    return {
+        'name': os.path.basename(script),
+        'status': status,
+        'returncode': returncode,
+        'duration': time.monotonic() - start,
+        'output': output.decode('utf-8', errors='replace')
+    }
+
+
+class JobRunner:
+    """検索スクリプトを同時実行数の上限付きで並列実行する
+
+    各ジョブは別プロセスで動かし、タイムアウト時はそのプロセスだけを終了する。
+    ログはジョブの記述順に、先行ジョブが終わり次第1つのファイルへ書き出す。
+    is_fresh(scripts) が返すスクリプト名は起動せずSKIPPEDとする（force=Trueの場合は全て起動する）。
+    """
+
+    def __init__(self, logs_dir, max_workers=4, timeout=1800, timeouts=None, max_logs=30, python=None, force=False,
+                 is_fresh=None):
+        os.makedirs(logs_dir, exist_ok=True)
+        self.logs_dir = logs_dir
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self.max_logs = max_logs
+        self.python = python or sys.executable
+        self.force = force
+        self.is_fresh = is_fresh
+        self.logger = logging.getLogger(__name__)
+
+    def _rotate_logs(self):
+        """古いログを削除（最新max_logs件を保持）"""
+        logs = sorted(glob.glob(os.path.join(self.logs_dir, '*.log')), key=os.path.getmtime, reverse=True)
+        for path in logs[self.max_logs:]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                self.logger.warning(f"ログ削除エラー: {path} ({str(e)})")
+
+    def _job_env(self):
+        env = os.environ.copy()
+        env['PYTHONIOENCODING'] = 'utf-8'
+        # 同じバッチのジョブは同じrunの予算を共有する
+        env.setdefault('GENNOTE_RUN_ID', datetime.now().strftime('%Y-%m-%d'))
+        if self.force:
+            # 最新の出力・投稿があっても作り直す
+            env[FORCE_ENV] = '1'
+        return env
+
+    def run(self, scripts, log_path=None, envs=None):
+        """全ジョブを実行し、記述順の結果リストを返す
+
+        envs: {スクリプト名: 追加する環境変数} （ジョブ毎の設定）
+        """
+        envs = envs or {}
+        if log_path is None:
+            self._rotate_logs()
+            log_path = os.path.join(self.logs_dir, f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.log")
+        env = self._job_env()
+        fresh = self.is_fresh(scripts) if self.is_fresh is not None and not self.force else set()
+        results = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor, \
+                open(log_path, 'a', encoding='utf-8') as log:
+            futures = [
+                None if os.path.basename(script) in fresh else executor.submit(
+                    run_job, script,
+                    self.timeouts.get(os.path.basename(script), self.timeout),
+                    self.python, {**env, **envs.get(os.path.basename(script), {})}
+                )
+                for script in scripts
+            ]
+            for script, future in zip(scripts, futures):
+                if future is None:
+                    result = {'name': os.path.basename(script), 'status': SKIPPED, 'returncode': None,
+                              'duration': 0.0, 'output': ''}
+                else:
+                    result = future.result()
+                results.append(result)
+                self._write_result(log, result)
+                self.logger.info(f"[{result['status'].upper()}] {result['name']} ({result['duration']:.1f}秒)")
+        self.log_path = log_path
+        return results
+
+    @staticmethod
+    def _write_result(log, result):
+        log.write(f"[START] {result['name']}\n")
+        log.write(result['output'])
+        if result['output'] and not result['output'].endswith('\n'):
+            log.write('\n')
+        if result['status'] == SUCCESS:
+            log.write(f"[SUCCESS] COMPLETED: {result['name']} ({result['duration']:.1f}s)\n")
+        elif result['status'] == SKIPPED:
+            log.write(f"[SKIPPED] UP TO DATE: {result['name']}\n")
+        elif result['status'] == TIMEOUT:
+            log.write(f"[ERROR] TIMEOUT: {result['name']} ({result['duration']:.1f}s)\n")
+        else:
+            log.write(f"[ERROR] FAILED: {result['name']} (exit {result['returncode']})\n")
+        log.flush()
+
+
+def main(argv=None):
+    from config import PIPELINE_CONFIG, RUNNER_CONFIG
+
+    parser = argparse.ArgumentParser(description='検索スクリプトの並列実行')
+    parser.add_argument('scripts', nargs='*', help='実行するスクリプト名（省略時はsearch_*.py全て）')
+    parser.add_argument('--max-workers', type=int, default=RUNNER_CONFIG['max_workers'])
+    parser.add_argument('--timeout', type=int, default=RUNNER_CONFIG['timeout'])
+    parser.add_argument('--force', action='store_true', help='最新の出力・投稿があっても作り直す')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    scripts_dir = RUNNER_CONFIG['scripts_dir']
+    if args.scripts:
+        scripts = [os.path.join(scripts_dir, name) for name in args.scripts]
+    else:
+        scripts = discover_jobs(scripts_dir, RUNNER_CONFIG['pattern'])
+
+    runner = JobRunner(
+        RUNNER_CONFIG['logs_dir'],
+        max_workers=args.max_workers,
+        timeout=args.timeout,
+        timeouts=RUNNER_CONFIG['timeouts'],
+        max_logs=RUNNER_CONFIG['max_logs'],
+        force=args.force,
+        is_fresh=lambda scripts: up_to_date_scripts(scripts, PIPELINE_CONFIG['reports'])
+    )
+    results = runner.run(scripts)
+    failed = [result['name'] for result in results if result['status'] not in (SUCCESS, SKIPPED)]
+    print(f"All processes completed. Log: {runner.log_path}")
+    if failed:
+        print(f"[ERROR] {len(failed)}件失敗: {', '.join(failed)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+# json_extract.py
+import re
+import json
+
+from stream_filter import ThinkTagStripper
+
+_DECODER = json.JSONDecoder()
+_CLOSERS = {'{': '}', '[': ']'}
+# 走査で意味を持つ文字だけを拾う（それ以外の文字は読み飛ばす）
+_TOKENS = re.compile(r'[{}\[\]"]')
+# 括弧内の文字列リテラル（JSONの文字列は改行を含まないため、閉じられない引用符は行末まで）
+_STRING = re.compile(r'"(?:[^"\\\n]|\\.)*(?:"|\n|$)')
+# JSONの開き括弧の直後に来得る文字（文中の {注記} や [注] は候補にしない）
+_STARTS = {'{': re.compile(r'\s*["}]'), '[': re.compile(r'\s*[-\d"{\[\]tfn]')}
+# 修復: 文字列リテラルはそのまま残し、// コメントと閉じ括弧直前のカンマを除く
+_REPAIRS = re.compile(r'"(?:\\.|[^"\\\n])*"|//[^\n]*|,(?=\s*[}\]])')
+
+
+def strip_think(text):
+    """<think>…</think> を除いた本文（閉じられていないthinkは以降を破棄）"""
+    stripper = ThinkTagStripper()
+    return stripper.feed(text) + stripper.flush()
+
+
+def _spans(text):
+    """対応の取れた括弧の範囲を1回の走査で列挙し、最上位の括弧が閉じる毎に (開始, 終了, 深さ) のリストを返す
+
+    深さは最上位が0。括弧内の文字列リテラル中の括弧は数えない。対応しない閉じ括弧があればそれまでの範囲を捨てる。
+    途中で切れた応答（閉じない括弧）の内側は返さない。
+    """
+    stack, spans = [], []
+    skip = 0
+    for match in _TOKENS.finditer(text):
+        index, char = match.start(), match.group()
+        if index < skip:
+            continue
+        if char == '"':
+            if stack:
+                skip = _STRING.match(text, index).end()
+        elif char in _CLOSERS:
+            if stack or _STARTS[char].match(text, index + 1):
+                stack.append((index, char))
+        elif char in '}]':
+            if not stack or _CLOSERS[stack[-1][1]] != char:
+                stack, spans = [], []
+                continue
+            start, _ = stack.pop()
+            spans.append((start, index + 1, len(stack)))
+            if not stack:
+                yield spans
+                spans = []
+
+
+def _decode(text, start, end):
+    # 深い入れ子は json が RecursionError を送出するため読めない範囲として扱う
+    try:
+        value, stop = _DECODER.raw_decode(text, start)
+        if stop == end:
+            return True, value
+    except (ValueError, RecursionError):
+        pass
+    repaired = _REPAIRS.sub(lambda m: m.group() if m.group().startswith('"') else '', text[start:end])
+    try:
+        return True, json.loads(repaired)
+    except (ValueError, RecursionError):
+        return False, None
+
+
+def iter_json(text):
+    """text中のJSONオブジェクト・配列を出現順に (値, 開始, 終了) で返す
+
+    最上位の範囲が読めない場合（例: 文中の {注記} が本体を囲む）は1段内側の範囲を順に試す。
+    読めた範囲・読めなかった内側の範囲の更に内側は試さない（各文字のデコードは高々2回）。
+    """
+    # 応答全体がJSONの場合（多くの応答）は走査しない
+    start = len(text) - len(text.lstrip())
+    end = len(text.rstrip())
+    if text[start:start + 1] in _CLOSERS:
+        ok, value = _decode(text, start, end)
+        if ok:
+            yield value, start, end
+            return
+    for spans in _spans(text):
+        # 最上位の範囲は最後に閉じる
+        start, end, _ = spans[-1]
+        ok, value = _decode(text, start, end)
+        if ok:
+            yield value, start, end
+            continue
+        for start, end, _ in sorted(span for span in spans if span[2] == 1):
+            ok, value = _decode(text, start, end)
+            if ok:
+                yield value, start, end
+
+
+def extract_json(text, keys=(), types=(dict,)):
+    """LLMの応答から目的のJSONを取り出す（見つからなければNone）
+
+    think・コードブロック・説明文・引用番号（[1]）が混在していてもよい。
+    候補が複数ある場合は keys のうち含むキーが多いもの、同数なら長いものを選ぶ。
+    """
+    if not text:
+        return None
+    best, best_rank = None, None
+    for value, start, end in iter_json(strip_think(text)):
+        if not isinstance(value, types):
+            continue
+        rank = (sum(key in value for key in keys) if isinstance(value, dict) else 0, end - start)
+        if best_rank is None or rank > best_rank:
+            best, best_rank = value, rank
+    return best
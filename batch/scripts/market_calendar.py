@@ -0,0 +1,166 @@
+# market_calendar.py
+from datetime import date, datetime, time, timedelta, timezone
+
+JPX = 'jpx'
+US = 'us'
+JST = timezone(timedelta(hours=+9), 'JST')
+# 米国市場の大引け（東部時間）
+US_CLOSE = time(16, 0)
+
+
+def _nth_weekday(year, month, weekday, n):
+    """month月の第n weekday（月曜=0）。n=-1で最終"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _equinoxes(year):
+    """春分日・秋分日（1980-2099年の近似式）"""
+    offset = 0.242194 * (year - 1980) - (year - 1980) // 4
+    return date(year, 3, int(20.8431 + offset)), date(year, 9, int(23.2488 + offset))
+
+
+def _easter(year):
+    """復活祭（グレゴリオ暦）"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    return date(year, month, (h + l - 7 * m + 114) % 31 + 1)
+
+
+def japan_holidays(year):
+    """国民の祝日（振替休日・国民の休日を含む）"""
+    vernal, autumnal = _equinoxes(year)
+    holidays = {
+        date(year, 1, 1): '元日',
+        _nth_weekday(year, 1, 0, 2): '成人の日',
+        date(year, 2, 11): '建国記念の日',
+        date(year, 2, 23): '天皇誕生日',
+        vernal: '春分の日',
+        date(year, 4, 29): '昭和の日',
+        date(year, 5, 3): '憲法記念日',
+        date(year, 5, 4): 'みどりの日',
+        date(year, 5, 5): 'こどもの日',
+        _nth_weekday(year, 7, 0, 3): '海の日',
+        date(year, 8, 11): '山の日',
+        _nth_weekday(year, 9, 0, 3): '敬老の日',
+        autumnal: '秋分の日',
+        _nth_weekday(year, 10, 0, 2): 'スポーツの日',
+        date(year, 11, 3): '文化の日',
+        date(year, 11, 23): '勤労感謝の日',
+    }
+    # 祝日に挟まれた平日は国民の休日
+    for day in sorted(holidays):
+        between = day + timedelta(days=1)
+        if between not in holidays and between + timedelta(days=1) in holidays and between.weekday() != 6:
+            holidays[between] = '国民の休日'
+    # 日曜の祝日は次の祝日でない日が振替休日
+    for day in sorted(holidays):
+        if day.weekday() == 6:
+            substitute = day + timedelta(days=1)
+            while substitute in holidays:
+                substitute += timedelta(days=1)
+            holidays[substitute] = '振替休日'
+    return holidays
+
+
+def jpx_holidays(year):
+    """東証の休業日（土日を除く）: 祝日と年末年始"""
+    holidays = japan_holidays(year)
+    for month, day in ((1, 2), (1, 3), (12, 31)):
+        holidays.setdefault(date(year, month, day), '年末年始')
+    return holidays
+
+
+def _observed(day):
+    """土曜の祝日は前日、日曜の祝日は翌日に休場"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def us_holidays(year):
+    """NYSEの休場日（土日を除く）"""
+    holidays = {
+        _nth_weekday(year, 1, 0, 3): 'Martin Luther King Jr. Day',
+        _nth_weekday(year, 2, 0, 3): "Washington's Birthday",
+        _easter(year) - timedelta(days=2): 'Good Friday',
+        _nth_weekday(year, 5, 0, -1): 'Memorial Day',
+        _observed(date(year, 7, 4)): 'Independence Day',
+        _nth_weekday(year, 9, 0, 1): 'Labor Day',
+        _nth_weekday(year, 11, 3, 4): 'Thanksgiving Day',
+        _observed(date(year, 12, 25)): 'Christmas Day',
+    }
+    # 元日が土曜の場合は前年末に振り替えない
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays[_observed(new_year)] = "New Year's Day"
+    if year >= 2022:
+        holidays[_observed(date(year, 6, 19))] = 'Juneteenth'
+    return holidays
+
+
+def _us_eastern(moment):
+    """aware datetime を米国東部時間（夏時間: 3月第2日曜 2:00 〜 11月第1日曜 2:00）の naive datetime に変換"""
+    utc = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    dst_start = datetime.combine(_nth_weekday(utc.year, 3, 6, 2), time(7))
+    dst_end = datetime.combine(_nth_weekday(utc.year, 11, 6, 1), time(6))
+    return utc + timedelta(hours=-4 if dst_start <= utc < dst_end else -5)
+
+
+
+
+class MarketCalendar:
+    """取引所の営業日カレンダー（祝日は規則から算出し、臨時休場は extra_holidays で追加）"""
+
+    RULES = {JPX: jpx_holidays, US: us_holidays}
+
+    def __init__(self, market, extra_holidays=()):
+        if market not in self.RULES:
+            raise ValueError(f"未対応の市場です: {market}")
+        self.market = market
+        self.extra_holidays = {date.fromisoformat(day) if isinstance(day, str) else day for day in extra_holidays}
+        self._cache = {}
+
+    def holidays(self, year):
+        if year not in self._cache:
+            holidays = self.RULES[self.market](year)
+            for day in self.extra_holidays:
+                if day.year == year:
+                    holidays.setdefault(day, '臨時休場')
+            self._cache[year] = holidays
+        return self._cache[year]
+
+    def session_date(self, moment):
+        """moment（aware datetime）の時点で対象とする取引日（現地の暦日。休場日かは holiday_name で判定）
+
+        JPXは日本時間の当日。USは現地の大引け後なら当日、前なら前日（日本の朝は前日の米国市場）。
+        """
+        if self.market == US:
+            local = _us_eastern(moment)
+            return local.date() if local.time() >= US_CLOSE else local.date() - timedelta(days=1)
+        return moment.astimezone(JST).date()
+
+    def holiday_name(self, day):
+        if day.weekday() >= 5:
+            return '土日'
+        return self.holidays(day.year).get(day)
+
+    def is_trading_day(self, day):
+        return self.holiday_name(day) is None
+
+    def previous_trading_day(self, day):
+        day -= timedelta(days=1)
+        while not self.is_trading_day(day):
+            day -= timedelta(days=1)
+        return day
@@ -0,0 +1,180 @@
+# pipeline.py
+import sys
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from report_specs import load_class
+
+
+SUCCESS = 'success'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+
+class Pipeline:
+    """依存関係を宣言したステージを並列に実行する
+
+    requires: 全て成功した場合のみ実行する依存（失敗・スキップは下流へ伝播）
+    after: 結果を問わず完了を待つだけの依存
+    ステージ関数の戻り値は results に保存し、False/None/例外は失敗とみなす。
+    依存関係のない枝は互いの失敗に影響されない。
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self.stages = {}
+        self.status = {}
+        self.results = {}
+        self.logger = logging.getLogger(__name__)
+
+    def add(self, name, func, requires=(), after=()):
+        if name in self.stages:
+            raise ValueError(f"ステージ名が重複しています: {name}")
+        self.stages[name] = {'func': func, 'requires': list(requires), 'after': list(after)}
+        return name
+
+    def _validate(self):
+        for name, stage in self.stages.items():
+            for dep in stage['requires'] + stage['after']:
+                if dep not in self.stages:
+                    raise ValueError(f"未定義の依存ステージです: {name} -> {dep}")
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"依存関係が循環しています: {name}")
+            visiting.add(name)
+            for dep in self.stages[name]['requires'] + self.stages[name]['after']:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def _run_stage(self, name):
+        try:
+            result = self.stages[name]['func']()
+        except Exception as e:
+            self.logger.error(f"ステージ失敗: {name} ({str(e)})")
+            return FAILED, None
+        if result is None or result is False:
+            self.logger.error(f"ステージ失敗: {name}")
+            return FAILED, result
+        return SUCCESS, result
+
+    def _ready(self, name):
+        stage = self.stages[name]
+        return all(dep in self.status for dep in stage['requires'] + stage['after'])
+
+    def run(self):
+        """全ステージを実行し、ステージ名 -> SUCCESS/FAILED/SKIPPED を返す"""
+        self._validate()
+        pending = [name for name in self.stages if name not in self.status]
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                for name in list(pending):
+                    if not self._ready(name):
+                        continue
+                    pending.remove(name)
+                    failed = [dep for dep in self.stages[name]['requires'] if self.status[dep] != SUCCESS]
+                    if failed:
+                        self.status[name] = SKIPPED
+                        self.logger.warning(f"ステージをスキップ: {name} (依存失敗: {', '.join(failed)})")
+                        continue
+                    self.logger.info(f"ステージ開始: {name}")
+                    running[executor.submit(self._run_stage, name)] = name
+                if not running:
+                    # スキップの伝播で新たに実行可能になったステージを再確認
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    self.status[name], self.results[name] = future.result()
+                    if self.status[name] == SUCCESS:
+                        self.logger.info(f"ステージ完了: {name}")
+        return dict(self.status)
+
+def build_daily_pipeline(reports, max_workers=4, summary=True, publish=True, force=False):
+    """レポート毎に search -> post の枝を作り、全レポートの保存後にGemini要約を実行する
+
+    reports の値は '検索モジュール.クラス' または検索クラスを生成する関数。
+    post は投稿キューへの追加のみで、最後の publish で投稿キューをまとめて処理する。
+    force=True の場合は各検索クラスの force を立て、最新の出力・投稿・キャッシュ済みの応答があっても作り直す。
+    """
+    pipeline = Pipeline(max_workers=max_workers)
+    searchers = {}
+    search_stages = []
+    post_stages = []
+
+    def search(name, factory):
+        if isinstance(factory, str):
+            factory = load_class(factory)
+        searchers[name] = factory()
+        if force:
+            searchers[name].force = True
+        return searchers[name].search()
+
+    for name, class_path in reports.items():
+        search_stages.append(pipeline.add(f"{name}.search", lambda n=name, c=class_path: search(n, c)))
+        post_stages.append(
+            pipeline.add(f"{name}.post", lambda n=name: searchers[n].post(), requires=[f"{name}.search"])
+        )
+
+    if summary:
+        def summarize():
+            # 本日のパイプラインで保存できたレポートのみを要約する
+            file_paths = [pipeline.results[stage] for stage in search_stages
+                          if pipeline.status.get(stage) == SUCCESS and isinstance(pipeline.results[stage], str)]
+            if not file_paths:
+                return None
+            from summary_gemini import GeminiSummarizer
+            return GeminiSummarizer(max_files=len(file_paths)).summarize(file_paths)
+
+        def post_summary():
+            from summary_gemini import GeminiSummaryPoster
+            return GeminiSummaryPoster().post_content(pipeline.results['summary'])
+
+        pipeline.add('summary', summarize, after=search_stages)
+        post_stages.append(pipeline.add('summary.post', post_summary, requires=['summary']))
+
+    if publish:
+        def drain_publish_queue():
+            from publish_worker import drain
+            return drain()
+
+        pipeline.add('publish', drain_publish_queue, after=post_stages)
+    return pipeline
+
+
+def main(argv=None):
+    from config import PIPELINE_CONFIG
+
+    parser = argparse.ArgumentParser(description='日次レポートのパイプライン実行')
+    parser.add_argument('reports', nargs='*', help='実行するレポート名（省略時は全て）')
+    parser.add_argument('--no-summary', action='store_true', help='Gemini要約を実行しない')
+    parser.add_argument('--no-publish', action='store_true', help='投稿キューを処理しない')
+    parser.add_argument('--max-workers', type=int, default=PIPELINE_CONFIG['max_workers'])
+    parser.add_argument('--force', action='store_true', help='最新の出力・投稿があっても作り直す')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    reports = PIPELINE_CONFIG['reports']
+    if args.reports:
+        reports = {name: reports[name] for name in args.reports}
+    pipeline = build_daily_pipeline(
+        reports, max_workers=args.max_workers, summary=not args.no_summary, publish=not args.no_publish,
+        force=args.force
+    )
+    status = pipeline.run()
+    for name, result in status.items():
+        print(f"[{result.upper()}] {name}")
+    return 0 if all(result == SUCCESS for result in status.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,20 +2,37 @@
 import os
 import requests
 import base64
-import markdown
 import re
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
+import time
 import logging
 from datetime import datetime
 from xml.sax.saxutils import escape
+import threading
+from config import HTTP_CONFIG, PUBLISH_CONFIG, RATE_LIMIT_CONFIG
+from publish_queue import PublishQueue, DONE, PENDING, DEAD, HOLD
+from retry_policy import RetryPolicy
+from telemetry import record_call
 
 class PostBase:
+    # 全プロセスで共有する投稿キュー
+    _publish_queue = None
+    _publish_queue_lock = threading.Lock()
+
     def __init__(self):
         load_dotenv('M:/ML/ChatGPT/gennote/.env')
         self.hatena_id = os.getenv('HATENA_ID')
         self.hatena_api_key = os.getenv('HATENA_API_KEY')
         self.blog_domain = 'kafkafinancialgroup.hatenablog.com'
+        # 投稿は非冪等のため、未処理が確実な失敗（接続不可・429/503）のみ再試行
+        self.post_retry_policy = RetryPolicy.from_config(
+            RATE_LIMIT_CONFIG['retry_config'],
+            name='hatena',
+            idempotent=False,
+            safe_exceptions=(requests.exceptions.ConnectTimeout,)
+        )
+        # 投稿キュー上の識別名（日付を付けてsourceにする）
+        self.publish_source = type(self).__name__
         self._setup_logging()
 
     def _setup_logging(self):
@@ -44,7 +61,9 @@ class PostBase:
         # Markdownの前処理
         content = self._clean_markdown_symbols(content)
         
-        # Markdown変換
+        # Markdown変換（markdown・bs4は描画時にのみ読み込む）
+        import markdown
+        from bs4 import BeautifulSoup
         md = markdown.Markdown(extensions=['extra', 'nl2br', 'tables', 'fenced_code'])
         html_content = md.convert(content)
         
@@ -113,28 +132,100 @@ class PostBase:
 
         return entry_xml
 
+    @classmethod
+    def get_publish_queue(cls):
+        """PUBLISH_CONFIGに基づく共有投稿キューの取得"""
+        if PostBase._publish_queue is None:
+            with PostBase._publish_queue_lock:
+                if PostBase._publish_queue is None:
+                    PostBase._publish_queue = PublishQueue(
+                        PUBLISH_CONFIG['db_path'],
+                        max_attempts=PUBLISH_CONFIG['max_attempts'],
+                        retry_delay=PUBLISH_CONFIG['retry_delay'],
+                        backoff_factor=PUBLISH_CONFIG['backoff_factor'],
+                        max_delay=PUBLISH_CONFIG['max_delay']
+                    )
+        return PostBase._publish_queue
+
+    def publish(self, entry_xml, title=None):
+        """エントリを投稿キューへ追加（queueモード以外は直接投稿）。(成否, URL) を返す"""
+        if PUBLISH_CONFIG['mode'] != 'queue':
+            return self.post_to_hatena(entry_xml)
+        try:
+            source = self._publish_source_today()
+            entry_id = self.get_publish_queue().enqueue(source, entry_xml, title)
+            self.logger.info(f"投稿キューに追加: {source} (id={entry_id})")
+            return True, None
+        except Exception as e:
+            # キューに積めない場合は従来通り直接投稿する
+            self.logger.error(f"Publish Queue Error: {str(e)}")
+            return self.post_to_hatena(entry_xml)
+
+    def _publish_source_today(self):
+        return f"{self.publish_source}:{datetime.now().strftime('%Y-%m-%d')}"
+
+    def publish_status(self):
+        """本日分のエントリの投稿キュー上の状態（queueモード以外・未登録はNone）"""
+        if PUBLISH_CONFIG['mode'] != 'queue':
+            return None
+        try:
+            return self.get_publish_queue().latest_status(self._publish_source_today())
+        except Exception as e:
+            self.logger.error(f"Publish Queue Error: {str(e)}")
+            return None
+
+    def post_queued_entry(self, entry):
+        """PublishWorker用: キューのエントリを投稿し (結果, URL, エラー) を返す"""
+        success, url, outcome, error = self._send_entry(entry['entry_xml'])
+        return outcome, url, error
+
     def post_to_hatena(self, entry_xml):
+        success, url, _, _ = self._send_entry(entry_xml)
+        return success, url
+
+    @staticmethod
+    def _failure_outcome(status_code):
+        """201以外の応答の投稿キュー上の結果（想定外の2xx・3xxは投稿されたか不明なため保留）"""
+        if status_code == 429 or status_code >= 500:
+            return PENDING
+        if 400 <= status_code < 500:
+            return DEAD
+        return HOLD
+
+    def _send_entry(self, entry_xml):
+        """はてなブログへ投稿し (成否, URL, 投稿キュー上の結果, エラー) を返す
+
+        429・5xxの応答と接続前の失敗は未投稿が確実なため再試行（PENDING）、それ以外の4xx
+        （認証エラー・不正なエントリ等）は再試行しても成功しないためDEADとする。
+        それ以外の例外は投稿されたか不明なためHOLDとする。
+        """
         endpoint = f'https://blog.hatena.ne.jp/{self.hatena_id}/{self.blog_domain}/atom/entry'
         auth = base64.b64encode(f"{self.hatena_id}:{self.hatena_api_key}".encode()).decode()
 
+        start = time.monotonic()
         try:
-            response = requests.post(
+            response = self.post_retry_policy.call(
+                requests.post,
                 endpoint,
                 headers={
                     'Content-Type': 'application/xml; charset=utf-8',
                     'Authorization': f'Basic {auth}'
                 },
-                data=entry_xml.encode('utf-8')
+                data=entry_xml.encode('utf-8'),
+                timeout=HTTP_CONFIG['timeout']
             )
+            record_call('hatena', start, searcher=type(self).__name__, status=response.status_code,
+                        response_bytes=len(response.content))
             
             if response.status_code == 201:
                 self.logger.info(f'投稿成功: {response.headers.get("Location")}')
-                return True, response.headers.get('Location')
+                return True, response.headers.get('Location'), DONE, None
             else:
                 self.logger.error(f"APIエラー: ステータスコード {response.status_code}")
                 self.logger.error(f"エラー詳細: {response.text}")
-                return False, None
+                return False, None, self._failure_outcome(response.status_code), f"HTTP {response.status_code}"
 
         except Exception as e:
             self.logger.error(f"Post Error: {str(e)}")
-            return False, None
+            record_call('hatena', start, searcher=type(self).__name__, status='error')
+            return False, None, (PENDING if isinstance(e, requests.exceptions.ConnectTimeout) else HOLD), str(e)
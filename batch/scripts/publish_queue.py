@@ -0,0 +1,248 @@
+# publish_queue.py
+import os
+import time
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+PENDING = 'pending'
+POSTING = 'posting'
+DONE = 'done'
+DEAD = 'dead'
+HOLD = 'hold'
+
+
+class PublishQueue:
+    """投稿待ちエントリを保存するSQLiteキュー
+
+    検索側は enqueue() で描画済みのエントリXMLを積むだけで、投稿はワーカーが行う。
+    投稿済みか判断できない失敗は二重投稿を避けるため HOLD として自動再試行しない。
+    claim() したエントリが lease 秒以内に完了しない場合（ワーカー異常終了等）も投稿済みか
+    判断できないため、再取得せず HOLD にする。期限切れ後の結果の書き込みは無視する。
+    """
+
+    def __init__(self, db_path, max_attempts=5, retry_delay=60, backoff_factor=2.0, max_delay=3600):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.backoff_factor = backoff_factor
+        self.max_delay = max_delay
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, source TEXT NOT NULL, title TEXT, "
+                "entry_xml TEXT NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+                "next_attempt REAL NOT NULL, lease_until REAL, url TEXT, error TEXT, "
+                "created REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_status ON entries (status, next_attempt)")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def enqueue(self, source, entry_xml, title=None):
+        """エントリを追加してIDを返す
+
+        同じsourceの未投稿エントリがあれば内容を差し替え、投稿中のエントリがあれば追加せずにそのIDを返す。
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id, status FROM entries WHERE source = ? AND status IN (?, ?)", (source, PENDING, POSTING)
+            ).fetchone()
+            if row:
+                entry_id = row[0]
+                if row[1] == PENDING:
+                    conn.execute(
+                        "UPDATE entries SET entry_xml = ?, title = ?, updated = ? WHERE id = ?",
+                        (entry_xml, title, now, entry_id)
+                    )
+            else:
+                entry_id = conn.execute(
+                    "INSERT INTO entries (source, title, entry_xml, status, next_attempt, created, updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (source, title, entry_xml, PENDING, now, now, now)
+                ).lastrowid
+            conn.execute("COMMIT")
+            return entry_id
+        except Exception:
+            # BEGIN IMMEDIATE自体が失敗した場合はトランザクションが無い
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def claim(self, lease=300):
+        """投稿可能なエントリを1件取得して投稿中にする。無ければNone
+
+        lease の期限が切れた投稿中のエントリは、取得前にまとめて HOLD にする。
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE entries SET status = ?, error = ?, lease_until = NULL, updated = ? "
+                "WHERE status = ? AND lease_until < ?",
+                (HOLD, 'lease expired while posting', now, POSTING, now)
+            )
+            row = conn.execute(
+                "SELECT id, source, title, entry_xml, attempts FROM entries "
+                "WHERE status = ? AND next_attempt <= ? ORDER BY next_attempt, id LIMIT 1",
+                (PENDING, now)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE entries SET status = ?, lease_until = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+                (POSTING, now + lease, now, row[0])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            # BEGIN IMMEDIATE自体が失敗した場合はトランザクションが無い
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return {'id': row[0], 'source': row[1], 'title': row[2], 'entry_xml': row[3], 'attempts': row[4] + 1,
+                'lease_until': now + lease}
+
+    def _update_owned(self, entry, **fields):
+        """claim() したままのエントリのみ更新する（期限切れでHOLDになった後の書き込みは無視）"""
+        fields['updated'] = time.time()
+        columns = ', '.join(f"{key} = ?" for key in fields)
+        conn = self._connect()
+        try:
+            return conn.execute(
+                f"UPDATE entries SET {columns} WHERE id = ? AND status = ? AND lease_until = ?",
+                (*fields.values(), entry['id'], POSTING, entry['lease_until'])
+            ).rowcount == 1
+        finally:
+            conn.close()
+
+    def complete(self, entry, url=None):
+        return self._update_owned(entry, status=DONE, url=url, error=None, lease_until=None)
+
+    def retry_later(self, entry, error=None):
+        """再試行を予約。試行回数の上限に達したらDEADにする"""
+        attempts = entry['attempts']
+        if attempts >= self.max_attempts:
+            self._update_owned(entry, status=DEAD, error=error, lease_until=None)
+            return DEAD
+        delay = min(self.max_delay, self.retry_delay * self.backoff_factor ** (attempts - 1))
+        self._update_owned(entry, status=PENDING, error=error, lease_until=None, next_attempt=time.time() + delay)
+        return PENDING
+
+    def fail(self, entry, error=None):
+        """未投稿が確実で再試行しても成功しないエントリ（認証エラー等）をDEADにする"""
+        return self._update_owned(entry, status=DEAD, error=error, lease_until=None)
+
+    def hold(self, entry, error=None):
+        """投稿されたか不明なエントリを保留（requeue()するまで再試行しない）"""
+        return self._update_owned(entry, status=HOLD, error=error, lease_until=None)
+
+    def requeue(self, statuses=(DEAD, HOLD)):
+        """保留・失敗したエントリを再び投稿待ちに戻す"""
+        placeholders = ', '.join('?' for _ in statuses)
+        conn = self._connect()
+        try:
+            return conn.execute(
+                f"UPDATE entries SET status = ?, attempts = 0, next_attempt = ?, updated = ? "
+                f"WHERE status IN ({placeholders})",
+                (PENDING, time.time(), time.time(), *statuses)
+            ).rowcount
+        finally:
+            conn.close()
+
+    def latest_status(self, source):
+        """sourceの最新エントリの状態（無ければNone）"""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT status FROM entries WHERE source = ? ORDER BY id DESC LIMIT 1", (source,)
+            ).fetchone()
+            return row[0] if row else None
+        finally:
+            conn.close()
+
+    def counts(self):
+        conn = self._connect()
+        try:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM entries GROUP BY status").fetchall())
+        finally:
+            conn.close()
+
+
+class PublishWorker:
+    """キューのエントリを投稿する
+
+    post_func(entry) は (結果, url, エラー) を返す。結果は DONE / PENDING（再試行可）/ DEAD（再試行不可）/ HOLD。
+    """
+
+    def __init__(self, queue, post_func, max_workers=2, lease=300):
+        self.queue = queue
+        self.post_func = post_func
+        self.max_workers = max_workers
+        self.lease = lease
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self.processed = {DONE: 0, PENDING: 0, DEAD: 0, HOLD: 0}
+
+    def _count(self, result):
+        with self._lock:
+            self.processed[result] += 1
+
+    def _process(self, entry):
+        try:
+            result, url, error = self.post_func(entry)
+        except Exception as e:
+            # 送信前後のどちらで失敗したか分からないため保留
+            result, url, error = HOLD, None, str(e)
+        if result == DONE:
+            if self.queue.complete(entry, url):
+                self.logger.info(f"投稿完了 [{entry['source']}]: {url}")
+            else:
+                # 投稿中に期限切れでHOLDになっている。requeue()すると二重投稿になる
+                self.logger.error(f"投稿完了したが期限切れで保留済み [{entry['source']}]: {url}")
+        elif result == PENDING:
+            result = self.queue.retry_later(entry, error)
+            self.logger.warning(f"投稿失敗 [{entry['source']}] ({entry['attempts']}回目, {result}): {error}")
+        elif result == DEAD:
+            self.queue.fail(entry, error)
+            self.logger.error(f"投稿失敗（再試行不可） [{entry['source']}]: {error}")
+        else:
+            result = HOLD
+            self.queue.hold(entry, error)
+            self.logger.error(f"投稿結果が不明のため保留 [{entry['source']}]: {error}")
+        self._count(result)
+
+    def _drain_one_worker(self):
+        while True:
+            entry = self.queue.claim(self.lease)
+            if entry is None:
+                return
+            self._process(entry)
+
+    def drain(self):
+        """投稿可能なエントリが無くなるまで並列に投稿し、結果の件数を返す"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for future in [executor.submit(self._drain_one_worker) for _ in range(self.max_workers)]:
+                future.result()
+        return dict(self.processed)
+
+    def run_forever(self, poll_interval=30):
+        while True:
+            self.drain()
+            time.sleep(poll_interval)
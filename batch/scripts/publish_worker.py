@@ -0,0 +1,40 @@
+# publish_worker.py
+import sys
+import logging
+import argparse
+from config import PUBLISH_CONFIG
+from post_base import PostBase
+from publish_queue import PublishWorker
+
+
+def drain(loop=False):
+    """投稿キューを処理する（loop=Trueの場合は常駐してポーリング）"""
+    poster = PostBase()
+    worker = PublishWorker(
+        poster.get_publish_queue(),
+        poster.post_queued_entry,
+        max_workers=PUBLISH_CONFIG['max_workers'],
+        lease=PUBLISH_CONFIG['lease']
+    )
+    if loop:
+        worker.run_forever(PUBLISH_CONFIG['poll_interval'])
+    return worker.drain()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='投稿キューのはてなブログへの投稿')
+    parser.add_argument('--loop', action='store_true', help='常駐してキューを監視する')
+    parser.add_argument('--requeue', action='store_true', help='保留・失敗したエントリを投稿待ちに戻す')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    queue = PostBase.get_publish_queue()
+    if args.requeue:
+        print(f"投稿待ちに戻した件数: {queue.requeue()}")
+    processed = drain(loop=args.loop)
+    print(f"処理結果: {processed} / キュー: {queue.counts()}")
+    return 0 if not processed.get('dead') and not processed.get('hold') else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
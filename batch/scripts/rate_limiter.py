@@ -0,0 +1,81 @@
+# rate_limiter.py
+import os
+import time
+import sqlite3
+
+
+class TokenBucketRateLimiter:
+    """SQLiteで状態を共有するトークンバケット
+
+    同じdb_pathを指す全プロセス・全スレッドで1つのバケットを共有する。
+    BEGIN IMMEDIATEで書き込みロックを取るため、補充と消費はプロセス間で直列化される。
+    """
+
+    def __init__(self, db_path, rate_limit, time_window, model_limits=None):
+        self.db_path = db_path
+        self.default_limit = {'rate_limit': rate_limit, 'time_window': time_window}
+        self.model_limits = model_limits or {}
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def _limit_for(self, bucket):
+        limit = self.model_limits.get(bucket, self.default_limit)
+        capacity = float(limit['rate_limit'])
+        return capacity, capacity / float(limit['time_window'])
+
+    def _try_take(self, bucket):
+        """トークンを1つ取得できれば0、できなければ必要な待機秒数を返す"""
+        capacity, refill_rate = self._limit_for(bucket)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = conn.execute(
+                "SELECT tokens, updated FROM buckets WHERE name = ?", (bucket,)
+            ).fetchone()
+            if row is None:
+                tokens = capacity
+            else:
+                tokens = min(capacity, row[0] + max(0.0, now - row[1]) * refill_rate)
+
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / refill_rate
+
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                (bucket, tokens, now)
+            )
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            # BEGIN IMMEDIATE自体が失敗した場合はトランザクションが無い
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def acquire(self, bucket='default'):
+        """トークンを1つ消費する。取得までに待機した秒数を返す"""
+        waited = 0.0
+        while True:
+            wait = self._try_take(bucket)
+            if wait == 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
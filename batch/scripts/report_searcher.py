@@ -0,0 +1,181 @@
+# report_searcher.py
+import os
+import sys
+import logging
+import argparse
+from datetime import datetime
+
+from search_base import SearchBase
+from post_base import PostBase
+from report_specs import get_spec, all_specs, load_class
+from pipeline import build_daily_pipeline, SUCCESS
+
+class ReportPostProcessor(PostBase):
+    """ReportSpecに従って保存済みのレポートを投稿する
+
+    本文を加工する場合はサブクラスで prepare_content() を上書きする。
+    """
+    spec_name = None
+
+    def __init__(self, spec=None):
+        super().__init__()
+        self.spec = spec or get_spec(self.spec_name)
+        self.tags = list(self.spec.tags)
+        self.categories = list(self.spec.categories)
+        self.publish_source = f"report:{self.spec.name}"
+
+    def prepare_content(self, content):
+        return content
+
+    def post_content(self):
+        try:
+            current_date = datetime.now().strftime("%Y-%m-%d")
+            filename = self.spec.output_path(current_date)
+
+            if not os.path.exists(filename):
+                self.logger.error(f"ファイルが存在しません: {filename}")
+                return False
+
+            with open(filename, 'r', encoding='utf-8') as f:
+                content = f.read()
+
+            title = f"{self.spec.title} {current_date}"
+
+            entry_xml = self.create_entry_xml(
+                title=title,
+                content=self.prepare_content(content),
+                tags=self.tags,
+                categories=self.categories
+            )
+
+            success, url = self.publish(entry_xml, title)
+            if url:
+                self.logger.info(f"投稿URL: {url}")
+            return success
+
+        except Exception as e:
+            self.logger.error(f"Post Process Error: {str(e)}")
+            return False
+
+
+class ReportSearcher(SearchBase):
+    """ReportSpecに従って検索・保存・投稿する
+
+    HTTPセッション・レート制限・応答キャッシュ等はSearchBaseの共有インスタンスを使うため、
+    同じプロセスで複数のレポートを実行してもまとめて制御される。
+    """
+    spec_name = None
+
+    def __init__(self, spec=None):
+        super().__init__()
+        self.spec = spec or get_spec(self.spec_name)
+        # 予算の優先度・計測は従来の検索クラス名で集計する
+        self.job_name = self.spec.job_name or self.spec.name
+        self.domain_filter = self.get_domain_filter(self.spec.domain_profile)
+        self.recency_days = self.spec.recency_days
+
+    def create_prompt(self):
+        return self.spec.render_prompt(self.create_base_prompt())
+
+    def output_path(self):
+        return self.spec.output_path(datetime.now().strftime("%Y-%m-%d"))
+
+    def create_poster(self):
+        if self.spec.poster:
+            return load_class(self.spec.poster)(self.spec)
+        return ReportPostProcessor(self.spec)
+
+    def is_up_to_date(self):
+        """本日の出力が完了済みかつ投稿済みか"""
+        filename = self.output_path()
+        return (self.is_fresh_output(self.spec.name, filename, self.spec.max_age)
+                and self.is_posted(self.spec.name, filename, self.create_poster()))
+
+    def search(self):
+        """レポートを検索してファイルへ保存し、保存先を返す（本日の出力が最新なら再利用）"""
+        filename = self.output_path()
+        if self.is_fresh_output(self.spec.name, filename, self.spec.max_age):
+            return filename
+        prompt = self.create_prompt()
+        # 受信しながらthinkを除いた本文をファイルへ書き出す
+        content = self.call_perplexity_api_stream(
+            prompt,
+            filename,
+            self.domain_filter,
+            recency_days=self.recency_days
+        )
+
+        if content:
+            self.record_output(self.spec.name, filename)
+            return filename
+        return None
+
+    def post(self):
+        """保存済みのレポートを投稿（同じ内容を投稿済みなら何もしない）"""
+        filename = self.output_path()
+        poster = self.create_poster()
+        if self.is_posted(self.spec.name, filename, poster):
+            return True
+        success = poster.post_content()
+        if success:
+            self.record_post(self.spec.name, filename)
+        return success
+
+    def execute_search(self):
+        if self.search():
+            return self.post()
+        return False
+
+
+def stale_specs(specs):
+    """出力・投稿が最新でないレポート定義"""
+    return [spec for spec in specs if not ReportSearcher(spec).is_up_to_date()]
+
+
+def run_reports(names=None, max_workers=4, summary=False, publish=False, force=False):
+    """登録済みのレポートを1プロセスでまとめて実行し、ステージ名 -> 結果を返す
+
+    force=False の場合は本日の出力・投稿が最新のレポートを実行しない
+    （要約する場合は全レポートの出力が必要なため、最新のレポートも保存済みの出力を返すだけのステージとして残す）。
+    """
+    specs = [get_spec(name) for name in names] if names else all_specs()
+    if not force and not summary:
+        specs = stale_specs(specs)
+    reports = {spec.name: (lambda s=spec: ReportSearcher(s)) for spec in specs}
+    pipeline = build_daily_pipeline(reports, max_workers=max_workers, summary=summary, publish=publish, force=force)
+    return pipeline.run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='登録済みレポートの一括実行')
+    parser.add_argument('reports', nargs='*', help='実行するレポート名（省略時は全て）')
+    parser.add_argument('--list', action='store_true', help='登録済みのレポートを表示')
+    parser.add_argument('--summary', action='store_true', help='Gemini要約も実行する')
+    parser.add_argument('--publish', action='store_true', help='投稿キューも処理する')
+    parser.add_argument('--max-workers', type=int, default=4)
+    parser.add_argument('--force', action='store_true', help='最新の出力・投稿があっても作り直す')
+    parser.add_argument('--check', action='store_true', help='鮮度判定のみ行い、再実行が必要なレポートを表示')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for spec in all_specs():
+            print(f"{spec.name}: {spec.title} ({spec.output_suffix}.md)")
+        return 0
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.check:
+        specs = [get_spec(name) for name in args.reports] if args.reports else all_specs()
+        stale = {spec.name for spec in stale_specs(specs)}
+        for spec in specs:
+            print(f"[{'STALE' if spec.name in stale else 'FRESH'}] {spec.name}")
+        return 0
+    status = run_reports(
+        args.reports, args.max_workers, summary=args.summary, publish=args.publish, force=args.force
+    )
+    for name, result in status.items():
+        print(f"[{result.upper()}] {name}")
+    return 0 if all(result == SUCCESS for result in status.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,360 @@
+# report_specs.py
+import importlib
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+OUTPUT_DIR = 'M:/ML/ChatGPT/gennote/test/output'
+
+
+@dataclass(frozen=True)
+class ReportSpec:
+    """Perplexity検索 -> 保存 -> 投稿 だけで完結するレポートの定義
+
+    prompt の {base_prompt} は SearchBase.create_base_prompt() の内容に置き換える。
+    domain_profile は SEARCH_DOMAINS のキー。
+    poster: 投稿前に本文を加工する場合の 'module.Class'（ReportPostProcessorのサブクラス）
+    max_age: 本日の出力を再利用できる最大経過秒数（NoneはFRESHNESS_CONFIGの既定値）
+    """
+    name: str
+    title: str
+    output_suffix: str
+    domain_profile: str
+    prompt: str
+    tags: Tuple[str, ...] = ()
+    categories: Tuple[str, ...] = ()
+    recency_days: int = 7
+    job_name: Optional[str] = None
+    poster: Optional[str] = None
+    max_age: Optional[int] = None
+
+    def render_prompt(self, base_prompt):
+        return self.prompt.replace('{base_prompt}', base_prompt)
+
+    def output_path(self, date):
+        return f'{OUTPUT_DIR}/{date}_{self.output_suffix}.md'
+
+
+_REGISTRY = {}
+
+
+def load_class(path):
+    """'module.Class' 形式の指定からクラスを読み込む"""
+    module_name, class_name = path.rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def register(spec):
+    """レポート定義を登録する（名前・出力ファイルの重複はValueError）"""
+    if spec.name in _REGISTRY:
+        raise ValueError(f"レポート名が重複しています: {spec.name}")
+    for other in _REGISTRY.values():
+        if other.output_suffix == spec.output_suffix:
+            raise ValueError(f"出力ファイルが重複しています: {spec.name} / {other.name}")
+    _REGISTRY[spec.name] = spec
+    return spec
+
+
+def get_spec(name):
+    try:
+        return _REGISTRY[name]
+    except KeyError:
+        raise KeyError(f"未登録のレポートです: {name}") from None
+
+
+def all_specs():
+    """登録順のレポート定義"""
+    return list(_REGISTRY.values())
+
+
+register(ReportSpec(
+    name='jp',
+    title='日本株式市場 投資戦略レポート',
+    output_suffix='jp',
+    domain_profile='jp_stock',
+    job_name='JPSearcher',
+    tags=("日本株", "投資戦略", "業種別分析", "高BOE", "高ROE"),
+    categories=("投資", "株式", "マーケット分析"),
+    prompt="""
+        {base_prompt}
+        # 日本株式市場 投資戦略レポート
+
+        【分析対象】
+        ## 金融株式市況環境
+        - 金利インフレ動向
+        - 外国人投資家動向
+
+        ## 1. 業種別動向
+        - 上昇率TOP3業種
+        - 業種別需給動向（売買代金上位）
+
+        ## 2. 注目銘柄スクリーニング
+        - ストップ高銘柄
+        - 出来高急増（前日比200%以上）
+        - 高ROE（15%以上）銘柄3選
+        - 高DOE（5%以上）銘柄3選      
+        - 株価上昇率TOP
+
+        ## 3. 決算発表銘柄分析
+        - 好決算（営業増益）銘柄
+        - 上方修正銘柄
+        - 増配/自社株買い発表
+        - 決算後の株価反応
+
+        ## 4. 特別注目銘柄
+        - 決算短信での重要開示事項
+        - 業績予想の修正
+        - 事業計画の変更
+
+        【出力形式】
+        各セクションで：
+        - 銘柄コード・名称（https://kabutan.jp/stock/?code=[code]形式でリンク）
+        - 業績サマリー（売上高/営業利益/純利益）
+        - 特記事項（決算/材料/需給）
+        """
+))
+
+register(ReportSpec(
+    name='china',
+    title='中国香港AI/金融市場レポート',
+    output_suffix='china',
+    domain_profile='china_market',
+    job_name='ChinaSearcher',
+    tags=("中国", "香港", "AI", "金融市場"),
+    categories=("マーケット", "海外", "テクノロジー"),
+    prompt="""
+        {base_prompt}
+        # 香港中国金融市場AI/LLMレポート
+        
+        【検索条件】
+        - 重要度: 市場への影響度が高い順
+        - 地域: 中国本土・香港
+        - 分野: AI/LLM関連企業
+        
+        【出力形式】
+        ## 1. 中国AI/LLM関連企業の主要ニュース
+        - 本日の重要なAI/LLM関連ニュース3選
+        - 関連する上場企業の動き
+        - 各企業のティッカーシンボルは https://finance.yahoo.com/quote/[TICKER] の形式でリンク化
+        
+        ## 2. 最近のAI/LLM関係の中国企業、香港企業の決算概要
+        各企業について：
+        - 企業コード・名称（Yahoo Financeリンク付き）
+        - 事業概要（主力製品・サービス）
+        - 決算発表日
+        - 決算ハイライト
+          * 売上高（前年同期比）
+          * 営業利益（前年同期比）
+          * 純利益（前年同期比）
+          * 決算発表後の株価変動
+          * 年初来パフォーマンス
+        
+        ## 3. 市場動向への影響
+        - 投資家の反応や市場センチメント
+        - 今後の見通し
+        """
+))
+
+register(ReportSpec(
+    name='crypto',
+    title='仮想通貨市場レポート',
+    output_suffix='crypto',
+    domain_profile='crypto',
+    job_name='CryptoSearcher',
+    tags=("仮想通貨", "ビットコイン", "暗号資産"),
+    categories=("マーケット", "投資", "金融"),
+    prompt="""
+        {base_prompt}
+        ## 仮想通貨/暗号資産 投資家向けアナリストレポート
+
+        市場の変化、法律や思惑の変化から、今後の投機的機会を考察する根拠の情報をお届けします。
+        主要暗号資産や、暗号資産関連株の急騰や急落の背景にある要因を分析し、今後の価格変動についての示唆を提供します。
+
+        【検索条件】
+        - 重要度: 市場構造・規制・機関投資家動向（定量的に）
+        - 対象通貨: BTC,ETH,SOL
+        - 対象BTC関連株: MSTR, MARA,SML, COIN, Metaplanet, SBI VC trade, Remixpoint, gumi
+        - 投機的な動き
+
+        【出力形式】
+        ## マクロ環境の変化
+        - 金融政策（FRB/日銀）の影響
+        - 機関投資家の資金フロー動向
+
+        ## 重要イベント・ニュース
+        4. [重要ニュース]
+        - 価格への影響分析
+        - 投資機会への示唆
+        3. [重要イベントスケジュール]
+        - 投資機会への示唆
+
+        ## ETF市場の動向 
+        - 投資機会への示唆
+
+        ## BTC関連株の分析
+        - 機関投資家の保有動向
+        - 事業戦略の変化
+        - 財務状況の変化
+        - MSTR,NAV
+        - Metaplanet, SBIbitbank, Remixpoint, gumi
+        - 投資機会への示唆
+        """
+))
+
+register(ReportSpec(
+    name='energy',
+    title='エネルギー市場分析レポート',
+    output_suffix='energy_markets',
+    domain_profile='energy',
+    job_name='EnergyMarketsSearcher',
+    tags=("エネルギー市場", "再生可能エネルギー", "石油", "天然ガス", "原子力"),
+    categories=("マーケット", "投資", "エネルギー"),
+    prompt="""
+{base_prompt}
+
+# エネルギー市場分析レポート
+
+【検索条件】
+- 重要度: 市場への影響度が高い順
+- 対象: 石油、天然ガス、再生可能エネルギー、原子力
+- 期間: 直近の動向と今後の見通し
+
+【出力形式】
+
+## 1. エネルギー市場の概況
+
+- 原油・天然ガス価格の最新動向
+- 主要エネルギー指標の分析
+- 需給バランスの変化
+- 地政学的要因の影響
+
+## 2. 石油・天然ガス市場
+
+- 原油価格の変動要因
+- 主要産油国の生産動向
+- 在庫水準と需要予測
+- LNG市場の動向と価格トレンド
+
+## 3. 再生可能エネルギー市場
+
+- 太陽光・風力発電の最新コスト動向
+- 政策変更と補助金制度の影響
+- 蓄電技術の進展
+- グリーン水素の開発状況
+
+## 4. 原子力エネルギー
+
+- 原子力発電所の稼働状況
+- 新規建設プロジェクト
+- 規制環境の変化
+- 小型モジュール炉(SMR)の開発動向
+
+## 5. エネルギー転換と投資機会
+
+- 脱炭素化政策の影響
+- エネルギー企業の戦略転換
+- 有望な投資セクターと企業
+- リスク要因と注目ポイント
+"""
+))
+
+register(ReportSpec(
+    name='globalmacro',
+    title='グローバルマクロ経済分析レポート',
+    output_suffix='globalmacro',
+    domain_profile='global_macro',
+    job_name='GlobalMacroSearcher',
+    tags=("グローバルマクロ", "経済分析", "金融市場"),
+    categories=("マーケット", "投資", "経済"),
+    prompt="""
+{base_prompt}
+
+# グローバルマクロ経済分析レポート
+
+【検索条件】
+- 重要度: 市場への影響度が高い順
+- 地域: グローバル（主要国・地域）
+- 分野: マクロ経済指標、金融政策、市場動向
+
+【出力形式】
+
+## 1. 主要経済指標分析
+
+- GDP成長率予測（世界・主要国）
+- インフレ動向と中央銀行の政策
+- 雇用統計と賃金動向
+- 国際収支と資本フロー
+
+## 2. 金融市場動向
+
+- 主要通貨の為替レート推移
+- 国債利回りと金融政策の影響
+- 株式市場のバリュエーション
+- クレジット市場のリスク評価
+
+## 3. 商品市場分析
+
+- エネルギー価格の需給動向
+- 産業用金属の価格トレンド
+- 農産物市場の状況
+- 貴金属市場の動き
+
+## 4. リスク要因とマクロ展望
+
+- 地政学的リスクの評価
+- 金融システムの安定性
+- 新興国経済の見通し
+- テクノロジーと生産性への影響
+"""
+))
+
+register(ReportSpec(
+    name='real_estate',
+    title='不動産市場分析レポート',
+    output_suffix='real_estate',
+    domain_profile='real_estate',
+    job_name='RealEstateSearcher',
+    recency_days=31,
+    tags=("不動産市場", "REIT", "商業不動産", "住宅市場", "不動産投資", "J-REIT"),
+    categories=("マーケット", "投資", "不動産"),
+    # J-REIT・不動産関連銘柄の株価を本文に追記する
+    poster='search_estate.RealEstatePostProcessor',
+    prompt="""
+{base_prompt}
+
+# 不動産市場分析レポート
+
+【検索条件】
+- 対象: グローバル不動産市場、日本不動産市場、REIT市場
+- 期間: 直近の動向
+
+【出力形式】
+
+## 1. グローバル不動産市場の概況
+
+- 主要国・地域の不動産価格トレンド（米国、欧州、アジア太平洋）
+- 金利環境（中央銀行の政策と市場反応）
+- 商業不動産の稼働率と賃料動向（オフィス、商業施設、物流施設）
+
+## 2. 日本の不動産市場
+
+- 住宅市場の価格動向（東京、大阪、名古屋など主要都市別分析）
+- オフィス市場の需給バランス（空室率、賃料推移、新規供給）
+
+## 3. REIT市場分析
+
+- グローバルREIT指数のパフォーマンス（セクター別比較）
+- J-REITの最新動向（オフィス系、住宅系、商業系、物流系、ホテル系）
+
+## 4. 不動産テクノロジーと新トレンド
+
+- プロップテック企業の最新動向
+
+## 5. 投資見通しとリスク分析
+
+- 不動産市場のリスク要因（金利上昇、景気後退、規制変更）
+- 有望な投資セクターと地域（成長性、利回り、安定性の観点から）
+- 金融政策変更の潜在的影響（中央銀行の政策転換シナリオ）
+- 中長期的な不動産市場の見通し（人口動態、テクノロジー、都市化の影響）
+
+"""
+))
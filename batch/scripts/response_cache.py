@@ -0,0 +1,109 @@
+# response_cache.py
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+
+def make_cache_key(model, prompt, domain_filter=None, recency=None):
+    """(model, 正規化プロンプト, domain_filter, recency) のフィンガープリント"""
+    normalized_prompt = re.sub(r'\s+', ' ', prompt or '').strip()
+    domains = sorted({domain.strip().lower() for domain in (domain_filter or [])})
+    material = json.dumps([model, normalized_prompt, domains, recency], ensure_ascii=False)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """SQLiteに保存するLLM応答キャッシュ（TTL + サイズ上限付きLRU）"""
+
+    def __init__(self, cache_dir, max_bytes=50 * 1024 * 1024, max_entries=1000):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.db_path = os.path.join(cache_dir, 'llm_cache.db')
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key, ttl):
+        """TTL内のエントリを返す。無ければNone"""
+        if not ttl:
+            return None
+        now = time.time()
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > ttl:
+                self._count(False)
+                return None
+            conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self._count(True)
+            return row[0]
+        finally:
+            conn.close()
+
+    def set(self, key, value):
+        now = time.time()
+        size = len(value.encode('utf-8'))
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now)
+            )
+            self._evict(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            # BEGIN IMMEDIATE自体が失敗した場合はトランザクションが無い
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _evict(self, conn):
+        """最終アクセスが古い順に上限を下回るまで削除"""
+        total_size, total_count = conn.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM entries").fetchone()
+        if total_size <= self.max_bytes and total_count <= self.max_entries:
+            return
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed ASC").fetchall():
+            if total_size <= self.max_bytes and total_count <= self.max_entries:
+                break
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total_size -= size
+            total_count -= 1
+
+    def delete(self, key):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        finally:
+            conn.close()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
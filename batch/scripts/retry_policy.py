@@ -0,0 +1,127 @@
+# retry_policy.py
+import time
+import random
+import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+DEFAULT_RETRY_STATUSES = (429, 500, 502, 503, 504)
+# 非冪等なリクエスト(投稿等)でも、サーバーが処理していないことが確実なステータス
+SAFE_RETRY_STATUSES = (429, 503)
+
+
+class RetryPolicy:
+    """指数バックオフ + ジッター + Retry-After対応のリトライ
+
+    func の戻り値に status_code があればステータスで、例外に response / code が
+    あればそのステータスで再試行を判定する。ステータスが無い例外は
+    retry_exceptions に該当する場合のみ再試行する。
+    idempotent=False の呼び出しは SAFE_RETRY_STATUSES と safe_exceptions のみ再試行する。
+    """
+
+    def __init__(self, max_retries=3, backoff_factor=1.5, retry_delay=2, max_delay=60,
+                 jitter=0.5, retry_statuses=DEFAULT_RETRY_STATUSES, retry_exceptions=(OSError,),
+                 idempotent=True, safe_exceptions=(), name='call'):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.retry_delay = retry_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retry_statuses = tuple(retry_statuses)
+        self.retry_exceptions = tuple(retry_exceptions)
+        self.idempotent = idempotent
+        self.safe_exceptions = tuple(safe_exceptions)
+        self.name = name
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def from_config(cls, retry_config, **kwargs):
+        """RATE_LIMIT_CONFIG['retry_config'] 形式の辞書から生成"""
+        options = {key: retry_config[key] for key in (
+            'max_retries', 'backoff_factor', 'retry_delay', 'max_delay', 'jitter', 'retry_statuses'
+        ) if key in retry_config}
+        options.update(kwargs)
+        return cls(**options)
+
+    @staticmethod
+    def _status_of(obj):
+        status = getattr(obj, 'status_code', None)
+        if status is None:
+            response = getattr(obj, 'response', None)
+            status = getattr(response, 'status_code', None)
+        if status is None and isinstance(getattr(obj, 'code', None), int):
+            status = obj.code
+        return status
+
+    def _should_retry_status(self, status):
+        if self.idempotent:
+            return status in self.retry_statuses
+        return status in SAFE_RETRY_STATUSES
+
+    def _should_retry_exception(self, error):
+        status = self._status_of(error)
+        if status is not None:
+            return self._should_retry_status(status)
+        if self.idempotent:
+            return isinstance(error, self.retry_exceptions)
+        return isinstance(error, self.safe_exceptions)
+
+    @staticmethod
+    def parse_retry_after(value):
+        """Retry-Afterヘッダ（秒数またはHTTP日付）を待機秒数に変換"""
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+    def compute_delay(self, attempt, response=None):
+        """attempt回目の失敗後に待つ秒数"""
+        headers = getattr(response, 'headers', None) or {}
+        retry_after = self.parse_retry_after(headers.get('Retry-After'))
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        delay = self.retry_delay * (self.backoff_factor ** (attempt - 1))
+        delay += random.uniform(0, delay * self.jitter)
+        return min(delay, self.max_delay)
+
+    @staticmethod
+    def _discard(response):
+        """再試行で捨てる応答を閉じる（stream=Trueの応答はそのままだと接続プールの枠を保持し続ける）"""
+        close = getattr(response, 'close', None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
+
+    def call(self, func, *args, **kwargs):
+        """funcを実行し、再試行対象の失敗ならバックオフして再実行する"""
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if attempt > self.max_retries or not self._should_retry_exception(e):
+                    raise
+                response = getattr(e, 'response', None)
+                delay = self.compute_delay(attempt, response)
+                self._discard(response)
+                self.logger.warning(f"{self.name}: 試行{attempt}回目失敗 ({e}) {delay:.1f}秒後に再試行")
+            else:
+                status = self._status_of(result)
+                if status is None or attempt > self.max_retries or not self._should_retry_status(status):
+                    return result
+                delay = self.compute_delay(attempt, result)
+                self._discard(result)
+                self.logger.warning(f"{self.name}: 試行{attempt}回目ステータス{status} {delay:.1f}秒後に再試行")
+            time.sleep(delay)
@@ -0,0 +1,68 @@
+# run_journal.py
+import os
+import json
+import logging
+import threading
+
+
+def _to_json(value):
+    """numpy等のスカラー値をJSONへ変換"""
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+class RunJournal:
+    """run単位で各ステージの出力を保存し、再実行時は完了済みステージを読み出す
+
+    ステージの出力はJSONファイルへ都度書き出す（一時ファイル経由で置換するため途中終了でも壊れない）。
+    None を返したステージは未完了として記録せず、再実行時にやり直す。
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._stages = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._stages = json.load(f)
+            except (OSError, ValueError) as e:
+                self.logger.warning(f"ジャーナル読込エラーのため最初から実行: {path} ({str(e)})")
+
+    def has(self, stage):
+        return stage in self._stages
+
+    def get(self, stage, default=None):
+        return self._stages.get(stage, default)
+
+    def completed(self):
+        return list(self._stages)
+
+    def record(self, stage, value):
+        with self._lock:
+            self._stages[stage] = value
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._stages, f, ensure_ascii=False, indent=2, default=_to_json)
+            os.replace(tmp_path, self.path)
+
+    def step(self, stage, func, *args, **kwargs):
+        """完了済みなら保存済みの出力を返し、未完了なら実行して記録する"""
+        if stage in self._stages:
+            self.logger.info(f"   -> ジャーナルから再開: {stage}")
+            return self._stages[stage]
+        value = func(*args, **kwargs)
+        if value is not None:
+            self.record(stage, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._stages = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
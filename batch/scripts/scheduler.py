@@ -0,0 +1,242 @@
+# scheduler.py
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+
+from market_calendar import MarketCalendar
+from job_runner import JobRunner, SKIPPED, SUCCESS, discover_jobs, up_to_date_scripts
+
+RUN = 'run'
+DEGRADE = 'degrade'
+SKIP = 'skip'
+
+JST = timezone(timedelta(hours=+9), 'JST')
+# 劣化実行するジョブに渡す環境変数（SearchBaseが安価なモデルへ切り替える。常駐ワーカーへも引き継ぐ）
+DEGRADE_ENV = 'GENNOTE_DEGRADE'
+# serve で評価が遅れた分（長時間のスリープ等）を遡って評価する上限
+MAX_CATCH_UP = timedelta(hours=1)
+
+
+class CronRule:
+    """cron形式（分 時 日 月 曜日）の実行条件。曜日は日曜=0（7も日曜）
+
+    標準のcronと同じく、日と曜日の両方を指定した（'*' で始まらない）場合はどちらかに一致すれば対象日とする。
+    """
+
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expr):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron形式ではありません: {expr}")
+        self.expr = expr
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            self._parse(field, low, high) for field, (low, high) in zip(fields, self.RANGES)
+        )
+        self.weekdays = {day % 7 for day in weekdays}
+        self.day_or_weekday = not fields[2].startswith('*') and not fields[4].startswith('*')
+
+    @staticmethod
+    def _parse(field, low, high):
+        values = set()
+        for part in field.split(','):
+            step = 1
+            if '/' in part:
+                part, step = part.split('/')
+                step = int(step)
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start, end = (int(value) for value in part.split('-'))
+            else:
+                start = end = int(part)
+            if start < low or end > high or step < 1:
+                raise ValueError(f"cronの範囲外です: {field}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def matches_day(self, day):
+        # datetime.weekday()は月曜=0のため日曜=0へ変換
+        day_matches, weekday_matches = day.day in self.days, (day.weekday() + 1) % 7 in self.weekdays
+        if self.day_or_weekday:
+            return day.month in self.months and (day_matches or weekday_matches)
+        return day.month in self.months and day_matches and weekday_matches
+
+    def matches(self, moment):
+        return self.matches_day(moment) and moment.hour in self.hours and moment.minute in self.minutes
+
+
+def _deadline(day, value):
+    if not value:
+        return None
+    hour, minute = (int(part) for part in value.split(':'))
+    return datetime(day.year, day.month, day.day, hour, minute, tzinfo=JST)
+
+
+def plan(jobs, now, calendars, by_day=False):
+    """実行対象のジョブを締切の早い順に返す
+
+    jobs: {スクリプト名: {'cron', 'market', 'on_closed', 'deadline'}}
+    by_day=True の場合は時刻を問わず本日が対象のジョブを全て返す（1日1回起動する場合）。
+    market の休場日は on_closed に従い skip（実行しない）または degrade（安価なモデルで実行）。
+    休場かどうかは now 時点の取引日（MarketCalendar.session_date。usは日本の朝なら前日の米国市場）で判定する。
+    """
+    entries = []
+    for order, (name, rule) in enumerate(jobs.items()):
+        cron = CronRule(rule.get('cron', '0 0 * * *'))
+        if not (cron.matches_day(now) if by_day else cron.matches(now)):
+            continue
+        action, reasons = RUN, []
+        market = rule.get('market')
+        if market:
+            calendar = calendars[market]
+            closed = calendar.holiday_name(calendar.session_date(now))
+            if closed:
+                action = rule.get('on_closed', SKIP)
+                reasons.append(f"{market}休場（{closed}）")
+        deadline = _deadline(now.date(), rule.get('deadline'))
+        if deadline and deadline < now and action != SKIP:
+            reasons.append(f"締切超過（{rule['deadline']}）")
+        entries.append({
+            'name': name, 'action': action, 'reason': ' / '.join(reasons) or None,
+            'deadline': deadline, 'order': order
+        })
+    # 締切の無いジョブは最後、同じ締切は記述順
+    entries.sort(key=lambda entry: (entry['deadline'] is None, entry['deadline'] or now, entry['order']))
+    return entries
+
+
+class Scheduler:
+    """市場カレンダーとcronに従ってジョブを選び、JobRunnerで締切順に実行する"""
+
+    def __init__(self, jobs, calendars, runner, scripts_dir):
+        self.jobs = jobs
+        self.calendars = calendars
+        self.runner = runner
+        self.scripts_dir = scripts_dir
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        # serve でバックグラウンド実行中のスクリプト
+        self._running = set()
+
+    def _select(self, now, by_day=False):
+        """(計画, 実行するスクリプト, ジョブ毎の環境変数) を返す"""
+        entries = plan(self.jobs, now, self.calendars, by_day)
+        scripts, envs = [], {}
+        for entry in entries:
+            self.logger.info(f"[{entry['action'].upper()}] {entry['name']} {entry['reason'] or ''}".rstrip())
+            if entry['action'] == SKIP:
+                continue
+            scripts.append(os.path.join(self.scripts_dir, entry['name']))
+            if entry['action'] == DEGRADE:
+                envs[entry['name']] = {DEGRADE_ENV: '1'}
+        return entries, scripts, envs
+
+    def run_due(self, now=None, by_day=False):
+        """対象のジョブを実行し、(計画, 実行結果) を返す"""
+        entries, scripts, envs = self._select(now or datetime.now(JST), by_day)
+        results = self.runner.run(scripts, envs=envs) if scripts else []
+        return entries, results
+
+    def start_due(self, now):
+        """対象のジョブをバックグラウンドで実行し、実行スレッドを返す（対象が無ければNone）
+
+        前回起動した同じスクリプトが実行中の場合は重ねて起動しない。
+        """
+        _, scripts, envs = self._select(now)
+        with self._lock:
+            busy = [script for script in scripts if script in self._running]
+            scripts = [script for script in scripts if script not in self._running]
+            self._running.update(scripts)
+        for script in busy:
+            self.logger.warning(f"前回の実行中のため起動しません: {os.path.basename(script)}")
+        if not scripts:
+            return None
+        thread = threading.Thread(target=self._run_background, args=(scripts, envs), daemon=True)
+        thread.start()
+        return thread
+
+    def _run_background(self, scripts, envs):
+        try:
+            self.runner.run(scripts, envs=envs)
+        except Exception as e:
+            self.logger.error(f"実行エラー: {str(e)}")
+        finally:
+            with self._lock:
+                self._running.difference_update(scripts)
+
+    def catch_up(self, last, now):
+        """lastの次の分からnowまでの各分を評価して起動し、評価した最後の分を返す
+
+        実行中も評価を続けるため、長いバッチの間の分も取りこぼさない（遡るのはMAX_CATCH_UPまで）。
+        """
+        now = now.replace(second=0, microsecond=0)
+        moment = max(last + timedelta(minutes=1), now - MAX_CATCH_UP)
+        while moment <= now:
+            self.start_due(moment)
+            moment += timedelta(minutes=1)
+        return max(last, now)
+
+    def serve_forever(self):
+        """毎分cronを評価してバックグラウンドで実行する（同じ分に二重起動しない）"""
+        last = datetime.now(JST).replace(second=0, microsecond=0) - timedelta(minutes=1)
+        while True:
+            last = self.catch_up(last, datetime.now(JST))
+            time.sleep(max(1.0, 60 - datetime.now(JST).second))
+
+
+def build_calendars(extra_holidays):
+    return {market: MarketCalendar(market, extra_holidays.get(market, ())) for market in ('jpx', 'us')}
+
+
+def main(argv=None):
+    from config import PIPELINE_CONFIG, RUNNER_CONFIG, SCHEDULE_CONFIG
+
+    parser = argparse.ArgumentParser(description='市場カレンダー対応のジョブスケジューラ')
+    parser.add_argument('command', choices=['once', 'serve', 'plan'],
+                        help='once: 本日分を実行 / serve: 常駐して毎分実行 / plan: 本日の計画を表示')
+    parser.add_argument('--date', help='計画・実行する日付（YYYY-MM-DD、既定は本日）')
+    parser.add_argument('--force', action='store_true', help='最新の出力・投稿があっても作り直す')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    calendars = build_calendars(SCHEDULE_CONFIG['extra_holidays'])
+    # 設定の無い検索スクリプトは休場日に関係なく毎日実行する
+    jobs = {os.path.basename(script): {} for script in discover_jobs(RUNNER_CONFIG['scripts_dir'], RUNNER_CONFIG['pattern'])}
+    jobs.update(SCHEDULE_CONFIG['jobs'])
+    now = datetime.now(JST)
+    if args.date:
+        now = datetime.combine(datetime.strptime(args.date, '%Y-%m-%d').date(), now.timetz())
+    if args.command == 'plan':
+        for entry in plan(jobs, now, calendars, by_day=True):
+            deadline = entry['deadline'].strftime('%H:%M') if entry['deadline'] else '-'
+            print(f"[{entry['action'].upper()}] {entry['name']} 締切 {deadline} {entry['reason'] or ''}")
+        return 0
+
+    runner = JobRunner(
+        RUNNER_CONFIG['logs_dir'],
+        max_workers=RUNNER_CONFIG['max_workers'],
+        timeout=RUNNER_CONFIG['timeout'],
+        timeouts=RUNNER_CONFIG['timeouts'],
+        max_logs=RUNNER_CONFIG['max_logs'],
+        force=args.force,
+        # 本日の出力・投稿が最新のレポートは起動しない
+        is_fresh=lambda scripts: up_to_date_scripts(scripts, PIPELINE_CONFIG['reports'])
+    )
+    scheduler = Scheduler(jobs, calendars, runner, RUNNER_CONFIG['scripts_dir'])
+    if args.command == 'serve':
+        scheduler.serve_forever()
+    _, results = scheduler.run_due(now, by_day=True)
+    failed = [result['name'] for result in results if result['status'] not in (SUCCESS, SKIPPED)]
+    print(f"All processes completed. Log: {getattr(runner, 'log_path', None)}")
+    if failed:
+        print(f"[ERROR] {len(failed)}件失敗: {', '.join(failed)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,80 @@
 import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 import logging
+from datetime import datetime
+from config import (
+    BASE_CONFIG, BUDGET_CONFIG, CACHE_CONFIG, DOMAIN_FILTER_CONFIG, FRESHNESS_CONFIG, HTTP_CONFIG,
+    RATE_LIMIT_CONFIG, SEARCH_DOMAINS, SINGLE_FLIGHT_CONFIG
+)
+from rate_limiter import TokenBucketRateLimiter
+from retry_policy import RetryPolicy
+from response_cache import ResponseCache, make_cache_key
+from stream_filter import ThinkTagStripper
+from single_flight import SingleFlight
+from telemetry import record_call
+from budget import BudgetManager, DEGRADE, DEFER
+from domain_registry import DomainRegistry
+from run_journal import RunJournal
+from freshness import FORCE_ENV, check_output, check_post, output_record
+
+# スケジューラが休場日に劣化実行を指定する環境変数（安価なモデルを使う）
+DEGRADE_ENV = 'GENNOTE_DEGRADE'
+# 予算・ジャーナル・鮮度判定の単位となるrunの指定（同じバッチのジョブで共有する）
+RUN_ID_ENV = 'GENNOTE_RUN_ID'
 
 class SearchBase:
+    # 全サブクラスで共有するkeep-aliveセッション（ホスト毎に接続をプール）
+    _session = None
+    _session_lock = threading.Lock()
+    # 全プロセスで共有するレート制限
+    _rate_limiter = None
+    _retry_policy = None
+    _response_cache = None
+    _single_flight = None
+    # run_id -> 予算管理・出力と投稿の完了記録
+    _budgets = {}
+    _domain_registry = None
+    _freshness_ledgers = {}
+    # プロセス内で同時に送信中のAPI呼び出し数の上限（並行実行する全検索で共有）
+    _concurrency_limiter = None
+
     def __init__(self):
         load_dotenv('M:/ML/ChatGPT/gennote/.env')
         self.perplexity_api_key = os.getenv('PERPLEXITY_API_KEY')
+        self.apply_env(os.environ)
+        # 応答キャッシュの有効期間（秒）。0でキャッシュしない。検索クラス毎に上書き可
+        self.cache_ttl = CACHE_CONFIG['duration']
+        # 1ジョブあたりのAPI呼び出し回数の見積り（予算の入場判定に使用）
+        self.estimated_calls = 1
+        # 予算の優先度・計測で使うジョブ名
+        self.job_name = type(self).__name__
+        # 予算の上限（Noneの場合はBUDGET_CONFIG）。別枠の予算で動くジョブが指定する
+        self.budget_limits = None
+        self._budget_decision = None
+        # 同じインスタンスから並行して呼び出した場合も入場判定は1回だけ
+        self._budget_lock = threading.Lock()
+        # 常駐ワーカーがジョブを中止するとセットされる（以降のAPI呼び出しを行わない）
+        self.cancel_event = None
         self._setup_logging()
 
+    def apply_env(self, env):
+        """GENNOTE_DEGRADE・GENNOTE_FORCE・GENNOTE_RUN_ID の指定をこのインスタンスに適用する
+
+        生成時はこのプロセスの環境変数を適用する。常駐ワーカーは依頼元の環境変数で適用し直す。
+        """
+        # 劣化実行の場合は安価なモデルを使う
+        self.model = BUDGET_CONFIG['degrade_model'] if env.get(DEGRADE_ENV) else BASE_CONFIG['model']
+        # 最新の出力・投稿があっても作り直す
+        self.force = bool(env.get(FORCE_ENV))
+        self.run_id = env.get(RUN_ID_ENV) or datetime.now().strftime('%Y-%m-%d')
+
     def _setup_logging(self):
         logging.basicConfig(
             level=logging.INFO,
@@ -16,6 +82,220 @@ class SearchBase:
         )
         self.logger = logging.getLogger(__name__)
 
+    @classmethod
+    def get_session(cls):
+        """共有HTTPセッションの取得（初回のみ生成）"""
+        if SearchBase._session is None:
+            with SearchBase._session_lock:
+                if SearchBase._session is None:
+                    adapter = HTTPAdapter(
+                        pool_connections=HTTP_CONFIG['pool_connections'],
+                        pool_maxsize=HTTP_CONFIG['pool_maxsize'],
+                        pool_block=True
+                    )
+                    session = requests.Session()
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    SearchBase._session = session
+        return SearchBase._session
+
+    @classmethod
+    def get_concurrency_limiter(cls):
+        """HTTP_CONFIG['max_concurrency']に基づく共有セマフォの取得"""
+        if SearchBase._concurrency_limiter is None:
+            with SearchBase._session_lock:
+                if SearchBase._concurrency_limiter is None:
+                    SearchBase._concurrency_limiter = threading.BoundedSemaphore(HTTP_CONFIG['max_concurrency'])
+        return SearchBase._concurrency_limiter
+
+    @classmethod
+    def get_rate_limiter(cls):
+        """RATE_LIMIT_CONFIGに基づく共有レート制限の取得"""
+        if SearchBase._rate_limiter is None:
+            with SearchBase._session_lock:
+                if SearchBase._rate_limiter is None:
+                    SearchBase._rate_limiter = TokenBucketRateLimiter(
+                        RATE_LIMIT_CONFIG['db_path'],
+                        RATE_LIMIT_CONFIG['rate_limit'],
+                        RATE_LIMIT_CONFIG['time_window'],
+                        RATE_LIMIT_CONFIG.get('model_limits')
+                    )
+        return SearchBase._rate_limiter
+
+    @classmethod
+    def get_retry_policy(cls):
+        """Perplexity API用のリトライポリシーの取得"""
+        if SearchBase._retry_policy is None:
+            SearchBase._retry_policy = RetryPolicy.from_config(
+                RATE_LIMIT_CONFIG['retry_config'], name='perplexity'
+            )
+        return SearchBase._retry_policy
+
+    @classmethod
+    def get_response_cache(cls):
+        """CACHE_CONFIGに基づく共有応答キャッシュの取得"""
+        if SearchBase._response_cache is None:
+            with SearchBase._session_lock:
+                if SearchBase._response_cache is None:
+                    SearchBase._response_cache = ResponseCache(
+                        CACHE_CONFIG['dir'],
+                        max_bytes=CACHE_CONFIG['max_bytes'],
+                        max_entries=CACHE_CONFIG['max_entries']
+                    )
+        return SearchBase._response_cache
+
+    @classmethod
+    def get_single_flight(cls):
+        """同一リクエストを合流させる共有SingleFlightの取得"""
+        if SearchBase._single_flight is None:
+            with SearchBase._session_lock:
+                if SearchBase._single_flight is None:
+                    SearchBase._single_flight = SingleFlight(
+                        SINGLE_FLIGHT_CONFIG['lock_dir'],
+                        wait_timeout=SINGLE_FLIGHT_CONFIG['wait_timeout'],
+                        poll_interval=SINGLE_FLIGHT_CONFIG['poll_interval']
+                    )
+        return SearchBase._single_flight
+
+    @classmethod
+    def get_domain_registry(cls):
+        """SEARCH_DOMAINSをコンパイルした共有レジストリの取得（初回のみコンパイル）"""
+        if SearchBase._domain_registry is None:
+            with SearchBase._session_lock:
+                if SearchBase._domain_registry is None:
+                    SearchBase._domain_registry = DomainRegistry(
+                        SEARCH_DOMAINS, max_domains=DOMAIN_FILTER_CONFIG['max_domains']
+                    )
+        return SearchBase._domain_registry
+
+    @classmethod
+    def get_domain_filter(cls, name):
+        """SEARCH_DOMAINS[name] から解決したdomain_filter"""
+        return cls.get_domain_registry().get(name)
+
+    @staticmethod
+    def current_run_id():
+        """GENNOTE_RUN_ID（未設定の場合は当日の日付）"""
+        return os.getenv(RUN_ID_ENV) or datetime.now().strftime('%Y-%m-%d')
+
+    @classmethod
+    def get_budget(cls, run_id=None, limits=None):
+        """run（省略時は当日またはGENNOTE_RUN_ID）の予算管理を取得
+
+        limits: BUDGET_CONFIG の token_budget・cost_budget・time_budget・reserve を上書きする値（runの初回取得時のみ有効）
+        """
+        run_id = run_id or cls.current_run_id()
+        with SearchBase._session_lock:
+            if run_id not in SearchBase._budgets:
+                budget = {**BUDGET_CONFIG, **(limits or {})}
+                SearchBase._budgets[run_id] = BudgetManager(
+                    BUDGET_CONFIG['db_path'],
+                    run_id,
+                    budget['token_budget'],
+                    budget['cost_budget'],
+                    budget['time_budget'],
+                    prices=BUDGET_CONFIG['prices'],
+                    reserve=budget['reserve']
+                )
+            return SearchBase._budgets[run_id]
+
+    @classmethod
+    def get_freshness_ledger(cls, run_id=None):
+        """run（省略時は当日またはGENNOTE_RUN_ID）の出力・投稿の完了記録"""
+        run_id = run_id or cls.current_run_id()
+        with SearchBase._session_lock:
+            if run_id not in SearchBase._freshness_ledgers:
+                SearchBase._freshness_ledgers[run_id] = RunJournal(
+                    os.path.join(FRESHNESS_CONFIG['dir'], f"{run_id}.json")
+                )
+            return SearchBase._freshness_ledgers[run_id]
+
+    def is_fresh_output(self, name, path, max_age=None):
+        """本日の出力が完了済みで再利用できるか（forceの場合は常にFalse）"""
+        if self.force:
+            return False
+        fresh, reason = check_output(
+            path, self.get_freshness_ledger(self.run_id).get(name),
+            FRESHNESS_CONFIG['max_age'] if max_age is None else max_age
+        )
+        self.logger.info(f"鮮度判定 [{name}] 出力: {reason}")
+        return fresh
+
+    def record_output(self, name, path):
+        self.get_freshness_ledger(self.run_id).record(name, output_record(path))
+
+    def is_posted(self, name, path, poster):
+        """出力の現在の内容が投稿済みか（forceの場合は常にFalse）"""
+        if self.force:
+            return False
+        posted, reason = check_post(path, self.get_freshness_ledger(self.run_id).get(f"{name}:post"), poster.publish_status())
+        self.logger.info(f"鮮度判定 [{name}] 投稿: {reason}")
+        return posted
+
+    def record_post(self, name, path):
+        self.get_freshness_ledger(self.run_id).record(f"{name}:post", output_record(path))
+
+    def _cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            self.logger.warning(f"{self.job_name} は中止されたためAPIを呼び出しません")
+            return True
+        return False
+
+    def _check_budget(self):
+        """ジョブ最初のAPI呼び出し前に予算の入場判定を受ける（入場済みなら再判定しない）"""
+        with self._budget_lock:
+            return self._admit_budget()
+
+    def _readmit_budget(self):
+        """入場判定をやり直す（長いジョブを区切り毎に判定する場合。estimated_calls は区切り1つ分）"""
+        with self._budget_lock:
+            self._budget_decision = None
+            return self._admit_budget()
+
+    def _admit_budget(self):
+        if self._budget_decision is not None:
+            return self._budget_decision != DEFER
+        job = self.job_name
+        priority = BUDGET_CONFIG['priorities'].get(job, BUDGET_CONFIG['default_priority'])
+        try:
+            decision = self.get_budget(self.run_id, self.budget_limits).admit(
+                job, priority,
+                estimated_tokens=self.estimated_calls * BUDGET_CONFIG['estimated_tokens_per_call'],
+                model=self.model,
+                degrade_model=BUDGET_CONFIG['degrade_model']
+            )
+        except Exception as e:
+            self.logger.error(f"Budget Error: {str(e)}")
+            decision = None
+        if decision == DEGRADE:
+            self.logger.warning(f"予算逼迫のため {job} のモデルを {BUDGET_CONFIG['degrade_model']} に切替")
+            self.model = BUDGET_CONFIG['degrade_model']
+        elif decision == DEFER:
+            self.logger.warning(f"予算逼迫のため {job} (優先度{priority}) を後回し")
+        self._budget_decision = decision
+        return decision != DEFER
+
+    def _consume_budget(self, usage):
+        try:
+            usage = usage or {}
+            self.get_budget(self.run_id, self.budget_limits).consume(self.model, usage.get('prompt_tokens'), usage.get('completion_tokens'))
+        except Exception as e:
+            self.logger.error(f"Budget Error: {str(e)}")
+
+    @staticmethod
+    def _recency_filter(recency_days):
+        # 期間指定の設定
+        if recency_days:
+            return f"{recency_days}d"
+        return "week"
+
+    def _cache_key(self, prompt, domain_filter=None, recency_days=None):
+        return make_cache_key(self.model, prompt, domain_filter, self._recency_filter(recency_days))
+
+    def invalidate_cached_response(self, prompt, domain_filter=None, recency_days=None):
+        """使えなかった応答をキャッシュから削除"""
+        self.get_response_cache().delete(self._cache_key(prompt, domain_filter, recency_days))
+
     def create_base_prompt(self):
         return """
         【基本設定】
@@ -23,43 +303,224 @@ class SearchBase:
         - 具体的かつ明瞭に正確に
         """
 
-    def call_perplexity_api(self, prompt, domain_filter=None, recency_days=None):
-        headers = {
-            "Authorization": f"Bearer {self.perplexity_api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        # 期間指定の設定
-        if recency_days:
-            recency = f"{recency_days}d"
-        else:
-            recency = "week"
-        
-        payload = {
-            "model": "sonar-reasoning-pro",
+    def _build_payload(self, prompt, domain_filter=None, recency_days=None):
+        return {
+            "model": self.model,
             "messages": [{
                 "role": "user",
                 "content": prompt
             }],
             "search": {
                 "domain_filter": domain_filter if domain_filter else [],
-                "recency_filter": recency
+                "recency_filter": self._recency_filter(recency_days)
             }
         }
-        
-        try:
-            response = requests.post(
+
+    def _send_perplexity(self, payload, stream=False):
+        """レート制限とリトライを通してPerplexity APIへPOST"""
+        headers = {
+            "Authorization": f"Bearer {self.perplexity_api_key}",
+            "Content-Type": "application/json"
+        }
+
+        def send():
+            # 再試行も1リクエストとしてレート制限の対象にする
+            waited = self.get_rate_limiter().acquire(self.model)
+            if waited > 0:
+                self.logger.info(f"Rate limit wait: {waited:.2f}s ({self.model})")
+            return self.get_session().post(
                 "https://api.perplexity.ai/chat/completions",
                 headers=headers,
-                json=payload
+                json=payload,
+                timeout=HTTP_CONFIG['timeout'],
+                stream=stream
             )
-            response.raise_for_status()
-            return response.json()['choices'][0]['message']['content']
+
+        response = self.get_retry_policy().call(send)
+        response.raise_for_status()
+        return response
+
+    def _get_cached_response(self, cache_key):
+        # forceの場合はキャッシュ済みの応答も使わずに取り直す（取り直した応答でキャッシュを更新する）
+        if self.force:
+            return None
+        start = time.monotonic()
+        cached = self.get_response_cache().get(cache_key, self.cache_ttl)
+        if cached is not None:
+            self.logger.info(f"Cache hit: {self.get_response_cache().stats()}")
+            self._record_api_call(start, 'cache_hit', response_bytes=len(cached.encode('utf-8')))
+        return cached
+
+    def _record_api_call(self, start, status, usage=None, response_bytes=None, citations=None):
+        """Perplexity呼び出しの記録（検索クラス・モデル・トークン数等）"""
+        usage = usage or {}
+        record_call(
+            'perplexity', start,
+            searcher=self.job_name,
+            model=self.model,
+            status=status,
+            prompt_tokens=usage.get('prompt_tokens'),
+            completion_tokens=usage.get('completion_tokens'),
+            response_bytes=response_bytes,
+            citations=citations
+        )
+
+    def _request_perplexity(self, prompt, domain_filter=None, recency_days=None):
+        """Perplexity APIへの1リクエスト（ブロッキング）"""
+        cache_key = self._cache_key(prompt, domain_filter, recency_days)
+        cached = self._get_cached_response(cache_key)
+        if cached is not None:
+            return cached
+
+        if self._cancelled() or not self._check_budget():
+            return None
+        # 予算判定でモデルが切り替わった場合に備えてキーを再計算
+        cache_key = self._cache_key(prompt, domain_filter, recency_days)
+        return self.get_single_flight().do(
+            cache_key,
+            lambda: self._limited(self._fetch_perplexity, prompt, domain_filter, recency_days, cache_key),
+            lookup=lambda: self._get_cached_response(cache_key)
+        )
+
+    def _limited(self, func, *args):
+        """共有セマフォの範囲内でfuncを実行（合流して待つ呼び出しは枠を使わない）"""
+        with self.get_concurrency_limiter():
+            return func(*args)
+
+    def _fetch_perplexity(self, prompt, domain_filter, recency_days, cache_key):
+        start = time.monotonic()
+        try:
+            response = self._send_perplexity(self._build_payload(prompt, domain_filter, recency_days))
+            data = response.json()
+            content = data['choices'][0]['message']['content']
+            self._record_api_call(
+                start, response.status_code, data.get('usage'),
+                len(response.content), len(data.get('citations') or [])
+            )
+            self._consume_budget(data.get('usage'))
+            if self.cache_ttl:
+                self.get_response_cache().set(cache_key, content)
+            return content
         except Exception as e:
             self.logger.error(f"API Error: {str(e)}")
+            self._record_api_call(start, getattr(getattr(e, 'response', None), 'status_code', None) or 'error')
             return None
 
+    def call_perplexity_api_stream(self, prompt, filename, domain_filter=None, recency_days=None):
+        """SSEで応答を受信し、thinkを除いた本文を受信しながらfilenameへ書き出す
+
+        成功時は本文を返す。途中で失敗した場合は書きかけのファイルを削除してNoneを返す。
+        """
+        cache_key = self._cache_key(prompt, domain_filter, recency_days)
+        cached = self._get_cached_response(cache_key)
+        if cached is not None:
+            return cached if self.save_content(cached, filename) else None
+
+        if self._cancelled() or not self._check_budget():
+            return None
+        cache_key = self._cache_key(prompt, domain_filter, recency_days)
+        # 同じファイルへの同時ストリームは1本にまとめる（書き出しは先行呼び出しが行う）
+        flight_key = f"{cache_key}_{hashlib.sha256(filename.encode('utf-8')).hexdigest()[:16]}"
+        content = self.get_single_flight().do(
+            flight_key,
+            lambda: self._limited(self._stream_perplexity, prompt, filename, domain_filter, recency_days, cache_key),
+            lookup=lambda: self._get_cached_response(cache_key)
+        )
+        if content is not None and not os.path.exists(filename):
+            return content if self.save_content(content, filename) else None
+        return content
+
+    def _stream_perplexity(self, prompt, filename, domain_filter, recency_days, cache_key):
+        payload = self._build_payload(prompt, domain_filter, recency_days)
+        payload["stream"] = True
+        stripper = ThinkTagStripper()
+        parts = []
+        start = time.monotonic()
+        status = 'error'
+        # usage / citations は後半のチャンクに含まれるため最後に見えた値を使う
+        usage, citations, response_bytes = None, None, 0
+        try:
+            with self._send_perplexity(payload, stream=True) as response:
+                status = response.status_code
+                response.encoding = 'utf-8'
+                with open(filename, 'w', encoding='utf-8') as f:
+                    for line in response.iter_lines(decode_unicode=True):
+                        response_bytes += len(line.encode('utf-8')) + 1 if line else 1
+                        if not line or not line.startswith('data:'):
+                            continue
+                        data = line[len('data:'):].strip()
+                        if data == '[DONE]':
+                            break
+                        chunk = json.loads(data)
+                        usage = chunk.get('usage') or usage
+                        citations = chunk.get('citations') or citations
+                        delta = chunk['choices'][0].get('delta', {}).get('content')
+                        text = stripper.feed(delta or '')
+                        if text:
+                            f.write(text)
+                            f.flush()
+                            parts.append(text)
+                    text = stripper.flush()
+                    f.write(text)
+                    parts.append(text)
+        except Exception as e:
+            self.logger.error(f"Stream API Error: {str(e)}")
+            self._record_api_call(start, getattr(getattr(e, 'response', None), 'status_code', None) or 'error')
+            if os.path.exists(filename):
+                os.remove(filename)
+            return None
+
+        self._record_api_call(start, status, usage, response_bytes, len(citations or []))
+        self._consume_budget(usage)
+        content = ''.join(parts)
+        self.logger.info(f"Streamed to {filename}")
+        if self.cache_ttl:
+            self.get_response_cache().set(cache_key, content)
+        return content
+
+    def call_perplexity_api(self, prompt, domain_filter=None, recency_days=None):
+        """Perplexity API呼び出し（呼び出し元のスレッドで実行）
+
+        複数スレッドから並行して呼び出してよい。送信中の呼び出し数は全検索で共有の
+        get_concurrency_limiter() により HTTP_CONFIG['max_concurrency'] 以下に抑える。
+        """
+        return self._request_perplexity(prompt, domain_filter, recency_days)
+
+    def search_many(self, requests_list, domain_filter=None, recency_days=None, timeout=None, max_workers=None):
+        """複数の検索を並行実行し、入力順の結果リストを返す（失敗した要素はその例外）
+
+        requests_list の要素はプロンプト文字列、call_perplexity_api の引数の辞書
+        （{'prompt', 'domain_filter', 'recency_days'}）、または複数の呼び出しから成る検索を行う引数なしの関数。
+        スレッドは max_workers（省略時は HTTP_CONFIG['max_concurrency']）本だが、送信中の呼び出し数は
+        全検索で共有の get_concurrency_limiter() により HTTP_CONFIG['max_concurrency'] 以下に抑える。
+        timeout 秒以内に終わらなかった要素は TimeoutError とし、開始前の要素は取り消す（実行中の要素は待たない）。
+        """
+        def task(request):
+            if callable(request):
+                return request
+            if isinstance(request, str):
+                request = {'prompt': request, 'domain_filter': domain_filter, 'recency_days': recency_days}
+            return lambda: self.call_perplexity_api(**request)
+
+        if not requests_list:
+            return []
+        executor = ThreadPoolExecutor(max_workers=max_workers or HTTP_CONFIG['max_concurrency'])
+        futures = [executor.submit(task(request)) for request in requests_list]
+        _, not_done = wait(futures, timeout=timeout)
+        dropped = [future for future in not_done if future.cancel()]
+        if dropped:
+            self.logger.warning(f"タイムアウト ({timeout}秒) により未実行の呼び出し{len(dropped)}件を破棄")
+        executor.shutdown(wait=False)
 
+        results = []
+        for future in futures:
+            if future in not_done:
+                results.append(TimeoutError(f"{timeout}秒以内に完了しませんでした"))
+            elif future.exception() is not None:
+                results.append(future.exception())
+            else:
+                results.append(future.result())
+        return results
 
     def save_content(self, content, filename):
         try:
@@ -1,13 +1,22 @@
 # real_estate_hidden_value_research.py
 
+import sys
 from datetime import datetime
+import os
+import time
 import logging
-import yfinance as yf
 import requests
-from bs4 import BeautifulSoup
 import re
 from search_base import SearchBase
 from post_base import PostBase
+from config import HTTP_CONFIG, RATE_LIMIT_CONFIG
+from retry_policy import RetryPolicy
+from telemetry import record_call
+from worker_daemon import run_or_submit
+from json_extract import extract_json
+
+# 出力・投稿の完了記録の名前
+FRESHNESS_NAME = 'real_estate_hidden_value'
 
 class RealEstateHiddenValuePostProcessor(PostBase):
     def __init__(self):
@@ -64,7 +73,8 @@ class RealEstateHiddenValuePostProcessor(PostBase):
         
         return updated_content
 
-    def post_content(self, hidden_value_data):
+    def save_content(self, hidden_value_data):
+        """ランキングからレポートを作成して保存し、保存先を返す"""
         try:
             current_date = datetime.now().strftime("%Y-%m-%d")
             filename = f'M:/ML/ChatGPT/gennote/test/output/{current_date}_real_estate_hidden_value.md'
@@ -90,6 +100,26 @@ class RealEstateHiddenValuePostProcessor(PostBase):
             # ファイルへの保存
             with open(filename, 'w', encoding='utf-8') as f:
                 f.write(content)
+            return filename
+            
+        except Exception as e:
+            self.logger.error(f"Save Content Error: {str(e)}")
+            return None
+
+    def post_content(self, hidden_value_data=None):
+        """レポートを投稿（ランキング未指定の場合は保存済みのレポートを投稿）"""
+        try:
+            current_date = datetime.now().strftime("%Y-%m-%d")
+            if hidden_value_data:
+                filename = self.save_content(hidden_value_data)
+            else:
+                filename = f'M:/ML/ChatGPT/gennote/test/output/{current_date}_real_estate_hidden_value.md'
+            if not filename or not os.path.exists(filename):
+                self.logger.error(f"ファイルが存在しません: {filename}")
+                return False
+            
+            with open(filename, 'r', encoding='utf-8') as f:
+                content = f.read()
             
             # ブログへの投稿
             title = f"日本企業の不動産含み益ランキング分析 {current_date}"
@@ -101,8 +131,8 @@ class RealEstateHiddenValuePostProcessor(PostBase):
                 categories=self.categories
             )
             
-            success, url = self.post_to_hatena(entry_xml)
-            if success:
+            success, url = self.publish(entry_xml, title)
+            if url:
                 self.logger.info(f"投稿URL: {url}")
             return success
             
@@ -113,26 +143,13 @@ class RealEstateHiddenValuePostProcessor(PostBase):
 class RealEstateHiddenValueSearcher(SearchBase):
     def __init__(self):
         super().__init__()
-        self.domain_filter = [
-            "nikkei.com",
-            "reuters.com",
-            "bloomberg.co.jp",
-            "minkabu.jp",
-            "morningstar.co.jp",
-            "kabutan.jp",
-            "jpx.co.jp",
-            "tdb.co.jp",
-            "mlit.go.jp",
-            "fsa.go.jp",
-            "mof.go.jp",
-            "ir-bank.jp",
-            "buffett-code.com",
-            "kabudragon.com",
-            "ullet.com",
-            "kabupro.jp",
-            "zaimu-express.net"
-        ]
+        self.domain_filter = self.get_domain_filter('estate_value')
         self.recency_days = 365  # 不動産含み益情報は長期的なものなので期間を長めに設定
+        self.cache_ttl = 24 * 3600  # 長期情報のため1日キャッシュ
+        self.yfinance_retry_policy = RetryPolicy.from_config(
+            RATE_LIMIT_CONFIG['retry_config'], name='yfinance', retry_exceptions=(Exception,)
+        )
+        self.yahoo_retry_policy = RetryPolicy.from_config(RATE_LIMIT_CONFIG['retry_config'], name='yahoo')
         
         # 不動産含み益が多いとされる日本企業リスト
         self.target_companies = [
@@ -160,9 +177,11 @@ class RealEstateHiddenValueSearcher(SearchBase):
 
     def get_market_cap(self, ticker_code):
         """Yahoo Financeから時価総額を取得する"""
+        start = time.monotonic()
         try:
-            ticker = yf.Ticker(ticker_code)
-            info = ticker.info
+            import yfinance as yf
+            info = self.yfinance_retry_policy.call(lambda: yf.Ticker(ticker_code).info)
+            record_call('yfinance', start, searcher=type(self).__name__, status='ok')
             
             if 'marketCap' in info:
                 # 円単位を億円に変換
@@ -173,16 +192,21 @@ class RealEstateHiddenValueSearcher(SearchBase):
                 return self.get_market_cap_alternative(ticker_code)
                 
         except Exception as e:
+            record_call('yfinance', start, searcher=type(self).__name__, status='error')
             self.logger.error(f"時価総額取得エラー: {str(e)}")
             return self.get_market_cap_alternative(ticker_code)
 
     def get_market_cap_alternative(self, ticker_code):
         """代替手段で時価総額を取得する（スクレイピングなど）"""
+        start = time.monotonic()
         try:
             url = f"https://finance.yahoo.co.jp/quote/{ticker_code}"
-            response = requests.get(url)
+            response = self.yahoo_retry_policy.call(requests.get, url, timeout=HTTP_CONFIG['timeout'])
+            record_call('yahoo', start, searcher=type(self).__name__, status=response.status_code,
+                        response_bytes=len(response.content))
             
             if response.status_code == 200:
+                from bs4 import BeautifulSoup
                 soup = BeautifulSoup(response.text, 'html.parser')
                 # 時価総額を含む要素を探す
                 market_cap_element = soup.find(text=re.compile('時価総額'))
@@ -259,19 +283,12 @@ class RealEstateHiddenValueSearcher(SearchBase):
             self.logger.error("不動産含み益データの取得に失敗しました")
             return {}
             
-        # JSONデータを抽出
-        json_match = re.search(r'``````', response_text, re.DOTALL)
-
-        if json_match:
-            json_str = json_match.group(1)
-            try:
-                return eval(json_str)  # JSONを辞書に変換
-            except Exception as e:
-                self.logger.error(f"JSONパースエラー: {str(e)}")
-                return {}
-        else:
+        # JSONデータを抽出（企業コードを多く含むオブジェクトを選ぶ）
+        data = extract_json(response_text, keys=[company['code'] for company in self.target_companies])
+        if data is None:
             self.logger.error("JSONデータが見つかりませんでした")
             return {}
+        return data
 
     def calculate_hidden_value_ratio(self):
         """不動産含み益と時価総額の比率を計算し、ランキングを作成する"""
@@ -313,27 +330,52 @@ class RealEstateHiddenValueSearcher(SearchBase):
         
         return result
 
-    def execute_search(self):
+    def output_path(self):
+        return f'M:/ML/ChatGPT/gennote/test/output/{datetime.now().strftime("%Y-%m-%d")}_real_estate_hidden_value.md'
+
+    def search(self):
+        """ランキングを作成してファイルへ保存し、保存先を返す（本日の出力が最新なら再利用）"""
+        if self.is_fresh_output(FRESHNESS_NAME, self.output_path()):
+            return self.output_path()
         try:
             # 不動産含み益と時価総額の比率を計算
             hidden_value_ranking = self.calculate_hidden_value_ratio()
             
             if not hidden_value_ranking:
                 self.logger.error("ランキングデータの作成に失敗しました")
-                return False
+                return None
                 
-            # 投稿処理
-            poster = RealEstateHiddenValuePostProcessor()
-            success = poster.post_content(hidden_value_ranking)
-            
-            return success
+            filename = RealEstateHiddenValuePostProcessor().save_content(hidden_value_ranking)
+            if filename:
+                self.record_output(FRESHNESS_NAME, filename)
+            return filename
         except Exception as e:
             self.logger.error(f"調査実行エラー: {str(e)}")
-            return False
+            return None
+
+    def is_up_to_date(self):
+        """本日の出力が完了済みかつ投稿済みか"""
+        return (self.is_fresh_output(FRESHNESS_NAME, self.output_path())
+                and self.is_posted(FRESHNESS_NAME, self.output_path(), RealEstateHiddenValuePostProcessor()))
+
+    def post(self):
+        """保存済みのレポートを投稿（同じ内容を投稿済みなら何もしない）"""
+        poster = RealEstateHiddenValuePostProcessor()
+        if self.is_posted(FRESHNESS_NAME, self.output_path(), poster):
+            return True
+        success = poster.post_content()
+        if success:
+            self.record_post(FRESHNESS_NAME, self.output_path())
+        return success
+
+    def execute_search(self):
+        if self.search():
+            return self.post()
+        return False
 
 def main():
-    searcher = RealEstateHiddenValueSearcher()
-    searcher.execute_search()
+    # 常駐ワーカーが起動していればそちらで実行（未起動ならこのプロセスで実行）
+    return run_or_submit('search_estate_value.RealEstateHiddenValueSearcher', lambda: RealEstateHiddenValueSearcher().execute_search())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(0 if main() else 1)
\ No newline at end of file
@@ -0,0 +1,123 @@
+# single_flight.py
+import os
+import time
+import threading
+import logging
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """同一キーの実行中呼び出しを1回にまとめる
+
+    プロセス内: 後続の呼び出しは先行呼び出しの完了を待って同じ結果を受け取る。
+    プロセス間: lock_dir のロックファイルで先行プロセスを検出し、完了後に
+    lookup()（共有キャッシュ参照等）で結果を受け取る。取れなければ自分で実行する。
+    実行中はheartbeat_interval毎にロックファイルの更新時刻を更新し、wait_timeoutの間
+    更新が無いロックのみ異常終了とみなす（実行時間がwait_timeoutを超えても合流できる）。
+    """
+
+    def __init__(self, lock_dir, wait_timeout=600, poll_interval=1.0, heartbeat_interval=None):
+        os.makedirs(lock_dir, exist_ok=True)
+        self.lock_dir = lock_dir
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval or wait_timeout / 4
+        self.saved = 0
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.logger = logging.getLogger(__name__)
+
+    def _count_saved(self):
+        with self._lock:
+            self.saved += 1
+            self.logger.info(f"実行中の同一リクエストに合流 (累計{self.saved}件削減)")
+
+    def do(self, key, func, lookup=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+        if not leader:
+            self._count_saved()
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._do_across_processes(key, func, lookup)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def _lock_path(self, key):
+        return os.path.join(self.lock_dir, f"{key}.lock")
+
+    def _try_lock(self, path):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(os.getpid()))
+        return True
+
+    def _keep_alive(self, path, stop):
+        """実行が終わるまでロックファイルの更新時刻を定期的に更新する"""
+        while not stop.wait(self.heartbeat_interval):
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                return
+
+    def _wait_for_other_process(self, path):
+        """ロックファイルが消えるまで待つ。更新の止まった古いロックは異常終了とみなして削除"""
+        while os.path.exists(path):
+            try:
+                if time.time() - os.path.getmtime(path) > self.wait_timeout:
+                    self.logger.warning(f"古いロックファイルを削除: {path}")
+                    os.remove(path)
+                    return
+            except FileNotFoundError:
+                return
+            time.sleep(self.poll_interval)
+
+    def _do_across_processes(self, key, func, lookup):
+        path = self._lock_path(key)
+        while not self._try_lock(path):
+            self._wait_for_other_process(path)
+            if lookup is not None:
+                result = lookup()
+                if result is not None:
+                    self._count_saved()
+                    return result
+        stop = threading.Event()
+        keeper = threading.Thread(target=self._keep_alive, args=(path, stop), daemon=True)
+        keeper.start()
+        try:
+            # ロック取得直前に他プロセスが完了していた場合に備えて再確認
+            if lookup is not None:
+                result = lookup()
+                if result is not None:
+                    return result
+            return func()
+        finally:
+            stop.set()
+            keeper.join()
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
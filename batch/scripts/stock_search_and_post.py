@@ -1,11 +1,12 @@
 import os
+import sys
 import json
 import time
 import logging
 from datetime import datetime, timezone, timedelta
 import re
 import csv
-import yfinance as yf
+import argparse
 import requests
 
 # --- 基底クラスのインポート ---
@@ -14,6 +15,15 @@ BASE_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
 try:
     from search_base import SearchBase
     from post_base import PostBase
+    from config import HTTP_CONFIG, JOURNAL_CONFIG, RATE_LIMIT_CONFIG, JOB_QUEUE_CONFIG, SWEEP_CONFIG
+    from retry_policy import RetryPolicy
+    from telemetry import record_call
+    from run_journal import RunJournal
+    from worker_daemon import run_or_submit
+    from job_queue import JobDeferred, JobWorker, open_job_queue
+    from dossier_sweep import load_universe, latest_dossiers, plan_sweep, shard, enqueue_sweep, sweep_run_id
+    from composite_prompt import build_composite_prompt, split_composite
+    from json_extract import extract_json
 except ImportError:
     logging.critical("基底クラス SearchBase または PostBase のインポートに失敗しました。")
     raise
@@ -25,23 +35,32 @@ logger = logging.getLogger(__name__)
 # --- 定数 ---
 PROMPT_DIR = os.path.join(SCRIPT_DIR, 'prompt')
 FIND_STOCK_PROMPT_PATH = os.path.join(PROMPT_DIR, 'find_most_rising_stock_name_and_code.md')
+FIND_TOP_STOCKS_PROMPT_PATH = os.path.join(PROMPT_DIR, 'find_top_rising_stocks.md')
 CATEGORY_PROMPT_DIR = os.path.join(PROMPT_DIR, 'category_prompts')
+COMPOSITE_PROMPT_PATH = os.path.join(PROMPT_DIR, 'composite_dossier.md')
 OUTPUT_DIR = os.path.join(BASE_DIR, 'test', 'output')
 EXCLUDED_STOCKS_FILE = os.path.join(SCRIPT_DIR, 'excluded_stocks.csv')
 
-DOMAIN_FILTER = [
-    'nikkei.com', 'bloomberg.co.jp', 'finance.yahoo.co.jp',
-    'kabutan.jp', 'minkabu.jp', 'toyokeizai.net', 'diamond.jp',
-    'reuters.co.jp', 'disclosure.edinet-fsa.go.jp', 'jpx.co.jp',
-]
+DOMAIN_PROFILE = 'stock_pick'  # config.SEARCH_DOMAINSのキー
 RECENCY_DAYS_DETAIL = 7
 RECENCY_DAYS_FIND = 1
+# カテゴリ検索・yfinance取得を並行実行する際の待ち時間の上限（秒）。超過したカテゴリのみ欠損として扱う
+DETAIL_TIMEOUT = 900
+# 上位N銘柄モード: 除外で減る分を見込んで余分に取得する件数と、同時に作成するドシエ数
+TOP_N_EXTRA = 3
+DOSSIER_WORKERS = 3
 BLOG_TAGS_COMMON = ["株式投資", "個別株", "銘柄分析", "日本株", "JSONデータ"]
 BLOG_CATEGORIES = ["マーケット", "投資", "金融"]
 CATEGORIES_TO_SEARCH = [
     "basic_info", "business_info", "financial_info",
     "management_strategy", "analyst_evaluation",
 ]
+CATEGORY_KEYS = {"basic_info": "基本情報", "business_info": "事業情報", "financial_info": "財務情報",
+                 "management_strategy": "経営戦略", "analyst_evaluation": "証券アナリスト評価"}
+# 検索単位。複数カテゴリのグループは複合プロンプト1回でまとめて取得する（方式の比較は bench_dossier_modes.py）
+CATEGORY_GROUPS = [[category] for category in CATEGORIES_TO_SEARCH]
+# 複合プロンプトで欠損したカテゴリを個別に検索し直すか
+COMPOSITE_FALLBACK = True
 JST = timezone(timedelta(hours=+9), 'JST')
 
 class StockSearcherPosterFull(SearchBase, PostBase):
@@ -51,6 +70,13 @@ class StockSearcherPosterFull(SearchBase, PostBase):
         PostBase.__init__(self)
         os.makedirs(OUTPUT_DIR, exist_ok=True)
         self.excluded_codes = self._load_excluded_stocks()
+        # 急騰銘柄検索 + グループ毎の詳細検索
+        self.estimated_calls = 1 + len(CATEGORY_GROUPS)
+        self.domain_filter = self.get_domain_filter(DOMAIN_PROFILE)
+        # yfinanceは参照のみのため例外の種類を問わず再試行
+        self.yfinance_retry_policy = RetryPolicy.from_config(
+            RATE_LIMIT_CONFIG['retry_config'], name='yfinance', retry_exceptions=(Exception,)
+        )
         logger.info(f"除外リスト読込 ({len(self.excluded_codes)}件): {EXCLUDED_STOCKS_FILE}")
 
     def _load_excluded_stocks(self):
@@ -75,13 +101,17 @@ class StockSearcherPosterFull(SearchBase, PostBase):
                 logger.info(f"除外リストに {ticker_code} を追加: {EXCLUDED_STOCKS_FILE}")
             except Exception as e: logger.error(f"除外リスト書込エラー ({ticker_code}): {e}")
 
-    def _call_perplexity_api(self, prompt, domain_filter, recency_days):
+    def _call_perplexity_api(self, prompt, domain_filter, recency_days, keys=()):
+        """応答からJSONオブジェクトを取り出して返す（候補が複数あればkeysを多く含むもの）"""
         response_str = None
         try:
             response_str = self.call_perplexity_api(prompt, domain_filter, recency_days=recency_days)
             if response_str:
-                json_match = re.search(r'\{.*\}', response_str, re.DOTALL)
-                if json_match: return json_match.group(0)
+                data = extract_json(response_str, keys)
+                if data is not None: return data
+                # JSONを含まない応答はキャッシュに残すと再実行でも失敗するため破棄
+                logger.warning("   -> 応答にJSONなし。キャッシュ破棄")
+                self.invalidate_cached_response(prompt, domain_filter, recency_days)
         except Exception as e: logger.error(f"API呼出エラー: {e}")
         return None
 
@@ -93,48 +123,71 @@ class StockSearcherPosterFull(SearchBase, PostBase):
         except FileNotFoundError:
             logger.error(f"プロンプト欠落: {FIND_STOCK_PROMPT_PATH}"); return None, None
 
-        exclusion_instruction = ""
-        if self.excluded_codes:
-            codes_str = ", ".join(sorted(list(self.excluded_codes)))
-            exclusion_instruction = f"\n\n## 除外指示\n以下の証券コードの銘柄は**絶対に**選択しないでください: [{codes_str}]"
+        exclusion_instruction = self._exclusion_instruction()
 
         if "## 実行指示" in find_stock_prompt_template:
             find_stock_prompt = find_stock_prompt_template.replace("## 実行指示", f"{exclusion_instruction}\n\n## 実行指示")
         else: find_stock_prompt = find_stock_prompt_template + exclusion_instruction
 
-        stock_info_json_str = self._call_perplexity_api(find_stock_prompt, DOMAIN_FILTER, RECENCY_DAYS_FIND)
-        if not stock_info_json_str: return None, None
+        stock_info = self._call_perplexity_api(find_stock_prompt, self.domain_filter, RECENCY_DAYS_FIND, keys=("法人名", "証券コード"))
+        if not stock_info: return None, None
+
+        stock_name = stock_info.get("法人名")
+        ticker_code = stock_info.get("証券コード")
+        if isinstance(ticker_code, int): ticker_code = str(ticker_code)
+        if ticker_code in self.excluded_codes:
+            logger.warning(f"   -> 抽出銘柄 {stock_name}({ticker_code}) は除外対象。スキップ。"); return None, None
+        if stock_name and isinstance(stock_name, str) and ticker_code and re.match(r'^\d{4}$', ticker_code):
+            logger.info(f"   -> 特定: {stock_name} ({ticker_code})"); return stock_name, ticker_code
+
+        logger.error("   -> 銘柄特定失敗"); return None, None
+
+    def _exclusion_instruction(self):
+        if not self.excluded_codes: return ""
+        codes_str = ", ".join(sorted(list(self.excluded_codes)))
+        return f"\n\n## 除外指示\n以下の証券コードの銘柄は**絶対に**選択しないでください: [{codes_str}]"
 
-        stock_name, ticker_code = None, None
+    def find_top_rising_stocks(self, count):
+        """1回の検索で急騰銘柄を最大count件取得する（除外・重複を除いた [{'法人名', '証券コード'}, ...]）"""
+        logger.info(f"1. 急騰銘柄検索 (上位{count}銘柄, 除外考慮)")
         try:
-            stock_info = json.loads(stock_info_json_str)
-            stock_name = stock_info.get("法人名")
-            ticker_code = stock_info.get("証券コード")
+            with open(FIND_TOP_STOCKS_PROMPT_PATH, 'r', encoding='utf-8') as f:
+                prompt_template = f.read()
+        except FileNotFoundError:
+            logger.error(f"プロンプト欠落: {FIND_TOP_STOCKS_PROMPT_PATH}"); return []
+        prompt = prompt_template.replace("{count}", str(count + TOP_N_EXTRA))
+        prompt = prompt.replace("## 実行指示", f"{self._exclusion_instruction()}\n\n## 実行指示")
+
+        response = self._call_perplexity_api(prompt, self.domain_filter, RECENCY_DAYS_FIND, keys=("銘柄",))
+        if not response: return []
+        candidates = response.get("銘柄")
+        if not isinstance(candidates, list): candidates = []
+
+        stocks, seen = [], set()
+        for candidate in candidates:
+            if not isinstance(candidate, dict): continue
+            stock_name, ticker_code = candidate.get("法人名"), candidate.get("証券コード")
             if isinstance(ticker_code, int): ticker_code = str(ticker_code)
+            if not stock_name or not ticker_code or not re.match(r'^\d{4}$', ticker_code) or ticker_code in seen: continue
             if ticker_code in self.excluded_codes:
-                logger.warning(f"   -> 抽出銘柄 {stock_name}({ticker_code}) は除外対象。スキップ。"); return None, None
-            if stock_name and ticker_code and re.match(r'^\d{4}$', ticker_code):
-                logger.info(f"   -> 特定: {stock_name} ({ticker_code})"); return stock_name, ticker_code
-        except json.JSONDecodeError: pass
-
-        match_name = re.search(r'["\']法人名["\']\s*:\s*["\']([^"\']+)["\']', stock_info_json_str)
-        match_code = re.search(r'["\']証券コード["\']\s*:\s*["\']?(\d{4})["\']?', stock_info_json_str)
-        if match_name and match_code:
-            stock_name = match_name.group(1)
-            ticker_code = match_code.group(1)
-            if ticker_code in self.excluded_codes:
-                logger.warning(f"   -> 代替抽出銘柄 {stock_name}({ticker_code}) は除外対象。スキップ。"); return None, None
-            logger.info(f"   -> 代替抽出: {stock_name} ({ticker_code})"); return stock_name, ticker_code
-
-        logger.error("   -> 銘柄特定失敗"); return None, None
+                logger.warning(f"   -> {stock_name}({ticker_code}) は除外対象。スキップ。"); continue
+            seen.add(ticker_code)
+            stocks.append({"法人名": stock_name, "証券コード": ticker_code})
+        stocks = stocks[:count]
+        logger.info(f"   -> 特定: {len(stocks)}件 ({', '.join(stock['証券コード'] for stock in stocks)})")
+        return stocks
 
     def get_stock_data_from_yfinance(self, ticker_code):
         logger.info(f"2. yfinanceデータ取得 ({ticker_code})")
         ticker_jp = f"{ticker_code}.T"
-        try:
+        def fetch():
+            import yfinance as yf
             ticker = yf.Ticker(ticker_jp)
-            info = ticker.info
-            hist = ticker.history(period="2d")
+            return ticker.info, ticker.history(period="2d")
+        start = time.monotonic()
+        try:
+            info, hist = self.yfinance_retry_policy.call(fetch)
+            record_call('yfinance', start, searcher=type(self).__name__, status='ok' if info and not hist.empty else 'empty')
             if not info or hist.empty: return None
             data_date = datetime.now(JST).strftime("%Y-%m-%d")
             stock_data = {"株価": {"現在値": hist['Close'].iloc[-1], "基準日": data_date},
@@ -144,43 +197,90 @@ class StockSearcherPosterFull(SearchBase, PostBase):
             if info.get('trailingPE'): stock_data["バリュエーション指標"].append({"名称": "PER", "値": info['trailingPE'], "基準日": data_date})
             if info.get('priceToBook'): stock_data["バリュエーション指標"].append({"名称": "PBR", "値": info['priceToBook'], "基準日": data_date})
             logger.info(f"   -> yfinanceデータ取得成功"); return stock_data
-        except Exception as e: logger.error(f"   -> yfinanceエラー: {e}"); return None
+        except Exception as e:
+            record_call('yfinance', start, searcher=type(self).__name__, status='error')
+            logger.error(f"   -> yfinanceエラー: {e}"); return None
 
     def _load_category_prompt(self, category, stock_name, ticker_code):
         prompt_path = os.path.join(CATEGORY_PROMPT_DIR, f"{category}.md")
         try:
             with open(prompt_path, 'r', encoding='utf-8') as f: prompt_template = f.read()
-            prompt = prompt_template.replace("{stock_name}", stock_name).replace("{ticker_code}", ticker_code)
-            prompt_lines = prompt.splitlines()
-            cleaned_lines = [line for line in prompt_lines if not line.strip().startswith('## 実行指示') and not line.strip().startswith('**企業:**')]
-            return "\n".join(cleaned_lines).strip()
+            return self._fill_prompt(prompt_template, stock_name, ticker_code)
         except FileNotFoundError: logger.warning(f"   -> プロンプト欠落: {prompt_path}"); return None
 
+    @staticmethod
+    def _fill_prompt(prompt_template, stock_name, ticker_code):
+        prompt = prompt_template.replace("{stock_name}", stock_name).replace("{ticker_code}", ticker_code)
+        prompt_lines = prompt.splitlines()
+        cleaned_lines = [line for line in prompt_lines if not line.strip().startswith('## 実行指示') and not line.strip().startswith('**企業:**')]
+        return "\n".join(cleaned_lines).strip()
+
+    def _load_composite_prompt(self, categories, stock_name, ticker_code):
+        """カテゴリ別プロンプトのスキーマ・情報ソースをまとめた複合プロンプト"""
+        try:
+            prompts = {}
+            for category in categories:
+                with open(os.path.join(CATEGORY_PROMPT_DIR, f"{category}.md"), 'r', encoding='utf-8') as f:
+                    prompts[CATEGORY_KEYS[category]] = f.read().replace("{stock_name}", stock_name).replace("{ticker_code}", ticker_code)
+            with open(COMPOSITE_PROMPT_PATH, 'r', encoding='utf-8') as f: composite_template = f.read()
+        except (FileNotFoundError, KeyError) as e: logger.warning(f"   -> プロンプト欠落: {e}"); return None
+        prompt = build_composite_prompt(composite_template, prompts)
+        if not prompt: logger.warning(f"   -> スキーマ抽出失敗: {', '.join(categories)}"); return None
+        return self._fill_prompt(prompt, stock_name, ticker_code)
+
     def search_detailed_info_by_category(self, stock_name, ticker_code, category):
         logger.info(f"3. カテゴリ情報検索: {category}")
         prompt = self._load_category_prompt(category, stock_name, ticker_code)
         if not prompt: return None
-        response_text = self._call_perplexity_api(prompt, DOMAIN_FILTER, RECENCY_DAYS_DETAIL)
-        if not response_text: return None
+        expected_key = CATEGORY_KEYS.get(category)
+        data = self._call_perplexity_api(prompt, self.domain_filter, RECENCY_DAYS_DETAIL, keys=(expected_key,))
+        if not data: return None
         try:
-            data = json.loads(response_text)
-            category_key_map = {"basic_info": "基本情報", "business_info": "事業情報", "financial_info": "財務情報",
-                                "management_strategy": "経営戦略", "analyst_evaluation": "証券アナリスト評価"}
-            expected_key = category_key_map.get(category)
             if expected_key and expected_key in data: logger.info(f"   -> {category} データ取得成功"); return data[expected_key]
             elif data and isinstance(data, dict) and list(data.keys())[0] == expected_key:
                  logger.info(f"   -> {category} データ取得成功 (ルートキー)"); return data[expected_key]
             else: logger.warning(f"   -> {category} データ構造不一致"); return data
         except Exception as e: logger.error(f"   -> {category} データ処理エラー: {e}"); return None
 
+    def search_detailed_info_by_categories(self, stock_name, ticker_code, categories, fallback=COMPOSITE_FALLBACK):
+        """複数カテゴリを複合プロンプト1回で検索し、カテゴリ名 -> データを返す
+
+        fallback=True の場合、応答に含まれなかったカテゴリは個別に検索し直す。
+        """
+        logger.info(f"3. カテゴリ情報検索 (複合): {', '.join(categories)}")
+        prompt = self._load_composite_prompt(categories, stock_name, ticker_code)
+        group_data = {}
+        keys = {category: CATEGORY_KEYS[category] for category in categories}
+        data = self._call_perplexity_api(prompt, self.domain_filter, RECENCY_DAYS_DETAIL, keys=tuple(keys.values())) if prompt else None
+        if data: group_data = split_composite(data, keys)
+        missing = [category for category in categories if category not in group_data]
+        if missing:
+            logger.warning(f"   -> 複合検索で欠損: {', '.join(missing)}")
+            if fallback:
+                for category in missing:
+                    category_data = self.search_detailed_info_by_category(stock_name, ticker_code, category)
+                    if category_data: group_data[category] = category_data
+        else: logger.info(f"   -> {'+'.join(categories)} データ取得成功")
+        return group_data or None
+
+    def _search_group(self, journal, stage_prefix, stock_name, ticker_code, group):
+        """1グループを検索してカテゴリ名 -> データを返す（1カテゴリのみのグループは従来どおり個別に検索）"""
+        if len(group) == 1:
+            category = group[0]
+            return {category: journal.step(
+                f"{stage_prefix}category:{category}", self.search_detailed_info_by_category, stock_name, ticker_code, category
+            )}
+        return journal.step(
+            f"{stage_prefix}categories:{'+'.join(group)}", self.search_detailed_info_by_categories,
+            stock_name, ticker_code, group
+        ) or {}
+
     def merge_data(self, llm_data, yfinance_data, stock_name, ticker_code):
         logger.info("4. データ統合")
         final_data = {"企業データ": [{}]}
         company_data = final_data["企業データ"][0]
-        category_map = {"basic_info": "基本情報", "business_info": "事業情報", "financial_info": "財務情報",
-                        "management_strategy": "経営戦略", "analyst_evaluation": "証券アナリスト評価"}
         for category_code in CATEGORIES_TO_SEARCH:
-             json_key = category_map.get(category_code)
+             json_key = CATEGORY_KEYS.get(category_code)
              if json_key: company_data[json_key] = llm_data.get(category_code, {})
 
         if company_data.get("基本情報") is None: company_data["基本情報"] = {}
@@ -211,21 +311,180 @@ class StockSearcherPosterFull(SearchBase, PostBase):
         except Exception as e: logger.error(f"   -> 保存失敗: {e}"); filename = None
         return filename
 
-    def execute_search_and_post(self):
-        logger.info("=== 処理開始 ===")
-        start_time = time.time()
+    def _open_journal(self, mode=None):
+        """run単位のジャーナル（同じrunの再実行は完了済みステージから再開）"""
+        name = f"{type(self).__name__}_{mode}" if mode else type(self).__name__
+        path = os.path.join(JOURNAL_CONFIG['dir'], f"{self.run_id}_{name}.json")
+        return RunJournal(path)
 
+    def _find_stock_step(self):
         stock_name, ticker_code = self.find_most_rising_stock()
-        if not stock_name or not ticker_code: logger.error("処理中断: 検索対象銘柄が見つかりませんでした。"); return False
+        if not stock_name or not ticker_code: return None
+        return {"法人名": stock_name, "証券コード": ticker_code}
+
+    def _post_step(self, entry_xml, title=None):
+        # 投稿キュー経由（queueモードではURLは投稿ワーカーの処理後に確定するためNone）
+        success, url = self.publish(entry_xml, title)
+        if not success: return None
+        return {"url": url}
+
+    def _fetch_details(self, journal, stock_name, ticker_code, stage_prefix=""):
+        """yfinance取得と全グループの検索を並行実行し (yfinanceデータ, カテゴリ毎のデータ) を返す
+
+        stage_prefix: 複数銘柄を1つのジャーナルに記録する場合のステージ名の接頭辞
+
+        search_many で並行実行する（Perplexityへの同時リクエスト数は全銘柄で HTTP_CONFIG['max_concurrency'] 以下）。
+        タイムアウトしたグループのカテゴリは欠損とし、完了したカテゴリのみ統合する（完了順によらずカテゴリ順）。
+        実行中のままタイムアウトした検索も完了すればジャーナルに記録され、再実行時に使われる。
+        """
+        results = self.search_many(
+            [lambda: journal.step(f"{stage_prefix}yfinance", self.get_stock_data_from_yfinance, ticker_code)]
+            + [lambda group=group: self._search_group(journal, stage_prefix, stock_name, ticker_code, group)
+               for group in CATEGORY_GROUPS],
+            timeout=DETAIL_TIMEOUT, max_workers=HTTP_CONFIG['max_concurrency'] + 1
+        )
+
+        def result(value, stage):
+            if isinstance(value, TimeoutError):
+                logger.warning(f"   -> {stage} タイムアウト ({DETAIL_TIMEOUT}秒)。欠損として続行"); return None
+            if isinstance(value, Exception):
+                logger.error(f"   -> {stage} エラー: {value}"); return None
+            return value
+
+        yfinance_data = result(results[0], "yfinance") or {}
+        found = {}
+        for group, value in zip(CATEGORY_GROUPS, results[1:]):
+            found.update(result(value, '+'.join(group)) or {})
+        llm_detailed_data = {category: found[category] for category in CATEGORIES_TO_SEARCH if found.get(category)}
+        return yfinance_data, llm_detailed_data
+
+    def _build_dossier(self, journal, stock):
+        """1銘柄のドシエを作成して銘柄毎のJSONへ保存し、(保存先, 統合データ) を返す"""
+        stock_name, ticker_code = stock["法人名"], stock["証券コード"]
+        yfinance_data, llm_detailed_data = self._fetch_details(journal, stock_name, ticker_code, f"{ticker_code}:")
+        final_stock_data = self.merge_data(llm_detailed_data, yfinance_data, stock_name, ticker_code)
+        return self.save_to_json(final_stock_data, stock_name, ticker_code), final_stock_data
+
+    def _build_digest(self, dossiers):
+        """複数銘柄のドシエから一覧記事（Markdown）を作成"""
+        def fmt(value): return f"{value:,.2f}" if isinstance(value, (int, float)) else "-"
+
+        lines = ["## 本日の急騰銘柄", "", "| 銘柄 | 株価 | 時価総額(百万円) | PER | PBR |", "|---|---|---|---|---|"]
+        for stock, data in dossiers:
+            market = data["企業データ"][0].get("市場・株式情報") or {}
+            indicators = {item["名称"]: item["値"] for item in market.get("バリュエーション指標") or []}
+            lines.append(
+                f"| [{stock['法人名']}({stock['証券コード']})](https://kabutan.jp/stock/?code={stock['証券コード']}) "
+                f"| {fmt((market.get('株価') or {}).get('現在値'))} | {fmt((market.get('時価総額') or {}).get('金額'))} "
+                f"| {fmt(indicators.get('PER'))} | {fmt(indicators.get('PBR'))} |"
+            )
+        for stock, data in dossiers:
+            lines += ["", f"## {stock['法人名']}({stock['証券コード']})", "", "```",
+                      json.dumps(data, indent=2, ensure_ascii=False, default=str), "```"]
+        return "\n".join(lines)
+
+    def execute_top_n(self, count, digest=True, restart=False):
+        """上位count銘柄のドシエを並行して作成し、銘柄毎のJSONに保存（digest=Trueなら一覧記事を投稿）
+
+        DOSSIER_WORKERS 銘柄を並行して処理し、各銘柄が _fetch_details でカテゴリ検索用のスレッドを持つ。
+        スレッド数は最大 DOSSIER_WORKERS * (max_concurrency+1) 本になるが、Perplexityへの同時リクエスト数は
+        全銘柄で共有するセマフォで HTTP_CONFIG['max_concurrency'] 以下のまま（超えた分はセマフォで待つ）。
+        銘柄・カテゴリ毎の結果はジャーナルに記録し、再実行時は未完了の銘柄・カテゴリのみ検索する。
+        """
+        logger.info(f"=== 処理開始 (上位{count}銘柄) ===")
+        start_time = time.time()
+        journal = self._open_journal(f"top{count}")
+        if restart: journal.clear()
+        self.estimated_calls = 1 + count * len(CATEGORY_GROUPS)
+
+        stocks = journal.step("find_stocks", lambda: self.find_top_rising_stocks(count) or None)
+        if not stocks: logger.error("処理中断: 検索対象銘柄が見つかりませんでした。"); return False
+
+        # 全銘柄で同じセッション・キャッシュ・レート制限・同時実行数の上限を共有する（このインスタンスから並行実行）
+        results = self.search_many(
+            [lambda stock=stock: self._build_dossier(journal, stock) for stock in stocks], max_workers=DOSSIER_WORKERS
+        )
+        dossiers = []
+        for stock, result in zip(stocks, results):
+            if isinstance(result, Exception):
+                logger.error(f"   -> {stock['証券コード']} ドシエ作成エラー: {result}"); continue
+            json_filepath, data = result
+            if json_filepath: dossiers.append((stock, data))
+        logger.info(f"   -> ドシエ保存: {len(dossiers)}/{len(stocks)}銘柄")
+        if not dossiers: return False
+
+        success = True
+        if digest:
+            logger.info("7. はてなブログ投稿 (一覧)")
+            digest_title = f"【注目銘柄】本日の急騰銘柄{len(dossiers)}選 - {datetime.now(JST).strftime('%Y-%m-%d')}"
+            entry_xml = journal.step(
+                "digest_entry_xml", self.create_entry_xml,
+                title=digest_title,
+                content=self._build_digest(dossiers),
+                tags=list(dict.fromkeys([stock["証券コード"] for stock, _ in dossiers] + BLOG_TAGS_COMMON)),
+                categories=BLOG_CATEGORIES
+            )
+            # 1銘柄の投稿とは別のエントリとして投稿キューに積む
+            self.publish_source = f"{type(self).__name__}:top{count}"
+            post_result = journal.step("digest_post", self._post_step, entry_xml, digest_title)
+            success = post_result is not None
+            if success:
+                logger.info(f"   -> 投稿成功: {post_result.get('url') or '投稿キューに追加'}")
+                for stock, _ in dossiers: self._save_excluded_stock(stock["証券コード"])
+            else: logger.error("   -> 投稿失敗 (API応答)")
 
-        yfinance_data = self.get_stock_data_from_yfinance(ticker_code)
-        if yfinance_data is None: yfinance_data = {}
+        logger.info(f"=== 処理完了 ({time.time() - start_time:.2f}秒) ===")
+        return success
+
+    def execute_sweep_shard(self, shard_id, stocks):
+        """全銘柄巡回の作業単位: 各銘柄のドシエを作成してJSONへ保存（投稿・除外リストへの追加はしない）
+
+        ジャーナルは作業単位毎のため、再試行・他ノードでの再取得時は未完了の銘柄・カテゴリから再開する。
+        全銘柄を保存できなければFalse（ジョブキューが再試行する）。
+        予算は日次バッチと別枠の、投入した巡回の予算（shard_id の接頭辞 sweep-{日付}）を使う。
+        日付を跨いで処理・再開しても同じ巡回の予算の範囲で実行する。
+        銘柄毎に入場判定を受け、予算超過の場合は JobDeferred を送出してジョブキューが試行回数に数えずに延期する。
+        """
+        logger.info(f"=== 巡回開始 {shard_id} ({len(stocks)}銘柄) ===")
+        self.job_name = SWEEP_CONFIG['job_name']
+        self.run_id = sweep_run_id(shard_id.rsplit(':', 1)[0])
+        self.budget_limits = SWEEP_CONFIG['budget']
+        # 入場判定は1銘柄分の見積りで銘柄毎に行う
+        self.estimated_calls = len(CATEGORY_GROUPS)
+        journal = RunJournal(os.path.join(JOURNAL_CONFIG['dir'], 'sweep', f"{shard_id.replace(':', '_')}.json"))
+        failed = []
+        for stock in stocks:
+            stock_name, ticker_code = stock["法人名"], stock["証券コード"]
+            if journal.has(f"{ticker_code}:dossier"): continue
+            if not self._readmit_budget():
+                logger.warning("   -> 予算超過のため巡回を中断")
+                raise JobDeferred(f"予算超過 ({self.run_id})", SWEEP_CONFIG['defer_delay'])
+            try:
+                yfinance_data, llm_detailed_data = self._fetch_details(journal, stock_name, ticker_code, f"{ticker_code}:")
+            except Exception as e:
+                logger.error(f"   -> {ticker_code} 詳細取得エラー: {e}"); failed.append(ticker_code); continue
+            # 予算・API障害で全カテゴリが欠損した場合は保存せず、次回の巡回対象に残す
+            if not llm_detailed_data:
+                logger.warning(f"   -> {ticker_code} 詳細情報なし"); failed.append(ticker_code); continue
+            final_stock_data = self.merge_data(llm_detailed_data, yfinance_data, stock_name, ticker_code)
+            json_filepath = journal.step(f"{ticker_code}:dossier", self.save_to_json, final_stock_data, stock_name, ticker_code)
+            if not json_filepath: failed.append(ticker_code)
+        logger.info(f"=== 巡回完了 {shard_id} ({len(stocks) - len(failed)}/{len(stocks)}銘柄) ===")
+        return not failed
+
+    def execute_search_and_post(self, restart=False):
+        logger.info("=== 処理開始 ===")
+        start_time = time.time()
+        journal = self._open_journal()
+        if restart: journal.clear()
+        if journal.has("post"):
+            logger.info(f"投稿済みのためスキップ: {journal.get('post').get('url')}"); return True
+
+        stock = journal.step("find_stock", self._find_stock_step)
+        if not stock: logger.error("処理中断: 検索対象銘柄が見つかりませんでした。"); return False
+        stock_name, ticker_code = stock["法人名"], stock["証券コード"]
 
-        llm_detailed_data = {}
-        for category in CATEGORIES_TO_SEARCH:
-            category_data = self.search_detailed_info_by_category(stock_name, ticker_code, category)
-            if category_data: llm_detailed_data[category] = category_data
-            time.sleep(0.2)
+        yfinance_data, llm_detailed_data = self._fetch_details(journal, stock_name, ticker_code)
 
         final_stock_data = self.merge_data(llm_detailed_data, yfinance_data, stock_name, ticker_code)
 
@@ -261,12 +520,14 @@ class StockSearcherPosterFull(SearchBase, PostBase):
 
         success = False
         try:
-            entry_xml = self.create_entry_xml(
+            entry_xml = journal.step(
+                "entry_xml", self.create_entry_xml,
                 title=blog_title, content=blog_content, tags=post_tags, categories=BLOG_CATEGORIES
             )
-            success, url = self.post_to_hatena(entry_xml)
+            post_result = journal.step("post", self._post_step, entry_xml, blog_title)
+            success = post_result is not None
             if success:
-                logger.info(f"   -> 投稿成功: {url}"); self._save_excluded_stock(ticker_code)
+                logger.info(f"   -> 投稿成功: {post_result.get('url') or '投稿キューに追加'}"); self._save_excluded_stock(ticker_code)
             else: logger.error("   -> 投稿失敗 (API応答)")
         except Exception as e: logger.error(f"   -> 投稿処理エラー: {e}")
 
@@ -274,11 +535,70 @@ class StockSearcherPosterFull(SearchBase, PostBase):
         logger.info(f"=== 処理完了 ({end_time - start_time:.2f}秒) ===")
         return success
 
-def main():
+def _plan_sweep_shards():
+    universe = load_universe(SWEEP_CONFIG['universe_file'], SWEEP_CONFIG['markets'])
+    due = plan_sweep(
+        universe, latest_dossiers(OUTPUT_DIR), datetime.now(JST).date(),
+        SWEEP_CONFIG['refresh_days'], SWEEP_CONFIG['nightly_limit']
+    )
+    logger.info(f"巡回対象: {len(due)}/{len(universe)}銘柄")
+    return shard(due, SWEEP_CONFIG['shard_size'])
+
+
+def run_sweep(work=True, max_workers=None):
+    """全銘柄巡回: 本日の計画を作業単位に分けてジョブキューへ投入し、work=Trueならこのプロセスでも処理する
+
+    計画はrun単位のジャーナルに保存するため、中断後に再実行しても同じ作業単位を投入し直すだけで
+    （投入済みのジョブは無視される）、完了済みの作業単位・銘柄は実行しない。
+    他のノードは job_queue.py work で同じキューを処理できる。
+    run_idは日次バッチと別の sweep-{日付}（予算・ジャーナルを共有しない）。
+    """
+    run_id = sweep_run_id(SearchBase.current_run_id())
+    journal = RunJournal(os.path.join(JOURNAL_CONFIG['dir'], 'sweep', f"{run_id}_plan.json"))
+    shards = journal.step("plan", _plan_sweep_shards)
+    queue = open_job_queue(JOB_QUEUE_CONFIG)
+    enqueue_sweep(queue, shards, run_id)
+    logger.info(f"作業単位: {len(shards)}件 ({sum(len(stocks) for stocks in shards)}銘柄)")
+    if work:
+        worker = JobWorker(
+            queue,
+            max_workers=max_workers or SWEEP_CONFIG['max_workers'],
+            visibility_timeout=JOB_QUEUE_CONFIG['visibility_timeout'],
+            heartbeat_interval=JOB_QUEUE_CONFIG['heartbeat_interval']
+        )
+        logger.info(f"処理結果: {worker.drain()}")
+    counts = queue.counts()
+    logger.info(f"キュー: {counts}")
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='急騰銘柄のドシエ作成・投稿')
+    parser.add_argument('--restart', action='store_true', help='同じrunのジャーナルを破棄して最初から実行')
+    parser.add_argument('--top', type=int, help='上位N銘柄のドシエを作成（省略時は1銘柄を投稿）')
+    parser.add_argument('--no-digest', action='store_true', help='--top指定時に一覧記事を投稿しない')
+    parser.add_argument('--sweep', action='store_true', help='全銘柄のうち更新時期を迎えた銘柄のドシエを作成（投稿しない）')
+    parser.add_argument('--no-work', action='store_true', help='--sweep指定時にジョブキューへの投入のみ行う')
+    parser.add_argument('--max-workers', type=int, help='--sweep指定時に並行して処理する作業単位の数')
+    args = parser.parse_args(argv)
     try:
-        searcher_poster = StockSearcherPosterFull()
-        searcher_poster.execute_search_and_post()
-    except Exception as e: logger.critical(f"実行エラー: {e}", exc_info=True)
+        if args.sweep:
+            # 作業単位毎の失敗はジョブキューが再試行するため、投入・処理できれば成功とする
+            run_sweep(not args.no_work, args.max_workers); return True
+        # 常駐ワーカーが起動していればそちらで実行（未起動ならこのプロセスで実行）
+        if args.top:
+            return run_or_submit(
+                'stock_search_and_post.StockSearcherPosterFull',
+                lambda: StockSearcherPosterFull().execute_top_n(args.top, not args.no_digest, args.restart),
+                method='execute_top_n', args=[args.top, not args.no_digest, args.restart]
+            )
+        else:
+            return run_or_submit(
+                'stock_search_and_post.StockSearcherPosterFull',
+                lambda: StockSearcherPosterFull().execute_search_and_post(args.restart),
+                method='execute_search_and_post', args=[args.restart]
+            )
+    except Exception as e: logger.critical(f"実行エラー: {e}", exc_info=True); return False
 
 if __name__ == "__main__":
-    main()
+    sys.exit(0 if main() else 1)
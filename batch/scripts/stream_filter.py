@@ -0,0 +1,50 @@
+# stream_filter.py
+
+
+class ThinkTagStripper:
+    """ストリーミング応答から <think>…</think> を逐次除去する
+
+    タグがチャンク境界で分割されても正しく扱えるよう、
+    タグの先頭になり得る末尾部分だけを次のチャンクまで保留する。
+    """
+
+    OPEN_TAG = '<think>'
+    CLOSE_TAG = '</think>'
+
+    def __init__(self):
+        self.buffer = ''
+        self.inside = False
+
+    @staticmethod
+    def _partial_tag_length(text, tag):
+        """textの末尾がtagの先頭と一致する最大長"""
+        for length in range(min(len(text), len(tag) - 1), 0, -1):
+            if text.endswith(tag[:length]):
+                return length
+        return 0
+
+    def feed(self, chunk):
+        """チャンクを受け取り、出力可能になった本文を返す"""
+        self.buffer += chunk
+        output = []
+        while True:
+            tag = self.CLOSE_TAG if self.inside else self.OPEN_TAG
+            index = self.buffer.find(tag)
+            if index >= 0:
+                if not self.inside:
+                    output.append(self.buffer[:index])
+                self.buffer = self.buffer[index + len(tag):]
+                self.inside = not self.inside
+                continue
+            keep = self._partial_tag_length(self.buffer, tag)
+            if not self.inside:
+                output.append(self.buffer[:len(self.buffer) - keep])
+            self.buffer = self.buffer[len(self.buffer) - keep:]
+            return ''.join(output)
+
+    def flush(self):
+        """ストリーム終端で保留中の本文を返す（閉じられていないthinkは破棄）"""
+        remaining = '' if self.inside else self.buffer
+        self.buffer = ''
+        self.inside = False
+        return remaining
@@ -1,20 +1,26 @@
 # summary_gemini.py
 
 import os
+import sys
 import glob
 from datetime import datetime
+import time
 import logging
-import google.generativeai as genai
 from dotenv import load_dotenv
 from post_base import PostBase
+from config import RATE_LIMIT_CONFIG
+from retry_policy import RetryPolicy
+from telemetry import record_call
 import heapq
+from worker_daemon import run_or_submit
 
 class GeminiSummarizer:
     def __init__(self, max_files=10):
         # 環境変数の読み込み
         load_dotenv('M:/ML/ChatGPT/gennote/.env')
         
-        # Gemini API キーの設定
+        # Gemini API キーの設定（google.generativeaiは要約時にのみ読み込む）
+        import google.generativeai as genai
         self.gemini_api_key = os.getenv('GEMINI_API_KEY')
         genai.configure(api_key=self.gemini_api_key)
         
@@ -33,7 +39,9 @@ class GeminiSummarizer:
         self._setup_logging()
         
         # Geminiモデルの設定
-        self.model = genai.GenerativeModel('gemini-1.5-pro')
+        self.model_name = 'gemini-1.5-pro'
+        self.model = genai.GenerativeModel(self.model_name)
+        self.retry_policy = RetryPolicy.from_config(RATE_LIMIT_CONFIG['retry_config'], name='gemini')
 
     def _setup_logging(self):
         """ロギングの設定"""
@@ -43,23 +51,26 @@ class GeminiSummarizer:
         )
         self.logger = logging.getLogger(__name__)
 
-    def read_markdown_files(self):
-        """最新のマークダウンファイルを読み込む"""
+    def read_markdown_files(self, file_paths=None):
+        """マークダウンファイルを読み込む（file_paths未指定の場合は最新のファイル）"""
         try:
-            # 入力フォルダが存在するか確認
-            if not os.path.exists(self.input_folder):
-                self.logger.error(f"入力フォルダが存在しません: {self.input_folder}")
-                return None
-            
-            # マークダウンファイルのパスを取得
-            markdown_files = glob.glob(os.path.join(self.input_folder, '*.md'))
-            
-            if not markdown_files:
-                self.logger.warning("マークダウンファイルが見つかりませんでした")
-                return None
-            
-            # ファイルの最終更新日時を取得し、最新のファイルを選択
-            latest_files = heapq.nlargest(self.max_files, markdown_files, key=os.path.getmtime)
+            if file_paths:
+                latest_files = list(file_paths)[:self.max_files]
+            else:
+                # 入力フォルダが存在するか確認
+                if not os.path.exists(self.input_folder):
+                    self.logger.error(f"入力フォルダが存在しません: {self.input_folder}")
+                    return None
+                
+                # マークダウンファイルのパスを取得
+                markdown_files = glob.glob(os.path.join(self.input_folder, '*.md'))
+                
+                if not markdown_files:
+                    self.logger.warning("マークダウンファイルが見つかりませんでした")
+                    return None
+                
+                # ファイルの最終更新日時を取得し、最新のファイルを選択
+                latest_files = heapq.nlargest(self.max_files, markdown_files, key=os.path.getmtime)
             
             # ファイルの内容を読み込む
             markdown_contents = {}
@@ -151,10 +162,25 @@ class GeminiSummarizer:
             prompt = self.create_summary_prompt(combined_content, file_list)
             
             # Gemini AIによる要約生成
-            response = self.model.generate_content(prompt)
+            start = time.monotonic()
+            try:
+                response = self.retry_policy.call(self.model.generate_content, prompt)
+            except Exception:
+                record_call('gemini', start, searcher=type(self).__name__, model=self.model_name, status='error')
+                raise
             
             if response:
                 summary = response.text
+                usage = getattr(response, 'usage_metadata', None)
+                record_call(
+                    'gemini', start,
+                    searcher=type(self).__name__,
+                    model=self.model_name,
+                    status='ok',
+                    prompt_tokens=getattr(usage, 'prompt_token_count', None),
+                    completion_tokens=getattr(usage, 'candidates_token_count', None),
+                    response_bytes=len(summary.encode('utf-8'))
+                )
                 self.logger.info("要約の生成に成功しました")
                 return summary
             else:
@@ -185,27 +211,36 @@ class GeminiSummarizer:
             self.logger.error(f"要約保存エラー: {str(e)}")
             return None
 
-    def execute(self):
-        """要約処理の実行"""
+    def summarize(self, file_paths=None):
+        """要約を生成して保存し、保存先を返す"""
         # マークダウンファイルの読み込み
-        markdown_contents = self.read_markdown_files()
+        markdown_contents = self.read_markdown_files(file_paths)
         
         if not markdown_contents:
             self.logger.error("処理を中止します: マークダウンファイルが読み込めませんでした")
-            return False
+            return None
         
         # 要約の生成
         summary = self.generate_summary(markdown_contents)
         
         if not summary:
             self.logger.error("処理を中止します: 要約の生成に失敗しました")
-            return False
+            return None
         
         # 要約の保存
         output_file = self.save_summary(summary)
         
         if not output_file:
             self.logger.error("処理を中止します: 要約の保存に失敗しました")
+            return None
+        
+        return output_file
+
+    def execute(self, file_paths=None):
+        """要約処理の実行"""
+        output_file = self.summarize(file_paths)
+        
+        if not output_file:
             return False
         
         # はてなブログへの投稿
@@ -257,10 +292,11 @@ class GeminiSummaryPoster(PostBase):
                 categories=self.categories
             )
             
-            success, url = self.post_to_hatena(entry_xml)
+            success, url = self.publish(entry_xml, title)
             
             if success:
-                self.logger.info(f"投稿URL: {url}")
+                if url:
+                    self.logger.info(f"投稿URL: {url}")
                 return True
             else:
                 self.logger.error("はてなブログへの投稿に失敗しました")
@@ -272,11 +308,13 @@ class GeminiSummaryPoster(PostBase):
 
 
 def main():
-    # 最新の10ファイルを処理
-    summarizer = GeminiSummarizer(max_files=10)
-    result = summarizer.execute()
+    # 最新の10ファイルを処理（常駐ワーカーが起動していればそちらで実行）
+    result = run_or_submit(
+        'summary_gemini.GeminiSummarizer', lambda: GeminiSummarizer(max_files=10).execute(), method='execute'
+    )
     print(f"処理結果: {'成功' if result else '失敗'}")
+    return result
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(0 if main() else 1)
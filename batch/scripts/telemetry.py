@@ -0,0 +1,117 @@
+# telemetry.py
+import os
+import re
+import sys
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+
+
+class TelemetrySink:
+    """API呼び出し毎の記録をJSONLとPrometheus textfile形式で出力する
+
+    JSONLは日付毎のファイルに追記する（1行1呼び出し）。
+    Prometheus用ファイルはプロセス内の集計を実行スクリプト単位のファイルへ書き出す。
+    """
+
+    def __init__(self, jsonl_dir, prom_dir, script_name=None):
+        os.makedirs(jsonl_dir, exist_ok=True)
+        os.makedirs(prom_dir, exist_ok=True)
+        self.jsonl_dir = jsonl_dir
+        script = script_name or os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0]
+        self.script = re.sub(r'[^A-Za-z0-9_]', '_', script) or 'python'
+        self.prom_path = os.path.join(prom_dir, f"gennote_{self.script}.prom")
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def record(self, service, searcher=None, model=None, status=None, latency=None,
+               prompt_tokens=None, completion_tokens=None, response_bytes=None, citations=None):
+        entry = {
+            'timestamp': datetime.now().isoformat(timespec='milliseconds'),
+            'script': self.script,
+            'service': service,
+            'searcher': searcher,
+            'model': model,
+            'status': status,
+            'latency': round(latency, 3) if latency is not None else None,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'response_bytes': response_bytes,
+            'citations': citations
+        }
+        jsonl_path = os.path.join(self.jsonl_dir, f"{datetime.now().strftime('%Y-%m-%d')}.jsonl")
+        with self._lock:
+            with open(jsonl_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._accumulate(entry)
+            self._write_prom()
+        return entry
+
+    def _accumulate(self, entry):
+        labels = (entry['service'], entry['searcher'] or '', entry['model'] or '', str(entry['status']))
+        totals = self._totals.setdefault(labels, {
+            'requests': 0, 'latency': 0.0, 'prompt_tokens': 0,
+            'completion_tokens': 0, 'response_bytes': 0, 'citations': 0
+        })
+        totals['requests'] += 1
+        totals['latency'] += entry['latency'] or 0.0
+        for key in ('prompt_tokens', 'completion_tokens', 'response_bytes', 'citations'):
+            totals[key] += entry[key] or 0
+
+    def totals(self, searcher=None):
+        """プロセス内の集計値（searcherを指定した場合はその検索クラスの分のみ）"""
+        result = dict.fromkeys(('requests', 'latency', 'prompt_tokens', 'completion_tokens', 'response_bytes', 'citations'), 0)
+        with self._lock:
+            for (_, name, _, _), totals in self._totals.items():
+                if searcher is None or name == searcher:
+                    for key in result:
+                        result[key] += totals[key]
+        return result
+
+    def _write_prom(self):
+        metrics = [
+            ('gennote_api_requests_total', 'requests', 'counter', 'API呼び出し回数'),
+            ('gennote_api_latency_seconds_sum', 'latency', 'counter', 'API応答時間の合計'),
+            ('gennote_api_prompt_tokens_total', 'prompt_tokens', 'counter', 'プロンプトトークン数'),
+            ('gennote_api_completion_tokens_total', 'completion_tokens', 'counter', '生成トークン数'),
+            ('gennote_api_response_bytes_total', 'response_bytes', 'counter', '応答バイト数'),
+            ('gennote_api_citations_total', 'citations', 'counter', '引用数'),
+        ]
+        lines = []
+        for name, key, metric_type, help_text in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for (service, searcher, model, status), totals in sorted(self._totals.items()):
+                label = (f'script="{self.script}",service="{service}",searcher="{searcher}",'
+                         f'model="{model}",status="{status}"')
+                lines.append(f"{name}{{{label}}} {totals[key]}")
+        tmp_path = self.prom_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, self.prom_path)
+
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def get_telemetry():
+    """TELEMETRY_CONFIGに基づく共有シンクの取得"""
+    global _sink
+    if _sink is None:
+        with _sink_lock:
+            if _sink is None:
+                from config import TELEMETRY_CONFIG
+                _sink = TelemetrySink(TELEMETRY_CONFIG['jsonl_dir'], TELEMETRY_CONFIG['prom_dir'])
+    return _sink
+
+
+def record_call(service, start, **fields):
+    """time.monotonic()の開始時刻から経過時間を計算して記録（記録失敗は呼び出し元に影響させない）"""
+    try:
+        return get_telemetry().record(service, latency=time.monotonic() - start, **fields)
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"Telemetry Error: {str(e)}")
+        return None
@@ -1,6 +1,5 @@
 import logging
 from datetime import datetime
-import markdown
 import re
 
 def setup_logging(filename='app.log'):
@@ -23,5 +22,6 @@ def remove_think_sections(content: str) -> str:
 
 def convert_to_html(content: str) -> str:
     """MarkdownをHTMLに変換"""
+    import markdown
     md = markdown.Markdown(extensions=['extra', 'nl2br'])
     return md.convert(content)
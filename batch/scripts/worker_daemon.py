@@ -0,0 +1,281 @@
+# worker_daemon.py
+import os
+import sys
+import time
+import logging
+import argparse
+import importlib
+import itertools
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from multiprocessing.connection import Client, Listener
+
+from report_specs import load_class
+
+# 認証キーの最小長
+MIN_AUTHKEY_LENGTH = 16
+# 依頼元の指定をジョブに引き継ぐ環境変数（劣化実行・強制実行・run_id。SearchBase.apply_env参照）
+JOB_ENV = ('GENNOTE_DEGRADE', 'GENNOTE_FORCE', 'GENNOTE_RUN_ID')
+
+
+class WorkerUnavailable(Exception):
+    """常駐ワーカーに接続できない"""
+
+
+class JobCancelled(Exception):
+    """常駐ワーカーのジョブが中止された"""
+
+class WorkerDaemon:
+    """重いライブラリを読み込んだまま常駐し、検索・投稿ジョブをローカルソケット経由で実行する
+
+    リクエスト: {'job': 'module.Class', 'method': 'execute_search', 'args': [...], 'env': {...}}
+    ジョブ毎にクラスを生成してメソッドを呼び出し、戻り値（またはエラー）を返す。
+    env（JOB_ENVの依頼元での値）はプロセスの環境変数を変えずに、生成したインスタンスの apply_env() で適用する。
+    job_modules を指定した場合はそのモジュールのクラスのみ、'_' で始まらないメソッドのみ実行する。
+
+    依頼元が切断した場合（タイムアウトで終了した等）や cancel コマンドを受けた場合はジョブを中止する。
+    実行中のジョブはインスタンスの cancel_event をセットし、次のAPI呼び出しの前で止める（SearchBase参照）。
+    """
+
+    def __init__(self, address, authkey, max_workers=4, preload=(), job_modules=None, poll_interval=1.0):
+        if not authkey or len(authkey) < MIN_AUTHKEY_LENGTH:
+            raise ValueError(f"常駐ワーカーには{MIN_AUTHKEY_LENGTH}文字以上の認証キーが必要です")
+        self.address = address
+        self.authkey = authkey
+        self.max_workers = max_workers
+        self.preload = list(preload)
+        self.job_modules = set(job_modules) if job_modules is not None else None
+        self.poll_interval = poll_interval
+        self.logger = logging.getLogger(__name__)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._job_ids = itertools.count(1)
+        # 実行中・実行待ちのジョブ: ID -> (ジョブ名, 中止イベント, Future)
+        self._jobs = {}
+        self.jobs_done = 0
+
+    def _preload(self):
+        for module_name in self.preload + sorted(self.job_modules or ()):
+            start = time.monotonic()
+            try:
+                importlib.import_module(module_name)
+                self.logger.info(f"事前読込: {module_name} ({time.monotonic() - start:.2f}秒)")
+            except Exception as e:
+                self.logger.warning(f"事前読込エラー: {module_name} ({str(e)})")
+
+    def _check_allowed(self, job, method):
+        if method.startswith('_'):
+            raise PermissionError(f"非公開メソッドは実行できません: {method}")
+        if self.job_modules is not None and job.rsplit('.', 1)[0] not in self.job_modules:
+            raise PermissionError(f"許可されていないジョブです: {job}")
+
+    def run_job(self, request, cancel_event=None):
+        start = time.monotonic()
+        try:
+            method = request.get('method', 'execute_search')
+            self._check_allowed(request['job'], method)
+            instance = load_class(request['job'])()
+            if 'env' in request and hasattr(instance, 'apply_env'):
+                instance.apply_env(request['env'])
+            instance.cancel_event = cancel_event
+            if cancel_event is not None and cancel_event.is_set():
+                raise JobCancelled(request['job'])
+            result = getattr(instance, method)(*request.get('args', []))
+            response = {'ok': True, 'result': result}
+        except Exception as e:
+            self.logger.error(f"ジョブ失敗: {request.get('job')} ({str(e)})")
+            response = {'ok': False, 'error': str(e), 'traceback': traceback.format_exc()}
+        if cancel_event is not None and cancel_event.is_set():
+            response = {'ok': False, 'error': 'cancelled'}
+        response['duration'] = time.monotonic() - start
+        with self._lock:
+            self.jobs_done += 1
+        return response
+
+    def cancel(self, job_id):
+        """ジョブを中止する（実行待ちなら実行しない）。該当ジョブが無ければFalse"""
+        with self._lock:
+            entry = self._jobs.get(job_id)
+        if entry is None:
+            return False
+        job, cancel_event, future = entry
+        cancel_event.set()
+        future.cancel()
+        self.logger.warning(f"ジョブ中止: {job} (id={job_id})")
+        return True
+
+    def running_jobs(self):
+        with self._lock:
+            return {job_id: job for job_id, (job, _, _) in self._jobs.items()}
+
+    def _run(self, conn, request):
+        """ジョブを実行して応答を返す。依頼元が切断・中止を依頼した場合はジョブを中止してNoneを返す"""
+        self.logger.info(f"ジョブ受付: {request.get('job')}.{request.get('method', 'execute_search')}")
+        cancel_event = threading.Event()
+        job_id = next(self._job_ids)
+        future = self._executor.submit(self.run_job, request, cancel_event)
+        with self._lock:
+            self._jobs[job_id] = (request.get('job'), cancel_event, future)
+        try:
+            while True:
+                try:
+                    return future.result(timeout=self.poll_interval)
+                except FutureTimeout:
+                    pass
+                # 実行中に届くのは中止の依頼か切断（EOF）のみ
+                if conn.poll():
+                    try:
+                        conn.recv()
+                    except EOFError:
+                        self.logger.warning(f"依頼元が切断しました: {request.get('job')}")
+                    self.cancel(job_id)
+                    return None
+        finally:
+            with self._lock:
+                del self._jobs[job_id]
+
+    def _handle(self, conn):
+        try:
+            request = conn.recv()
+            command = request.get('command', 'run')
+            if command == 'ping':
+                response = {'ok': True, 'result': {'jobs_done': self.jobs_done, 'running': self.running_jobs()}}
+            elif command == 'cancel':
+                response = {'ok': self.cancel(request.get('job_id')), 'result': None}
+            elif command == 'shutdown':
+                response = {'ok': True, 'result': None}
+            else:
+                response = self._run(conn, request)
+                if response is None:
+                    return
+            try:
+                conn.send(response)
+            except Exception:
+                # 戻り値を送れない場合は文字列にして返す
+                response['result'] = repr(response.get('result'))
+                conn.send(response)
+            if command == 'shutdown':
+                self.shutdown()
+        except EOFError:
+            pass
+        except Exception as e:
+            self.logger.error(f"リクエスト処理エラー: {str(e)}")
+        finally:
+            conn.close()
+
+    def serve_forever(self):
+        self._preload()
+        with Listener(self.address, authkey=self.authkey) as listener:
+            self.address = listener.address
+            self.logger.info(f"常駐ワーカー起動: {listener.address}")
+            while not self._stopped.is_set():
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    self.logger.error(f"接続受付エラー: {str(e)}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        self._executor.shutdown(wait=True)
+        self.logger.info("常駐ワーカー停止")
+
+    def shutdown(self):
+        self._stopped.set()
+        # accept()の待機を解除するため自身に接続する
+        try:
+            send_request({'command': 'ping'}, self.address, self.authkey)
+        except WorkerUnavailable:
+            pass
+
+
+def send_request(request, address, authkey, timeout=None):
+    """リクエストを送って応答を返す。timeout秒以内に応答が無ければ中止を依頼してTimeoutError"""
+    try:
+        conn = Client(address, authkey=authkey)
+    except OSError as e:
+        raise WorkerUnavailable(str(e))
+    try:
+        conn.send(request)
+        if timeout is not None and not conn.poll(timeout):
+            conn.send({'command': 'cancel'})
+            raise TimeoutError(f"常駐ワーカーの応答がありません ({timeout}秒)")
+        return conn.recv()
+    finally:
+        conn.close()
+
+
+def load_authkey(authkey=None, authkey_file=None):
+    """認証キーを環境変数（設定値）・キーファイルの順に取得する。無ければNone"""
+    if not authkey and authkey_file and os.path.exists(authkey_file):
+        with open(authkey_file, 'r', encoding='utf-8') as f:
+            authkey = f.read().strip()
+    return authkey.encode('utf-8') if authkey else None
+
+
+def _worker_settings():
+    from config import WORKER_CONFIG
+    authkey = load_authkey(WORKER_CONFIG['authkey'], WORKER_CONFIG.get('authkey_file'))
+    return tuple(WORKER_CONFIG['address']), authkey
+
+
+def submit(job, method='execute_search', args=(), timeout=None):
+    """常駐ワーカーでジョブを実行して戻り値を返す（接続できない・認証キー未設定ならWorkerUnavailable）"""
+    address, authkey = _worker_settings()
+    if authkey is None:
+        raise WorkerUnavailable("認証キーが設定されていません")
+    request = {'job': job, 'method': method, 'args': list(args), 'env': {name: os.getenv(name, '') for name in JOB_ENV}}
+    response = send_request(request, address, authkey, timeout)
+    if not response['ok']:
+        raise RuntimeError(f"{job}.{method}: {response['error']}")
+    return response['result']
+
+
+def run_or_submit(job, local, method='execute_search', args=()):
+    """常駐ワーカーが起動していればそちらで実行し、未起動ならlocal()をこのプロセスで実行"""
+    try:
+        return submit(job, method, args)
+    except WorkerUnavailable:
+        return local()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='検索・投稿ジョブの常駐ワーカー')
+    parser.add_argument('command', choices=['serve', 'submit', 'ping', 'cancel', 'shutdown'])
+    parser.add_argument('job', nargs='?', help="submit時のジョブ ('module.Class')、cancel時のジョブID")
+    parser.add_argument('--method', default='execute_search')
+    parser.add_argument('--timeout', type=float, help='submit時に応答を待つ秒数（超過したらジョブを中止）')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    address, authkey = _worker_settings()
+    if authkey is None:
+        print("認証キーが設定されていません（GENNOTE_WORKER_KEY またはキーファイルで指定）")
+        return 1
+    if args.command == 'serve':
+        from config import WORKER_CONFIG
+        try:
+            daemon = WorkerDaemon(
+                address, authkey, WORKER_CONFIG['max_workers'], WORKER_CONFIG['preload'],
+                job_modules=WORKER_CONFIG['job_modules'], poll_interval=WORKER_CONFIG['poll_interval']
+            )
+        except ValueError as e:
+            print(e)
+            return 1
+        daemon.serve_forever()
+        return 0
+    try:
+        if args.command == 'submit':
+            print(f"処理結果: {submit(args.job, args.method, timeout=args.timeout)}")
+        elif args.command == 'cancel':
+            print(send_request({'command': 'cancel', 'job_id': int(args.job)}, address, authkey))
+        else:
+            print(send_request({'command': args.command}, address, authkey))
+    except WorkerUnavailable as e:
+        print(f"常駐ワーカーに接続できません: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
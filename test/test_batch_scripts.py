@@ -0,0 +1,1594 @@
+import importlib.util
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from pathlib import Path
+
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "batch" / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from rate_limiter import TokenBucketRateLimiter
+from retry_policy import RetryPolicy
+from response_cache import ResponseCache, make_cache_key
+from stream_filter import ThinkTagStripper
+from single_flight import SingleFlight
+from telemetry import TelemetrySink
+from budget import ALLOW, DEFER, DEGRADE, BudgetManager
+from domain_registry import DomainRegistry, normalize_domain
+from composite_prompt import build_composite_prompt, completeness, extract_schema, split_composite
+from json_extract import extract_json, iter_json
+from dossier_sweep import enqueue_sweep, latest_dossiers, load_universe, plan_sweep, shard
+from freshness import check_output, check_post, output_record
+from job_runner import FAILED, SUCCESS, TIMEOUT, JobRunner
+from job_runner import SKIPPED as JOB_SKIPPED
+import job_queue
+from job_queue import FileJobQueue, JobWorker, SQLiteJobQueue
+from market_calendar import MarketCalendar
+from pipeline import SKIPPED, Pipeline, build_daily_pipeline
+from publish_queue import DEAD, DONE, HOLD, PENDING, PublishQueue, PublishWorker
+from report_specs import ReportSpec, all_specs, get_spec, register
+from run_journal import RunJournal
+from scheduler import DEGRADE, JST, RUN, SKIP, CronRule, Scheduler, plan
+import worker_daemon
+from worker_daemon import WorkerDaemon, WorkerUnavailable, load_authkey, run_or_submit, send_request
+
+# search_base・post_base等を使うテスト（config経由でrequests・python-dotenvを読み込む）
+needs_http = unittest.skipUnless(
+    importlib.util.find_spec("requests") and importlib.util.find_spec("dotenv"),
+    "requests / python-dotenv が必要",
+)
+
+
+class RateLimiterTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "rate_limit.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_waits_when_bucket_is_empty(self):
+        limiter = TokenBucketRateLimiter(self.db_path, 2, 0.2)
+        self.assertEqual(limiter.acquire(), 0)
+        self.assertEqual(limiter.acquire(), 0)
+        start = time.monotonic()
+        waited = limiter.acquire()
+        self.assertGreater(waited, 0)
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+    def test_bucket_is_shared_between_instances(self):
+        first = TokenBucketRateLimiter(self.db_path, 1, 0.2)
+        second = TokenBucketRateLimiter(self.db_path, 1, 0.2)
+        self.assertEqual(first.acquire(), 0)
+        self.assertGreater(second.acquire(), 0)
+
+    def test_models_have_separate_buckets(self):
+        limiter = TokenBucketRateLimiter(
+            self.db_path, 1, 60, {"sonar": {"rate_limit": 1, "time_window": 60}}
+        )
+        self.assertEqual(limiter.acquire("sonar-reasoning-pro"), 0)
+        self.assertEqual(limiter.acquire("sonar"), 0)
+
+    def test_lock_timeout_surfaces_original_error(self):
+        limiter = TokenBucketRateLimiter(self.db_path, 1, 60)
+        limiter._connect = lambda: sqlite3.connect(self.db_path, timeout=0.05, isolation_level=None)
+        holder = sqlite3.connect(self.db_path, isolation_level=None)
+        holder.execute("BEGIN IMMEDIATE")
+        try:
+            with self.assertRaisesRegex(sqlite3.OperationalError, "locked"):
+                limiter._try_take("sonar")
+        finally:
+            holder.execute("ROLLBACK")
+            holder.close()
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class RetryPolicyTest(unittest.TestCase):
+    def test_retries_retryable_status_until_success(self):
+        responses = [FakeResponse(503), FakeResponse(502), FakeResponse(200)]
+        policy = RetryPolicy(retry_delay=0)
+        with self.assertLogs("retry_policy", level="WARNING") as logs:
+            result = policy.call(iter(responses).__next__)
+        self.assertIs(result, responses[-1])
+        self.assertEqual(len(logs.output), 2)
+
+    def test_discarded_responses_are_closed_before_retry(self):
+        responses = [FakeResponse(503), FakeResponse(200)]
+        policy = RetryPolicy(retry_delay=0)
+        result = policy.call(iter(responses).__next__)
+        self.assertEqual([r.closed for r in responses], [True, False])
+        self.assertFalse(result.closed)
+
+        error = OSError("503")
+        error.response = FakeResponse(503)
+        calls = []
+
+        def fail_once():
+            calls.append(1)
+            if len(calls) == 1:
+                raise error
+            return FakeResponse(200)
+
+        policy.call(fail_once)
+        self.assertTrue(error.response.closed)
+
+    def test_non_idempotent_call_does_not_retry_server_error(self):
+        calls = []
+        policy = RetryPolicy(retry_delay=0, idempotent=False)
+        result = policy.call(lambda: calls.append(1) or FakeResponse(500))
+        self.assertEqual(result.status_code, 500)
+        self.assertEqual(len(calls), 1)
+
+    def test_exception_without_status_is_retried_only_if_listed(self):
+        policy = RetryPolicy(retry_delay=0, max_retries=2)
+        calls = []
+
+        def fail():
+            calls.append(1)
+            raise ConnectionError("reset")
+
+        with self.assertRaises(ConnectionError):
+            policy.call(fail)
+        self.assertEqual(len(calls), 3)
+        with self.assertRaises(KeyError):
+            policy.call(lambda: {}["missing"])
+
+    def test_retry_after_header_overrides_backoff(self):
+        policy = RetryPolicy(retry_delay=100, max_delay=30)
+        self.assertEqual(policy.compute_delay(1, FakeResponse(429, {"Retry-After": "7"})), 7)
+        self.assertEqual(policy.compute_delay(1, FakeResponse(429, {"Retry-After": "90"})), 30)
+        self.assertEqual(policy.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0)
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_normalizes_prompt_whitespace_and_domains(self):
+        first = make_cache_key("m", "  a\n   b ", ["B.com", "a.com"], "7d")
+        second = make_cache_key("m", "a b", ["a.com", "b.com", "a.com"], "7d")
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, make_cache_key("m", "a b", ["a.com", "b.com"], "1d"))
+
+    def test_ttl_and_hit_miss_counters(self):
+        cache = ResponseCache(self.tmp.name)
+        cache.set("k", "value")
+        self.assertEqual(cache.get("k", ttl=60), "value")
+        self.assertIsNone(cache.get("k", ttl=0))
+        self.assertIsNone(cache.get("missing", ttl=60))
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1})
+
+    def test_evicts_least_recently_used_entry(self):
+        cache = ResponseCache(self.tmp.name, max_entries=2)
+        cache.set("a", "1")
+        time.sleep(0.01)
+        cache.set("b", "2")
+        time.sleep(0.01)
+        cache.get("a", ttl=60)
+        time.sleep(0.01)
+        cache.set("c", "3")
+        self.assertEqual(cache.get("a", ttl=60), "1")
+        self.assertIsNone(cache.get("b", ttl=60))
+        self.assertEqual(cache.get("c", ttl=60), "3")
+
+
+class ThinkTagStripperTest(unittest.TestCase):
+    def strip(self, chunks):
+        stripper = ThinkTagStripper()
+        return "".join(stripper.feed(chunk) for chunk in chunks) + stripper.flush()
+
+    def test_removes_think_block_split_across_chunks(self):
+        text = "<think>reasoning</think>## 本文\n内容<think>more</think>末尾"
+        for size in (1, 2, 3, 7, len(text)):
+            chunks = [text[i:i + size] for i in range(0, len(text), size)]
+            with self.subTest(size=size):
+                self.assertEqual(self.strip(chunks), "## 本文\n内容末尾")
+
+    def test_keeps_text_that_only_resembles_a_tag(self):
+        self.assertEqual(self.strip(["a <thin", "g> b <"]), "a <thing> b <")
+
+    def test_drops_unclosed_think_block(self):
+        self.assertEqual(self.strip(["本文<think>途中"]), "本文")
+
+
+class SingleFlightTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_concurrent_calls_in_process_share_one_execution(self):
+        flight = SingleFlight(self.tmp.name, poll_interval=0.01)
+        calls = []
+        started = threading.Event()
+
+        def work():
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return "result"
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do("k", work)))
+        leader.start()
+        started.wait()
+        followers = [
+            threading.Thread(target=lambda: results.append(flight.do("k", work))) for _ in range(3)
+        ]
+        for thread in followers:
+            thread.start()
+        for thread in [leader] + followers:
+            thread.join()
+        self.assertEqual(results, ["result"] * 4)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.saved, 3)
+
+    def test_waits_for_lock_file_of_other_process(self):
+        first = SingleFlight(self.tmp.name, poll_interval=0.01)
+        second = SingleFlight(self.tmp.name, poll_interval=0.01)
+        shared_cache = {}
+        started = threading.Event()
+
+        def work():
+            started.set()
+            time.sleep(0.2)
+            shared_cache["k"] = "from first"
+            return "from first"
+
+        leader = threading.Thread(target=first.do, args=("k", work))
+        leader.start()
+        started.wait()
+        result = second.do("k", lambda: "from second", lookup=lambda: shared_cache.get("k"))
+        leader.join()
+        self.assertEqual(result, "from first")
+        self.assertEqual(second.saved, 1)
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_long_running_owner_keeps_lock_fresh(self):
+        first = SingleFlight(self.tmp.name, wait_timeout=0.2, poll_interval=0.01, heartbeat_interval=0.05)
+        second = SingleFlight(self.tmp.name, wait_timeout=0.2, poll_interval=0.01)
+        shared_cache = {}
+        started = threading.Event()
+
+        def work():
+            started.set()
+            time.sleep(0.6)
+            shared_cache["k"] = "from first"
+            return "from first"
+
+        leader = threading.Thread(target=first.do, args=("k", work))
+        leader.start()
+        started.wait()
+        result = second.do("k", lambda: "from second", lookup=lambda: shared_cache.get("k"))
+        leader.join()
+        self.assertEqual(result, "from first")
+        self.assertEqual(second.saved, 1)
+
+
+class TelemetrySinkTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_writes_jsonl_record_and_prometheus_totals(self):
+        sink = TelemetrySink(self.tmp.name, os.path.join(self.tmp.name, "prom"), script_name="search_jp")
+        for tokens in (100, 50):
+            sink.record("perplexity", searcher="JPSearcher", model="sonar", status=200, latency=1.5,
+                        prompt_tokens=tokens, completion_tokens=10, response_bytes=2000, citations=3)
+
+        jsonl_files = [name for name in os.listdir(self.tmp.name) if name.endswith(".jsonl")]
+        with open(os.path.join(self.tmp.name, jsonl_files[0]), encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([r["prompt_tokens"] for r in records], [100, 50])
+        self.assertEqual(records[0]["searcher"], "JPSearcher")
+
+        with open(sink.prom_path, encoding="utf-8") as f:
+            prom = f.read()
+        labels = 'script="search_jp",service="perplexity",searcher="JPSearcher",model="sonar",status="200"'
+        self.assertIn(f"gennote_api_requests_total{{{labels}}} 2", prom)
+        self.assertIn(f"gennote_api_prompt_tokens_total{{{labels}}} 150", prom)
+        self.assertIn(f"gennote_api_citations_total{{{labels}}} 6", prom)
+
+        sink.record("perplexity", searcher="ChinaSearcher", model="sonar", status=200, latency=1.0, prompt_tokens=7)
+        self.assertEqual(sink.totals("JPSearcher")["prompt_tokens"], 150)
+        self.assertEqual(sink.totals()["requests"], 3)
+
+
+class BudgetManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "budget.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def manager(self, run_id="run"):
+        return BudgetManager(
+            self.db_path, run_id, token_budget=1000, cost_budget=0, time_budget=0,
+            prices={"sonar": {"input": 1.0, "output": 1.0, "request": 0.01}},
+            reserve={1: 0.0, 4: 0.5},
+        )
+
+    def test_low_priority_is_degraded_then_deferred_as_budget_runs_out(self):
+        budget = self.manager()
+        self.assertEqual(budget.admit("RealEstateSearcher", 4, 100, degrade_model="sonar"), ALLOW)
+        budget.consume("sonar", 400, 200)
+        self.assertEqual(budget.admit("RealEstateSearcher", 4, 100, degrade_model="sonar"), DEGRADE)
+        self.assertEqual(budget.admit("RealEstateSearcher", 4, 100), DEFER)
+        self.assertEqual(budget.admit("JPSearcher", 1, 100), ALLOW)
+        self.assertEqual(budget.deferred_jobs(), ["RealEstateSearcher"])
+
+    def test_usage_is_shared_per_run_id(self):
+        self.manager().consume("sonar", 1_000_000, 0)
+        self.assertEqual(self.manager().usage()["tokens"], 1_000_000)
+        self.assertAlmostEqual(self.manager().usage()["cost"], 1.01)
+        self.assertEqual(self.manager("other").usage()["tokens"], 0)
+
+
+class DomainRegistryTest(unittest.TestCase):
+    # be72a3e以前に各検索クラスへ直書きされていたdomain_filter
+    LEGACY_FILTERS = {
+        "booth": ["booth.pm"],
+        "china_market": ["stats.gov.cn", "pbc.gov.cn", "mofcom.gov.cn", "aastocks.com", "etnet.com.hk", "sse.com.cn"],
+        "crypto": [
+            "cointelegraph.com", "utoday.com", "coindesk.com", "coincodex.com", "coingape.com",
+            "ambcrypto.com", "crypto.news", "bitcoinist.com", "dailyhodl.com", "beincrypto.com",
+            "bitcoin.com", "news.bitcoin.com", "decrypt.co", "blockworks.co", "theblock.co",
+            "coinpost.jp", "cryptowatch.jp", "sec.gov", "finra.org", "bis.org",
+        ],
+        "energy": [
+            "iea.org", "eia.gov", "energy.gov", "enecho.meti.go.jp", "ferc.gov", "opec.org", "ief.org",
+            "cedigaz.org", "ogj.com", "irena.org", "ren21.net", "seia.org", "gwec.net", "iaea.org",
+            "world-nuclear.org", "nei.org", "cmegroup.com", "ice.com", "platts.com", "argusmedia.com",
+            "bloomberg.com", "reuters.com", "spglobal.com", "rystadenergy.com", "woodmac.com", "bp.com",
+            "exxonmobil.com", "shell.com", "chevron.com", "total.com", "nexteraenergy.com", "iberdrola.com",
+        ],
+        "real_estate": [
+            "zillow.com", "redfin.com", "realtor.com", "corelogic.com", "spglobal.com", "realestate.co.jp",
+            "athome.co.jp", "homes.co.jp", "suumo.jp", "nareit.com", "reit.or.jp", "ares.or.jp",
+            "greenstreet.com", "msci.com", "smtri.jp", "jreit.jp", "cbre.com", "jll.com",
+            "cushmanwakefield.com", "colliers.com", "savills.com", "miki-shoji.co.jp", "xymax.co.jp",
+            "mlit.go.jp", "reins.or.jp", "huduser.gov", "freddiemac.com", "fanniemae.com", "retpc.jp",
+            "tdb.co.jp", "nar.realtor", "inman.com", "housingwire.com", "fudosankeisei.co.jp",
+            "nli-research.co.jp", "fudousan-keizai.co.jp", "ken-eyenet.jp", "globalpropertyguide.com",
+            "knightfrank.com", "juwai.com", "propertyfinder.ae", "domain.com.au", "rightmove.co.uk",
+            "immobilienscout24.de",
+        ],
+        "estate_value": [
+            "nikkei.com", "reuters.com", "bloomberg.co.jp", "minkabu.jp", "morningstar.co.jp", "kabutan.jp",
+            "jpx.co.jp", "tdb.co.jp", "mlit.go.jp", "fsa.go.jp", "mof.go.jp", "ir-bank.jp",
+            "buffett-code.com", "kabudragon.com", "ullet.com", "kabupro.jp", "zaimu-express.net",
+        ],
+        "global_macro": [
+            "worldbank.org", "imf.org", "bis.org", "oecd.org", "fred.stlouisfed.org", "ecb.europa.eu",
+            "boj.or.jp", "bloomberg.com", "reuters.com", "ft.com", "wsj.com", "nasdaq.com", "nyse.com",
+            "jpx.co.jp", "tradingeconomics.com", "investing.com", "marketwatch.com", "finance.yahoo.com",
+            "nikkei.com", "quick.co.jp", "minkabu.jp", "mof.go.jp", "esri.cao.go.jp", "stats.gov.cn",
+            "pbc.gov.cn", "sse.com.cn", "aastocks.com", "etnet.com.hk", "cmegroup.com", "ice.com",
+            "lme.com", "eia.gov", "gold.org",
+        ],
+        "jp_stock": [
+            "kabutan.jp", "minkabu.jp", "finance.yahoo.co.jp", "jpx.co.jp", "disclosure.edinet-fsa.go.jp",
+            "www.release.tdnet.info", "www.jpx.co.jp", "jp.reuters.com", "reuters.com", "jp.wsj.com",
+            "www.wsj.com", "bloomberg.co.jp", "www.nikkei.com", "https://www.boj.or.jp/", "www.mof.go.jp",
+            "www.nli-research.co.jp", "www.dlri.co.jp", "www.jcer.or.jp", "www.jeri.co.jp",
+            "www.shenmacro.com", "www.globalmacroresearch.org/jp", "muragoe-makoto.blog.jp",
+            "note.com/utbuffett", "note.com/goto_finance", "note.com/hirosetakao", "note.com/cjdbx883",
+        ],
+        "stock_pick": [
+            "nikkei.com", "bloomberg.co.jp", "finance.yahoo.co.jp", "kabutan.jp", "minkabu.jp",
+            "toyokeizai.net", "diamond.jp", "reuters.co.jp", "disclosure.edinet-fsa.go.jp", "jpx.co.jp",
+        ],
+    }
+
+    def test_normalize_strips_scheme_www_and_keeps_path(self):
+        self.assertEqual(normalize_domain("https://www.boj.or.jp/"), "boj.or.jp")
+        self.assertEqual(normalize_domain("note.com/utbuffett"), "note.com/utbuffett")
+        self.assertEqual(normalize_domain("www.globalmacroresearch.org/jp/"), "globalmacroresearch.org/jp")
+        self.assertEqual(normalize_domain(" WWW.JPX.CO.JP "), "jpx.co.jp")
+        self.assertIsNone(normalize_domain("not a domain"))
+        self.assertIsNone(normalize_domain("localhost"))
+
+    def test_compile_dedups_and_orders_by_weight(self):
+        registry = DomainRegistry({
+            "jp": {
+                "news": {"domains": ["jp.reuters.com", "reuters.com", "www.nikkei.com"], "weight": 1.0},
+                "primary": {"domains": ["jpx.co.jp", "www.jpx.co.jp", "note.com/a", "note.com/b"], "weight": 2.0},
+                "broken": {"domains": ["???"], "weight": 3.0},
+            },
+            "plain": ["a.com", "b.com", "c.com"],
+            "paths": ["note.com/a", "sub.note.com", "note.com", "x.org/a"],
+        }, max_domains=3)
+        self.assertEqual(registry.get("jp"), ["jpx.co.jp", "note.com/a", "reuters.com"])
+        self.assertEqual(registry.dropped["jp"], ["note.com/b", "nikkei.com"])
+        self.assertEqual(registry.invalid, [("jp", "???")])
+        self.assertEqual(registry.get("plain"), ["a.com", "b.com", "c.com"])
+        self.assertEqual(registry.get("paths"), ["note.com", "x.org/a"])
+
+    def test_over_limit_keeps_every_tier_and_warns(self):
+        with self.assertLogs("domain_registry", level="WARNING") as logs:
+            registry = DomainRegistry({
+                "jp": {
+                    "primary": {"domains": ["a.jp", "b.jp", "c.jp"], "weight": 2.0},
+                    "news": {"domains": ["d.com", "e.com"], "weight": 1.0},
+                },
+            }, max_domains=3)
+        self.assertEqual(registry.get("jp"), ["a.jp", "b.jp", "d.com"])
+        self.assertEqual(registry.dropped["jp"], ["c.jp", "e.com"])
+        self.assertIn("c.jp, e.com", logs.output[0])
+
+    def test_profiles_match_legacy_filters(self):
+        """SEARCH_DOMAINSの各プロファイルが旧domain_filterと同じドメインを持ち、除外は記録される"""
+        import config
+
+        registry = DomainRegistry(config.SEARCH_DOMAINS, config.DOMAIN_FILTER_CONFIG["max_domains"])
+        for name, legacy in self.LEGACY_FILTERS.items():
+            with self.subTest(profile=name):
+                expected = DomainRegistry({name: legacy}, max_domains=0).get(name)
+                compiled = registry.get(name)
+                dropped = registry.dropped.get(name, [])
+                self.assertEqual(sorted(compiled + dropped), sorted(expected))
+                self.assertLessEqual(len(compiled), config.DOMAIN_FILTER_CONFIG["max_domains"])
+                if len(expected) <= config.DOMAIN_FILTER_CONFIG["max_domains"]:
+                    self.assertEqual(dropped, [])
+                spec = config.SEARCH_DOMAINS[name]
+                if isinstance(spec, dict):
+                    for tier, conf in spec.items():
+                        kept = DomainRegistry({tier: conf["domains"]}, max_domains=0).get(tier)
+                        self.assertTrue(set(kept) & set(compiled), f"{tier} が丸ごと除外された")
+
+    def test_get_returns_copy(self):
+        registry = DomainRegistry({"plain": ["a.com"]})
+        registry.get("plain").append("b.com")
+        self.assertEqual(registry.get("plain"), ["a.com"])
+
+
+class JobRunnerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.logs_dir = os.path.join(self.tmp.name, "logs")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def script(self, name, body):
+        path = os.path.join(self.tmp.name, name)
+        Path(path).write_text("import sys, time\n" + body + "\n", encoding="utf-8")
+        return path
+
+    def test_jobs_run_concurrently_with_ordered_log(self):
+        scripts = [
+            self.script("search_a.py", "time.sleep(0.5); print('a done')"),
+            self.script("search_b.py", "print('b done'); sys.exit(2)"),
+            self.script("search_c.py", "time.sleep(0.5); print('c done')"),
+            self.script("search_d.py", "time.sleep(30)"),
+        ]
+        runner = JobRunner(self.logs_dir, max_workers=4, timeout=10, timeouts={"search_d.py": 1})
+        start = time.monotonic()
+        results = runner.run(scripts)
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual([r["status"] for r in results], [SUCCESS, FAILED, SUCCESS, TIMEOUT])
+        self.assertEqual(results[1]["returncode"], 2)
+        log = Path(runner.log_path).read_text(encoding="utf-8")
+        positions = [log.index(text) for text in ("a done", "b done", "c done", "TIMEOUT: search_d.py")]
+        self.assertEqual(positions, sorted(positions))
+
+    def test_old_logs_are_rotated(self):
+        os.makedirs(self.logs_dir)
+        for i in range(3):
+            path = os.path.join(self.logs_dir, f"old{i}.log")
+            Path(path).write_text("", encoding="utf-8")
+            os.utime(path, (i, i))
+        runner = JobRunner(self.logs_dir, max_logs=2)
+        runner.run([self.script("search_a.py", "print('a')")])
+        self.assertEqual(sorted(os.listdir(self.logs_dir))[-2:], ["old1.log", "old2.log"])
+        self.assertFalse(os.path.exists(os.path.join(self.logs_dir, "old0.log")))
+
+    def test_per_job_environment(self):
+        script = self.script("search_env.py", "import os; print('degrade=' + os.getenv('GENNOTE_DEGRADE', '0'))")
+        runner = JobRunner(self.logs_dir)
+        results = runner.run([script], envs={"search_env.py": {"GENNOTE_DEGRADE": "1"}})
+        self.assertIn("degrade=1", results[0]["output"])
+
+    def test_searcher_failure_is_reported_as_failed(self):
+        # search_*.py と同じ形: main() が False を返したら終了コード1
+        script = self.script("search_broken.py", "\n".join([
+            f"sys.path.insert(0, {str(SCRIPTS_DIR)!r})",
+            "from worker_daemon import run_or_submit",
+            "def main():",
+            "    return run_or_submit('search_broken.BrokenSearcher', lambda: False)",
+            "if __name__ == '__main__':",
+            "    sys.exit(0 if main() else 1)",
+        ]))
+        results = JobRunner(self.logs_dir).run([script])
+        self.assertEqual(results[0]["status"], FAILED)
+        self.assertEqual(results[0]["returncode"], 1)
+
+    def test_up_to_date_jobs_are_not_spawned(self):
+        scripts = [
+            self.script("search_a.py", "print('a ran')"),
+            self.script("search_b.py", "print('b ran')"),
+        ]
+        runner = JobRunner(self.logs_dir, is_fresh=lambda scripts: {"search_a.py"})
+        results = runner.run(scripts)
+        self.assertEqual([r["status"] for r in results], [JOB_SKIPPED, SUCCESS])
+        self.assertEqual(results[0]["output"], "")
+        self.assertIn("UP TO DATE: search_a.py", Path(runner.log_path).read_text(encoding="utf-8"))
+
+        runner = JobRunner(self.logs_dir, force=True, is_fresh=lambda scripts: {"search_a.py"})
+        results = runner.run(scripts)
+        self.assertEqual([r["status"] for r in results], [SUCCESS, SUCCESS])
+        self.assertIn("a ran", results[0]["output"])
+
+
+class MarketCalendarTest(unittest.TestCase):
+    def test_jpx_holidays(self):
+        jpx = MarketCalendar("jpx", extra_holidays=["2026-06-01"])
+        for day in ("2026-01-02", "2026-05-06", "2026-09-22", "2026-12-31", "2026-06-01"):
+            self.assertFalse(jpx.is_trading_day(date.fromisoformat(day)), day)
+        self.assertTrue(jpx.is_trading_day(date(2026, 10, 19)))
+        self.assertFalse(jpx.is_trading_day(date(2026, 10, 18)))
+        self.assertEqual(jpx.previous_trading_day(date(2026, 5, 7)), date(2026, 5, 1))
+
+    def test_us_holidays(self):
+        us = MarketCalendar("us")
+        for day in ("2026-04-03", "2026-07-03", "2026-11-26", "2027-12-24"):
+            self.assertFalse(us.is_trading_day(date.fromisoformat(day)), day)
+        self.assertTrue(us.is_trading_day(date(2026, 9, 22)))
+
+    def test_us_session_date_is_previous_new_york_session(self):
+        us = MarketCalendar("us")
+        # 日本の朝は前日の米国市場（大引け後の東部時間の当日）
+        self.assertEqual(us.session_date(datetime(2026, 10, 17, 7, 0, tzinfo=JST)), date(2026, 10, 16))
+        self.assertEqual(us.session_date(datetime(2026, 10, 19, 7, 0, tzinfo=JST)), date(2026, 10, 18))
+        # 大引け前（冬時間 16:00 EST = 6:00 JST）は前日の取引日
+        self.assertEqual(us.session_date(datetime(2026, 1, 17, 5, 59, tzinfo=JST)), date(2026, 1, 15))
+        self.assertEqual(us.session_date(datetime(2026, 1, 17, 6, 0, tzinfo=JST)), date(2026, 1, 16))
+        self.assertEqual(MarketCalendar("jpx").session_date(datetime(2026, 10, 17, 7, 0, tzinfo=JST)), date(2026, 10, 17))
+
+
+class FakeRunner:
+    def run(self, scripts, envs=None):
+        self.scripts, self.envs = scripts, envs
+        return [{"name": os.path.basename(script), "status": SUCCESS} for script in scripts]
+
+
+class BlockingRunner:
+    def __init__(self):
+        self.started, self.release = threading.Event(), threading.Event()
+        self.batches = []
+
+    def run(self, scripts, envs=None):
+        self.batches.append([os.path.basename(script) for script in scripts])
+        self.started.set()
+        self.release.wait(5)
+        return []
+
+
+class SchedulerTest(unittest.TestCase):
+    JOBS = {
+        "search_crypto.py": {"cron": "0 7 * * *"},
+        "search_energy.py": {"cron": "0 7 * * *", "market": "us", "on_closed": "degrade", "deadline": "10:00"},
+        "search_jp.py": {"cron": "0 7 * * *", "market": "jpx", "on_closed": "skip", "deadline": "08:30"},
+        "search_weekly.py": {"cron": "0 7 * * 1", "deadline": "09:00"},
+    }
+
+    def setUp(self):
+        self.calendars = {"jpx": MarketCalendar("jpx"), "us": MarketCalendar("us")}
+
+    def test_cron_rule(self):
+        rule = CronRule("*/15 6-8 * * 1-5")
+        self.assertTrue(rule.matches(datetime(2026, 10, 19, 7, 30)))
+        self.assertFalse(rule.matches(datetime(2026, 10, 19, 7, 31)))
+        self.assertFalse(rule.matches_day(date(2026, 10, 18)))
+        self.assertTrue(CronRule("0 0 * * 7").matches_day(date(2026, 10, 18)))
+        # 日と曜日の両方を指定した場合は標準のcronと同じくどちらかに一致すればよい
+        self.assertTrue(CronRule("0 0 1 * 1").matches_day(date(2026, 10, 19)))
+        self.assertTrue(CronRule("0 0 1 * 1").matches_day(date(2026, 10, 1)))
+        self.assertFalse(CronRule("0 0 1 * 1").matches_day(date(2026, 10, 20)))
+        self.assertFalse(CronRule("0 0 */2 * 1").matches_day(date(2026, 10, 26)))
+        with self.assertRaises(ValueError):
+            CronRule("0 25 * * *")
+
+    def test_default_schedule_runs_only_search_scripts(self):
+        """既定のスケジュールは従来のバッチと同じくsearch_*.pyだけを実行する"""
+        import fnmatch
+        import config
+
+        pattern = config.RUNNER_CONFIG["pattern"]
+        self.assertEqual([name for name in config.SCHEDULE_CONFIG["jobs"] if not fnmatch.fnmatch(name, pattern)], [])
+
+    def test_trading_day_orders_by_deadline(self):
+        entries = plan(self.JOBS, datetime(2026, 10, 19, 7, 0, tzinfo=JST), self.calendars)
+        self.assertEqual([entry["name"] for entry in entries],
+                         ["search_jp.py", "search_weekly.py", "search_energy.py", "search_crypto.py"])
+        # 月曜の朝の米国市場は日曜（休場）
+        self.assertEqual({entry["name"]: entry["action"] for entry in entries},
+                         {"search_jp.py": RUN, "search_weekly.py": RUN, "search_energy.py": DEGRADE, "search_crypto.py": RUN})
+
+    def test_us_jobs_follow_previous_us_session(self):
+        def actions(now):
+            return {entry["name"]: entry["action"] for entry in plan(self.JOBS, now, self.calendars)}
+
+        # 土曜の朝は金曜の米国市場があり、日本市場は休場
+        self.assertEqual(actions(datetime(2026, 10, 17, 7, 0, tzinfo=JST))["search_energy.py"], RUN)
+        self.assertEqual(actions(datetime(2026, 10, 17, 7, 0, tzinfo=JST))["search_jp.py"], SKIP)
+        # 米国の祝日（感謝祭 11/26）の翌朝は劣化実行、その翌朝（金曜の市場）は通常
+        self.assertEqual(actions(datetime(2026, 11, 27, 7, 0, tzinfo=JST))["search_energy.py"], DEGRADE)
+        self.assertEqual(actions(datetime(2026, 11, 28, 7, 0, tzinfo=JST))["search_energy.py"], RUN)
+
+    def test_holiday_skips_or_degrades_market_jobs(self):
+        runner = FakeRunner()
+        scheduler = Scheduler(self.JOBS, self.calendars, runner, "scripts")
+        entries, results = scheduler.run_due(datetime(2026, 10, 18, 6, 0, tzinfo=JST), by_day=True)
+        actions = {entry["name"]: entry["action"] for entry in entries}
+        self.assertEqual(actions, {"search_jp.py": SKIP, "search_energy.py": DEGRADE, "search_crypto.py": RUN})
+        self.assertEqual([os.path.basename(script) for script in runner.scripts], ["search_energy.py", "search_crypto.py"])
+        self.assertEqual(runner.envs, {"search_energy.py": {"GENNOTE_DEGRADE": "1"}})
+        self.assertEqual(len(results), 2)
+
+    def test_serve_does_not_block_on_running_batch(self):
+        runner = BlockingRunner()
+        jobs = {"search_long.py": {"cron": "* 7 * * *"}, "search_next.py": {"cron": "1 7 * * *"}}
+        scheduler = Scheduler(jobs, self.calendars, runner, "scripts")
+        first = scheduler.start_due(datetime(2026, 10, 19, 7, 0, tzinfo=JST))
+        self.assertTrue(runner.started.wait(2))
+        # 実行中の search_long.py は重ねて起動せず、次の分のジョブは待たずに起動する
+        second = scheduler.start_due(datetime(2026, 10, 19, 7, 1, tzinfo=JST))
+        runner.release.set()
+        for thread in (first, second):
+            thread.join(2)
+        self.assertEqual(runner.batches, [["search_long.py"], ["search_next.py"]])
+
+    def test_catch_up_evaluates_missed_minutes(self):
+        runner = FakeRunner()
+        jobs = {"search_a.py": {"cron": "2 7 * * *"}}
+        scheduler = Scheduler(jobs, self.calendars, runner, "scripts")
+        with mock.patch.object(scheduler, "start_due", wraps=scheduler.start_due) as start_due:
+            last = scheduler.catch_up(datetime(2026, 10, 19, 7, 0, tzinfo=JST), datetime(2026, 10, 19, 7, 3, 30, tzinfo=JST))
+        self.assertEqual([call.args[0].minute for call in start_due.call_args_list], [1, 2, 3])
+        self.assertEqual(last, datetime(2026, 10, 19, 7, 3, tzinfo=JST))
+
+
+class FakeSearcher:
+    calls = []
+    force = False
+
+    def search(self):
+        FakeSearcher.calls.append("search" + ("(force)" if self.force else ""))
+        return "report.md"
+
+    def post(self):
+        FakeSearcher.calls.append("post")
+        return True
+
+
+class BrokenSearcher(FakeSearcher):
+    def search(self):
+        raise RuntimeError("api down")
+
+
+class PipelineTest(unittest.TestCase):
+    def test_independent_branches_run_in_parallel(self):
+        barrier = threading.Barrier(2, timeout=5)
+        pipeline = Pipeline(max_workers=2)
+        pipeline.add("a", lambda: barrier.wait() is not None)
+        pipeline.add("b", lambda: barrier.wait() is not None)
+        self.assertEqual(pipeline.run(), {"a": SUCCESS, "b": SUCCESS})
+
+    def test_failure_skips_dependents_only(self):
+        order = []
+        pipeline = Pipeline(max_workers=2)
+        pipeline.add("bad.search", lambda: False)
+        pipeline.add("bad.post", lambda: order.append("bad.post") or True, requires=["bad.search"])
+        pipeline.add("good.search", lambda: "good.md")
+        pipeline.add("good.post", lambda: order.append("good.post") or True, requires=["good.search"])
+        pipeline.add("summary", lambda: order.append("summary") or True, after=["bad.search", "good.search"])
+        status = pipeline.run()
+        self.assertEqual(status["bad.search"], FAILED)
+        self.assertEqual(status["bad.post"], SKIPPED)
+        self.assertEqual(status["good.post"], SUCCESS)
+        self.assertEqual(status["summary"], SUCCESS)
+        self.assertNotIn("bad.post", order)
+        self.assertEqual(pipeline.results["good.search"], "good.md")
+
+    def test_cycles_and_unknown_dependencies_are_rejected(self):
+        pipeline = Pipeline()
+        pipeline.add("a", lambda: True, requires=["b"])
+        pipeline.add("b", lambda: True, requires=["a"])
+        with self.assertRaises(ValueError):
+            pipeline.run()
+        pipeline = Pipeline()
+        pipeline.add("a", lambda: True, after=["missing"])
+        with self.assertRaises(ValueError):
+            pipeline.run()
+
+    def test_daily_pipeline_wires_search_and_post(self):
+        FakeSearcher.calls = []
+        pipeline = build_daily_pipeline({
+            "ok": f"{__name__}.FakeSearcher",
+            "broken": f"{__name__}.BrokenSearcher",
+        }, summary=False, publish=False)
+        status = pipeline.run()
+        self.assertEqual(status["ok.post"], SUCCESS)
+        self.assertEqual(status["broken.search"], FAILED)
+        self.assertEqual(status["broken.post"], SKIPPED)
+        self.assertEqual(FakeSearcher.calls, ["search", "post"])
+
+    def test_daily_pipeline_accepts_factories(self):
+        FakeSearcher.calls = []
+        status = build_daily_pipeline({"ok": FakeSearcher}, summary=False, publish=False).run()
+        self.assertEqual(status, {"ok.search": SUCCESS, "ok.post": SUCCESS})
+
+    def test_daily_pipeline_force_is_per_searcher(self):
+        FakeSearcher.calls = []
+        environ = dict(os.environ)
+        build_daily_pipeline({"ok": FakeSearcher}, summary=False, publish=False, force=True).run()
+        self.assertEqual(FakeSearcher.calls, ["search(force)", "post"])
+        self.assertEqual(dict(os.environ), environ)
+
+
+class ReportSpecTest(unittest.TestCase):
+    def test_registry_covers_existing_reports(self):
+        names = [spec.name for spec in all_specs()]
+        self.assertEqual(names, ["jp", "china", "crypto", "energy", "globalmacro", "real_estate"])
+        self.assertEqual(len({spec.output_suffix for spec in all_specs()}), len(names))
+        self.assertEqual(get_spec("energy").output_path("2025-01-01"),
+                         "M:/ML/ChatGPT/gennote/test/output/2025-01-01_energy_markets.md")
+        self.assertEqual(get_spec("real_estate").recency_days, 31)
+
+    def test_prompt_embeds_base_prompt(self):
+        prompt = get_spec("jp").render_prompt("BASE")
+        self.assertIn("BASE", prompt)
+        self.assertNotIn("{base_prompt}", prompt)
+        self.assertIn("日本株式市場", prompt)
+
+    def test_duplicates_are_rejected(self):
+        with self.assertRaises(ValueError):
+            register(ReportSpec("jp", "t", "jp_new", "jp_stock", "{base_prompt}"))
+        with self.assertRaises(ValueError):
+            register(ReportSpec("jp_new", "t", "jp", "jp_stock", "{base_prompt}"))
+        with self.assertRaises(KeyError):
+            get_spec("missing")
+
+
+class PublishQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.queue = PublishQueue(os.path.join(self.tmp.name, "queue.db"), max_attempts=2, retry_delay=0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_pending_entry_is_replaced_for_same_source(self):
+        first = self.queue.enqueue("JPPostProcessor:2025-01-01", "<entry>1</entry>")
+        second = self.queue.enqueue("JPPostProcessor:2025-01-01", "<entry>2</entry>")
+        self.assertEqual(first, second)
+        self.assertEqual(self.queue.claim()["entry_xml"], "<entry>2</entry>")
+        self.assertIsNone(self.queue.claim())
+
+    def test_worker_retries_holds_and_completes(self):
+        self.queue.enqueue("ok", "<ok/>")
+        self.queue.enqueue("flaky", "<flaky/>")
+        self.queue.enqueue("unknown", "<unknown/>")
+        results = {"ok": [(DONE, "https://example/1", None)],
+                   "flaky": [(PENDING, None, "HTTP 503"), (PENDING, None, "HTTP 503")],
+                   "unknown": [(HOLD, None, "read timeout")]}
+        worker = PublishWorker(self.queue, lambda entry: results[entry["source"]].pop(0), max_workers=2)
+        worker.drain()
+        self.assertEqual(self.queue.counts(), {DONE: 1, DEAD: 1, HOLD: 1})
+        self.assertEqual(self.queue.requeue(), 2)
+        self.assertEqual(self.queue.counts(), {DONE: 1, PENDING: 2})
+
+    def test_expired_lease_is_held_not_reclaimed(self):
+        self.queue.enqueue("jp", "<entry/>")
+        entry = self.queue.claim(lease=-1)
+        self.assertIsNone(self.queue.claim())
+        self.assertEqual(self.queue.counts(), {HOLD: 1})
+        # 期限切れ後の結果は書き込まない
+        self.assertFalse(self.queue.complete(entry, "https://example/1"))
+        self.assertFalse(self.queue.hold(entry, "late"))
+        self.queue.retry_later(entry, "late")
+        self.assertEqual(self.queue.counts(), {HOLD: 1})
+
+    def test_updates_require_the_current_lease(self):
+        self.queue.enqueue("jp", "<entry/>")
+        entry = self.queue.claim()
+        self.assertFalse(self.queue.complete(dict(entry, lease_until=entry["lease_until"] - 1)))
+        self.assertTrue(self.queue.complete(entry, "https://example/1"))
+        self.assertFalse(self.queue.hold(entry))
+        self.assertEqual(self.queue.counts(), {DONE: 1})
+
+    def test_source_is_not_queued_again_while_posting(self):
+        first = self.queue.enqueue("jp", "<entry>1</entry>")
+        entry = self.queue.claim()
+        self.assertEqual(self.queue.enqueue("jp", "<entry>2</entry>"), first)
+        self.assertIsNone(self.queue.claim())
+        self.queue.complete(entry)
+        self.assertNotEqual(self.queue.enqueue("jp", "<entry>3</entry>"), first)
+
+    def test_worker_marks_permanent_failure_dead(self):
+        self.queue.enqueue("bad", "<bad/>")
+        worker = PublishWorker(self.queue, lambda entry: (DEAD, None, "HTTP 401"))
+        self.assertEqual(worker.drain()[DEAD], 1)
+        self.assertEqual(self.queue.counts(), {DEAD: 1})
+
+    def test_latest_status(self):
+        self.assertIsNone(self.queue.latest_status("jp"))
+        self.queue.enqueue("jp", "<entry/>")
+        self.assertEqual(self.queue.latest_status("jp"), PENDING)
+
+    def test_configured_lease_outlasts_a_retried_post(self):
+        from config import HTTP_CONFIG, PUBLISH_CONFIG, RATE_LIMIT_CONFIG
+
+        retry = RATE_LIMIT_CONFIG["retry_config"]
+        slowest_post = HTTP_CONFIG["timeout"] * (retry["max_retries"] + 1) + retry["max_delay"] * retry["max_retries"]
+        self.assertGreater(PUBLISH_CONFIG["lease"], slowest_post)
+
+
+@needs_http
+class PostOutcomeTest(unittest.TestCase):
+    def test_only_rate_limit_and_server_errors_are_retried(self):
+        from post_base import PostBase
+
+        outcomes = {code: PostBase._failure_outcome(code) for code in (400, 401, 404, 429, 500, 503, 200)}
+        self.assertEqual(outcomes, {400: DEAD, 401: DEAD, 404: DEAD, 429: PENDING, 500: PENDING, 503: PENDING, 200: HOLD})
+
+
+class FreshnessTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "2025-01-01_jp.md")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_output_rules(self):
+        self.assertFalse(check_output(self.path, None)[0])
+        Path(self.path).write_text("# 途中まで", encoding="utf-8")
+        # 完了記録が無い出力はストリーミング途中で止まった可能性がある
+        self.assertFalse(check_output(self.path, None)[0])
+        recorded = output_record(self.path)
+        self.assertTrue(check_output(self.path, recorded, max_age=60)[0])
+        self.assertFalse(check_output(self.path, recorded, max_age=60, now=time.time() + 120)[0])
+        Path(self.path).write_text("# 書き換え", encoding="utf-8")
+        self.assertFalse(check_output(self.path, recorded)[0])
+
+    def test_post_rules(self):
+        Path(self.path).write_text("# report", encoding="utf-8")
+        self.assertFalse(check_post(self.path, None)[0])
+        posted = output_record(self.path)
+        self.assertTrue(check_post(self.path, posted, PENDING)[0])
+        self.assertTrue(check_post(self.path, posted, HOLD)[0])
+        self.assertFalse(check_post(self.path, posted, DEAD)[0])
+        Path(self.path).write_text("# regenerated", encoding="utf-8")
+        self.assertFalse(check_post(self.path, posted, DONE)[0])
+
+
+class CountingJob:
+    runs = []
+
+    def execute_search(self, value="ok"):
+        CountingJob.runs.append(value)
+        return value if value != "fail" else False
+
+
+class JobQueueContract:
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.queue = self.make_queue(max_attempts=2, retry_delay=0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_claim_complete_and_dedup(self):
+        job_id = self.queue.enqueue("search_jp.JPSearcher", key="2025-01-01:jp")
+        self.assertEqual(self.queue.enqueue("search_jp.JPSearcher", key="2025-01-01:jp"), job_id)
+        job = self.queue.claim("w1")
+        self.assertEqual((job["id"], job["job"], job["attempts"]), (job_id, "search_jp.JPSearcher", 1))
+        self.assertIsNone(self.queue.claim("w2"))
+        self.assertTrue(self.queue.complete(job, "out.md"))
+        self.assertEqual(self.queue.counts(), {job_queue.DONE: 1})
+
+    def test_visibility_timeout_and_heartbeat(self):
+        self.queue.enqueue("a.A", key="a")
+        job = self.queue.claim("w1", visibility_timeout=0.2)
+        self.assertTrue(self.queue.heartbeat(job, visibility_timeout=0.2))
+        time.sleep(0.3)
+        stolen = self.queue.claim("w2", visibility_timeout=30)
+        self.assertEqual((stolen["id"], stolen["attempts"]), (job["id"], 2))
+        # リースを失ったワーカーは延長・完了できない
+        self.assertFalse(self.queue.heartbeat(job))
+        self.assertFalse(self.queue.complete(job))
+        self.assertTrue(self.queue.complete(stolen))
+
+    def test_failures_retry_then_dead(self):
+        self.queue.enqueue("a.A", key="a")
+        self.assertEqual(self.queue.fail(self.queue.claim("w1"), "boom"), job_queue.PENDING)
+        self.assertEqual(self.queue.fail(self.queue.claim("w1"), "boom"), job_queue.DEAD)
+        self.assertIsNone(self.queue.claim("w1"))
+        self.assertEqual(self.queue.requeue(), 1)
+        self.assertEqual(self.queue.claim("w1")["attempts"], 1)
+
+    def test_workers_do_not_share_jobs(self):
+        for i in range(20):
+            self.queue.enqueue(f"{__name__}.CountingJob", args=[f"job{i}"], key=str(i))
+        CountingJob.runs = []
+        workers = [JobWorker(self.queue, worker_id=f"node{n}", max_workers=2) for n in range(2)]
+        threads = [threading.Thread(target=worker.drain) for worker in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(CountingJob.runs), sorted(f"job{i}" for i in range(20)))
+        self.assertEqual(self.queue.counts(), {job_queue.DONE: 20})
+
+
+class JobQueueInterfaceTest(unittest.TestCase):
+    def test_incomplete_backend_cannot_be_instantiated(self):
+        class Partial(job_queue.JobQueue):
+            def enqueue(self, job, method="execute_search", args=(), key=None):
+                return "id"
+
+        with self.assertRaises(TypeError):
+            Partial()
+
+
+class SQLiteJobQueueTest(JobQueueContract, unittest.TestCase):
+    def make_queue(self, **kwargs):
+        return SQLiteJobQueue(os.path.join(self.tmp.name, "jobs.db"), **kwargs)
+
+
+class FileJobQueueTest(JobQueueContract, unittest.TestCase):
+    def make_queue(self, **kwargs):
+        return FileJobQueue(os.path.join(self.tmp.name, "jobs"), **kwargs)
+
+
+class CompositePromptTest(unittest.TestCase):
+    KEYS = {"basic_info": "基本情報", "business_info": "事業情報", "financial_info": "財務情報",
+            "management_strategy": "経営戦略", "analyst_evaluation": "証券アナリスト評価"}
+
+    def load(self, name):
+        return (SCRIPTS_DIR / "prompt" / name).read_text(encoding="utf-8")
+
+    def test_category_prompts_combine_into_one_schema(self):
+        prompts = {key: self.load(f"category_prompts/{category}.md") for category, key in self.KEYS.items()}
+        for text in prompts.values():
+            self.assertTrue(extract_schema(text).lstrip().startswith('"'))
+        prompt = build_composite_prompt(self.load("composite_dossier.md"), prompts)
+        schema = prompt[prompt.index("```json"):prompt.index("## 情報ソース")]
+        for key in self.KEYS.values():
+            self.assertIn(f'"{key}": {{', schema)
+            self.assertIn(f"### {key}", prompt)
+        self.assertNotIn("{schema}", prompt)
+
+    def test_split_and_completeness(self):
+        data = {"基本情報": {"業種": "輸送用機器", "代表者": None}, "経営戦略": {}, "雑多": 1}
+        keys = {category: self.KEYS[category] for category in ("basic_info", "management_strategy")}
+        self.assertEqual(split_composite(data, keys), {"basic_info": data["基本情報"]})
+        self.assertEqual(split_composite([data], keys), {})
+        self.assertEqual(completeness(data["基本情報"]), 0.5)
+        self.assertEqual(completeness({"配当": [], "売上": [{"値": 1}, {"値": ""}]}), 1 / 3)
+        self.assertEqual(completeness(None), 0.0)
+
+
+class JsonExtractTest(unittest.TestCase):
+    def test_skips_think_prose_and_citations(self):
+        response = (
+            '<think>まず {"法人名": "下書き"} とする</think>\n結果{注記}です。\n'
+            '```json\n{"法人名": "トヨタ自動車", "証券コード": "7203", "備考": "括弧 } を含む"}\n```\n[1][2]'
+        )
+        self.assertEqual(extract_json(response, keys=("法人名", "証券コード"))["証券コード"], "7203")
+
+    def test_picks_candidate_matching_keys(self):
+        response = '概要 {"出典": "IR資料"} 本体 {"銘柄": [{"法人名": "A", "証券コード": "1301"}]}'
+        self.assertEqual(extract_json(response, keys=("銘柄",))["銘柄"][0]["証券コード"], "1301")
+        self.assertEqual([value for value, _, _ in iter_json(response)][0], {"出典": "IR資料"})
+
+    def test_repairs_comments_and_trailing_commas(self):
+        response = '{"a": [1, 2,], // 補足\n "url": "https://example.com/x",}'
+        self.assertEqual(extract_json(response), {"a": [1, 2], "url": "https://example.com/x"})
+
+    def test_truncated_response_is_rejected_in_linear_time(self):
+        self.assertIsNone(extract_json('{"企業データ": [{"a": 1}, {"b": '))
+        start = time.perf_counter()
+        self.assertIsNone(extract_json('{"項目": "値", ' * 50000))
+        self.assertLess(time.perf_counter() - start, 2.0)
+
+    def test_deep_nesting_does_not_raise(self):
+        deep = '{"a": ' * 3000 + "1" + "}" * 3000
+        self.assertIsNone(extract_json(deep))
+        self.assertEqual(extract_json(deep + ' {"ok": 1}'), {"ok": 1})
+
+    def test_malformed_nesting_is_not_retried_per_level(self):
+        # 最内側の不正な値で全ての範囲が読めない（内側の範囲を深さ毎に読み直さない）
+        malformed = '{"key": "' + "v" * 100 + '", "n": '
+        start = time.perf_counter()
+        self.assertIsNone(extract_json(malformed * 800 + "x" + "}" * 800))
+        self.assertLess(time.perf_counter() - start, 0.5)
+        # 読めない最上位の範囲の1段内側は試す
+        self.assertEqual([value for value, _, _ in iter_json('{"注記": 本体 {"a": 1}, {"b": 2}}')], [{"a": 1}, {"b": 2}])
+
+    def test_saved_dossiers_round_trip(self):
+        output_dir = SCRIPTS_DIR.parent.parent / "test" / "output"
+        for path in output_dir.glob("*.json"):
+            data = json.loads(path.read_text(encoding="utf-8"))
+            wrapped = f"<think>確認</think>\n```json\n{json.dumps(data, ensure_ascii=False)}\n```\n[1]"
+            self.assertEqual(extract_json(wrapped), data, path.name)
+
+
+class DossierSweepTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_load_universe_filters_markets(self):
+        path = os.path.join(self.tmp.name, "universe.csv")
+        Path(path).write_text(
+            "日付,コード,銘柄名,市場・商品区分\n"
+            "20250101,7203,トヨタ自動車,プライム（内国株式）\n"
+            "20250101,1305,ｉＦｒｅｅＥＴＦ,ETF・ETN\n"
+            "20250101,130A,Ｖｅｒｉｔａｓ　Ｉｎ　Ｓｉｌｉｃｏ,グロース（内国株式）\n",
+            encoding="cp932",
+        )
+        universe = load_universe(path, ["プライム（内国株式）", "グロース（内国株式）"])
+        self.assertEqual([stock["証券コード"] for stock in universe], ["130A", "7203"])
+        self.assertEqual(universe[1]["法人名"], "トヨタ自動車")
+
+    def test_plan_prefers_missing_then_oldest(self):
+        for name in ("20250101_トヨタ_7203.json", "20250301_トヨタ_7203.json",
+                     "20250110_ソニー_6758.json", "20250320_任天堂_7974.json", "notes.json"):
+            Path(self.tmp.name, name).write_text("{}", encoding="utf-8")
+        latest = latest_dossiers(self.tmp.name)
+        self.assertEqual(latest, {"7203": date(2025, 3, 1), "6758": date(2025, 1, 10), "7974": date(2025, 3, 20)})
+        universe = [{"法人名": code, "証券コード": code} for code in ("6758", "7203", "7974", "9984")]
+        due = plan_sweep(universe, latest, date(2025, 3, 31), refresh_days=30)
+        self.assertEqual([stock["証券コード"] for stock in due], ["9984", "6758", "7203"])
+        self.assertEqual(len(plan_sweep(universe, latest, date(2025, 3, 31), 30, limit=2)), 2)
+        self.assertEqual([len(part) for part in shard(due, 2)], [2, 1])
+
+    def test_enqueue_is_idempotent_per_run(self):
+        queue = SQLiteJobQueue(os.path.join(self.tmp.name, "jobs.db"))
+        shards = shard([{"法人名": code, "証券コード": code} for code in ("6758", "7203", "9984")], 2)
+        first = enqueue_sweep(queue, shards, "2025-03-31")
+        self.assertEqual(enqueue_sweep(queue, shards, "2025-03-31"), first)
+        self.assertEqual(queue.counts(), {job_queue.PENDING: 2})
+        job = queue.claim("w1")
+        self.assertEqual((job["method"], job["args"][0]), ("execute_sweep_shard", "2025-03-31:0000"))
+
+
+class RunJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "journal", "run.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_rerun_resumes_from_first_unfinished_stage(self):
+        calls = []
+
+        def stage(name, value):
+            calls.append(name)
+            return value
+
+        journal = RunJournal(self.path)
+        journal.step("find_stock", stage, "find_stock", {"証券コード": "7203"})
+        journal.step("category:basic_info", stage, "basic_info", {"a": 1})
+        journal.step("category:financial_info", stage, "financial_info", None)
+
+        resumed = RunJournal(self.path)
+        self.assertEqual(resumed.step("find_stock", stage, "find_stock", {"証券コード": "9999"}), {"証券コード": "7203"})
+        resumed.step("category:basic_info", stage, "basic_info", {"a": 2})
+        resumed.step("category:financial_info", stage, "financial_info", {"b": 1})
+        self.assertEqual(calls, ["find_stock", "basic_info", "financial_info", "financial_info"])
+        self.assertEqual(RunJournal(self.path).completed(),
+                         ["find_stock", "category:basic_info", "category:financial_info"])
+
+    def test_clear_starts_over(self):
+        journal = RunJournal(self.path)
+        journal.record("post", {"url": "https://example/1"})
+        journal.clear()
+        self.assertFalse(RunJournal(self.path).has("post"))
+
+
+WORKER_KEY = b"test-worker-key-0123"
+
+
+class EchoJob:
+    def execute_search(self, value="done"):
+        return value
+
+    def fail(self):
+        raise RuntimeError("boom")
+
+    def _private(self):
+        return "secret"
+
+
+class EnvJob:
+    def apply_env(self, env):
+        self.env = env
+
+    def execute_search(self):
+        return self.env
+
+
+class SlowJob:
+    cancelled = threading.Event()
+
+    def execute_search(self):
+        # SearchBaseと同様にAPI呼び出しの前で中止を確認する
+        for _ in range(500):
+            if self.cancel_event.is_set():
+                SlowJob.cancelled.set()
+                return False
+            time.sleep(0.01)
+        return True
+
+
+class WorkerDaemonTest(unittest.TestCase):
+    def setUp(self):
+        self.daemon = WorkerDaemon(("127.0.0.1", 0), WORKER_KEY, max_workers=2)
+        self.thread = threading.Thread(target=self.daemon.serve_forever)
+        self.thread.start()
+        deadline = time.monotonic() + 5
+        while self.daemon.address[1] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def tearDown(self):
+        send_request({"command": "shutdown"}, self.daemon.address, WORKER_KEY)
+        self.thread.join(5)
+
+    def request(self, **request):
+        return send_request(request, self.daemon.address, WORKER_KEY)
+
+    def test_runs_jobs_and_reports_errors(self):
+        job = f"{__name__}.EchoJob"
+        self.assertEqual(self.request(job=job)["result"], "done")
+        self.assertEqual(self.request(job=job, args=["jp"])["result"], "jp")
+        failed = self.request(job=job, method="fail")
+        self.assertFalse(failed["ok"])
+        self.assertIn("boom", failed["error"])
+        self.assertEqual(self.request(command="ping")["result"], {"jobs_done": 3, "running": {}})
+
+    def test_unreachable_worker(self):
+        with self.assertRaises(WorkerUnavailable):
+            send_request({"command": "ping"}, ("127.0.0.1", 1), WORKER_KEY)
+
+    def test_rejects_private_methods_and_unlisted_modules(self):
+        self.assertIn("非公開", self.request(job=f"{__name__}.EchoJob", method="_private")["error"])
+        self.daemon.job_modules = {"search_jp"}
+        self.assertIn("許可されていない", self.request(job="os.path.join", method="upper")["error"])
+
+    def test_client_timeout_cancels_running_job(self):
+        SlowJob.cancelled.clear()
+        self.daemon.poll_interval = 0.05
+        with self.assertRaises(TimeoutError):
+            send_request({"job": f"{__name__}.SlowJob"}, self.daemon.address, WORKER_KEY, timeout=0.2)
+        self.assertTrue(SlowJob.cancelled.wait(2))
+        deadline = time.monotonic() + 2
+        while self.daemon.running_jobs() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.daemon.running_jobs(), {})
+
+    def test_client_disconnect_cancels_running_job(self):
+        from multiprocessing.connection import Client
+
+        SlowJob.cancelled.clear()
+        self.daemon.poll_interval = 0.05
+        conn = Client(self.daemon.address, authkey=WORKER_KEY)
+        conn.send({"job": f"{__name__}.SlowJob"})
+        time.sleep(0.1)
+        conn.close()
+        self.assertTrue(SlowJob.cancelled.wait(2))
+
+    def test_requires_authkey(self):
+        for authkey in (None, b"", b"short"):
+            with self.subTest(authkey=authkey), self.assertRaises(ValueError):
+                WorkerDaemon(("127.0.0.1", 0), authkey)
+
+    def test_authkey_from_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "worker.key")
+            self.assertIsNone(load_authkey(None, path))
+            Path(path).write_text(" from-file-key-0123\n", encoding="utf-8")
+            self.assertEqual(load_authkey(None, path), b"from-file-key-0123")
+            self.assertEqual(load_authkey("from-env-key-0123", path), b"from-env-key-0123")
+
+    def test_client_env_is_applied_to_the_job(self):
+        settings = (self.daemon.address, WORKER_KEY)
+        env = {"GENNOTE_DEGRADE": "1", "GENNOTE_FORCE": "", "GENNOTE_RUN_ID": "2026-10-19"}
+        with mock.patch.object(worker_daemon, "_worker_settings", return_value=settings), \
+                mock.patch.dict(os.environ, env):
+            self.assertEqual(run_or_submit(f"{__name__}.EnvJob", lambda: "local"), env)
+        self.assertNotEqual(os.environ.get("GENNOTE_RUN_ID"), "2026-10-19")
+
+
+@needs_http
+class SharedSessionTest(unittest.TestCase):
+    def setUp(self):
+        import search_base
+
+        self.search_base = search_base
+        self.saved = search_base.SearchBase._session
+        search_base.SearchBase._session = None
+
+    def tearDown(self):
+        self.search_base.SearchBase._session = self.saved
+
+    def test_searchers_share_one_session(self):
+        SearchBase = self.search_base.SearchBase
+
+        class EnergySearcher(SearchBase):
+            pass
+
+        class EstateSearcher(SearchBase):
+            pass
+
+        session = EnergySearcher().get_session()
+        self.assertIs(EstateSearcher().get_session(), session)
+        self.assertIs(SearchBase.get_session(), session)
+
+    def test_pool_size_comes_from_config(self):
+        with mock.patch.dict(self.search_base.HTTP_CONFIG, pool_connections=3, pool_maxsize=7):
+            session = self.search_base.SearchBase.get_session()
+        for prefix in ("https://api.perplexity.ai", "http://example.com"):
+            adapter = session.get_adapter(prefix)
+            self.assertEqual(adapter._pool_connections, 3)
+            self.assertEqual(adapter._pool_maxsize, 7)
+            self.assertTrue(adapter._pool_block)
+
+
+@needs_http
+class SearchBaseEnvTest(unittest.TestCase):
+    def test_apply_env_sets_model_force_and_run_id(self):
+        from config import BASE_CONFIG, BUDGET_CONFIG
+        from search_base import SearchBase
+
+        with mock.patch.dict(os.environ, {"GENNOTE_DEGRADE": "1", "GENNOTE_FORCE": "1", "GENNOTE_RUN_ID": "run-a"}):
+            searcher = SearchBase()
+        self.assertEqual((searcher.model, searcher.force, searcher.run_id),
+                         (BUDGET_CONFIG["degrade_model"], True, "run-a"))
+        searcher.apply_env({"GENNOTE_DEGRADE": "", "GENNOTE_FORCE": "", "GENNOTE_RUN_ID": "run-b"})
+        self.assertEqual((searcher.model, searcher.force, searcher.run_id), (BASE_CONFIG["model"], False, "run-b"))
+
+    def test_force_skips_cached_response(self):
+        from search_base import SearchBase
+
+        cache = mock.Mock()
+        cache.get.return_value = "cached"
+        searcher = SearchBase()
+        with mock.patch.object(SearchBase, "get_response_cache", return_value=cache), \
+                mock.patch.object(SearchBase, "_record_api_call"):
+            self.assertEqual(searcher._get_cached_response("key"), "cached")
+            cache.get.reset_mock()
+            searcher.force = True
+            self.assertIsNone(searcher._get_cached_response("key"))
+        cache.get.assert_not_called()
+
+
+class FakeCompletion:
+    status_code = 200
+    content = b"{}"
+
+    def __init__(self, content):
+        self.answer = content
+
+    def json(self):
+        return {"choices": [{"message": {"content": self.answer}}]}
+
+
+@needs_http
+class ConcurrencyLimitTest(unittest.TestCase):
+    def setUp(self):
+        import search_base
+
+        self.search_base = search_base
+        self.saved = search_base.SearchBase._concurrency_limiter
+        search_base.SearchBase._concurrency_limiter = None
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.in_flight = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        self.search_base.SearchBase._concurrency_limiter = self.saved
+
+    def make_searcher(self):
+        searcher = self.search_base.SearchBase()
+        searcher.cache_ttl = 0
+        flight = SingleFlight(self.tmp.name, wait_timeout=5, poll_interval=0.01)
+        searcher.get_single_flight = lambda: flight
+        searcher._get_cached_response = lambda cache_key: None
+        searcher._check_budget = lambda: True
+        searcher._record_api_call = lambda *args, **kwargs: None
+        searcher._consume_budget = lambda usage: None
+
+        def send(payload, stream=False):
+            with self.lock:
+                self.in_flight += 1
+                self.peak = max(self.peak, self.in_flight)
+            time.sleep(0.05)
+            with self.lock:
+                self.in_flight -= 1
+            return FakeCompletion(payload["messages"][-1]["content"])
+
+        searcher._send_perplexity = send
+        return searcher
+
+    def test_sync_call_runs_on_caller_thread(self):
+        searcher = self.make_searcher()
+        with mock.patch("asyncio.run") as run:
+            self.assertEqual(searcher.call_perplexity_api("prompt-0"), "prompt-0")
+        run.assert_not_called()
+
+    def test_fan_out_stays_within_limit_and_keeps_order(self):
+        prompts = [f"prompt-{index}" for index in range(8)]
+        with mock.patch.dict(self.search_base.HTTP_CONFIG, max_concurrency=2):
+            searchers = [self.make_searcher(), self.make_searcher()]
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = list(executor.map(
+                    lambda pair: searchers[pair[0] % 2].call_perplexity_api(pair[1]), enumerate(prompts)
+                ))
+        self.assertEqual(results, prompts)
+        self.assertEqual(self.peak, 2)
+
+    def test_search_many_keeps_input_order_with_per_item_errors(self):
+        def broken():
+            raise RuntimeError("boom")
+
+        prompts = [f"prompt-{index}" for index in range(6)]
+        with mock.patch.dict(self.search_base.HTTP_CONFIG, max_concurrency=2):
+            searcher = self.make_searcher()
+            results = searcher.search_many(prompts + [{"prompt": "dict-prompt"}, broken], max_workers=8)
+        self.assertEqual(results[:7], prompts + ["dict-prompt"])
+        self.assertIsInstance(results[7], RuntimeError)
+        self.assertEqual(self.peak, 2)
+
+    def test_search_many_times_out_pending_items(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        calls = []
+
+        def slow(name):
+            calls.append(name)
+            release.wait(5)
+            return name
+
+        searcher = self.make_searcher()
+        results = searcher.search_many([lambda: "fast", lambda: slow("a"), lambda: slow("b")], timeout=0.3, max_workers=1)
+        self.assertEqual(results[0], "fast")
+        self.assertIsInstance(results[1], TimeoutError)
+        self.assertIsInstance(results[2], TimeoutError)
+        release.set()
+        time.sleep(0.1)
+        # 開始前にタイムアウトした要素は実行しない
+        self.assertEqual(calls, ["a"])
+
+
+# エントリポイント毎の import 時間の上限（マイクロ秒）。重い依存は初回使用時に読み込む
+IMPORT_BUDGETS_US = {
+    "post_base": 600_000,
+    "search_jp": 600_000,
+    "search_china": 600_000,
+    "search_crypto": 600_000,
+    "search_energy": 600_000,
+    "search_grobalmacro": 600_000,
+    "search_estate": 600_000,
+    "search_estate_value": 600_000,
+    "stock_search_and_post": 600_000,
+    "summary_gemini": 600_000,
+    "test_post_json": 600_000,
+    "publish_worker": 600_000,
+    "pipeline": 150_000,
+    "job_runner": 150_000,
+    "worker_daemon": 150_000,
+    "report_searcher": 600_000,
+    "job_queue": 150_000,
+    "scheduler": 150_000,
+}
+HEAVY_MODULES = ("yfinance", "pandas", "bs4", "markdown", "google.generativeai")
+
+
+@needs_http
+class StockDetailsTest(unittest.TestCase):
+    def setUp(self):
+        import stock_search_and_post
+
+        self.module = stock_search_and_post
+        self.tmp = tempfile.TemporaryDirectory()
+        self.journal = RunJournal(os.path.join(self.tmp.name, "run.json"))
+        self.searcher = stock_search_and_post.StockSearcherPosterFull()
+        self.searcher.get_stock_data_from_yfinance = lambda ticker_code: {"株価": {"現在値": 100}}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_categories_merge_in_fixed_order(self):
+        categories = self.module.CATEGORIES_TO_SEARCH
+
+        def search_group(journal, stage_prefix, stock_name, ticker_code, group):
+            # 後のカテゴリほど先に完了する
+            time.sleep(0.05 * (len(categories) - categories.index(group[0])))
+            return {group[0]: {"category": group[0]}}
+
+        self.searcher._search_group = search_group
+        yfinance_data, details = self.searcher._fetch_details(self.journal, "トヨタ", "7203")
+        self.assertEqual(yfinance_data, {"株価": {"現在値": 100}})
+        self.assertEqual(list(details), categories)
+
+    def test_timeout_drops_pending_calls(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        calls = []
+
+        def search_group(journal, stage_prefix, stock_name, ticker_code, group):
+            calls.append(group[0])
+            if group[0] != "basic_info":
+                release.wait(5)
+            return {group[0]: {"category": group[0]}}
+
+        self.searcher._search_group = search_group
+        # 2スレッド: yfinance・basic_info の後は2グループが止まり、残り2グループは開始前にタイムアウト
+        with mock.patch.dict(self.module.HTTP_CONFIG, {"max_concurrency": 1}), \
+                mock.patch.object(self.module, "DETAIL_TIMEOUT", 0.5), \
+                self.assertLogs(level="WARNING") as logs:
+            yfinance_data, details = self.searcher._fetch_details(self.journal, "トヨタ", "7203")
+        self.assertEqual(list(details), ["basic_info"])
+        self.assertTrue(yfinance_data)
+        self.assertTrue(any("2件を破棄" in line for line in logs.output))
+        release.set()
+        time.sleep(0.1)
+        self.assertEqual(calls, ["basic_info", "business_info", "financial_info"])
+
+    def test_top_stocks_skip_excluded_duplicates_and_invalid_codes(self):
+        prompts = []
+
+        def call(prompt, domain_filter, recency_days, keys=()):
+            prompts.append(prompt)
+            return {"銘柄": [
+                {"法人名": "トヨタ", "証券コード": "7203"},
+                {"法人名": "ソニー", "証券コード": 6758},
+                {"法人名": "トヨタ", "証券コード": "7203"},
+                {"法人名": "除外", "証券コード": "9984"},
+                {"法人名": "不正", "証券コード": "12345"},
+                "不正",
+                {"法人名": "任天堂", "証券コード": "7974"},
+                {"法人名": "キーエンス", "証券コード": "6861"},
+            ]}
+
+        self.searcher.excluded_codes = {"9984"}
+        self.searcher._call_perplexity_api = call
+        stocks = self.searcher.find_top_rising_stocks(3)
+        self.assertEqual([stock["証券コード"] for stock in stocks], ["7203", "6758", "7974"])
+        self.assertIn("[9984]", prompts[0])
+        self.assertEqual(self.searcher.find_top_rising_stocks(2)[-1]["法人名"], "ソニー")
+
+    def test_top_n_resumes_per_stock_and_restart_clears(self):
+        stocks = [{"法人名": "トヨタ", "証券コード": "7203"}, {"法人名": "ソニー", "証券コード": "6758"}]
+        finds, searches = [], []
+        failing = {"6758"}
+
+        def search(stock_name, ticker_code, category):
+            searches.append((ticker_code, category))
+            return None if ticker_code in failing and category == "basic_info" else {"category": category}
+
+        self.searcher.find_top_rising_stocks = lambda count: finds.append(count) or stocks
+        self.searcher.search_detailed_info_by_category = search
+        self.searcher.run_id = "run-a"
+        with mock.patch.dict(self.module.JOURNAL_CONFIG, {"dir": self.tmp.name}), \
+                mock.patch.object(self.module, "OUTPUT_DIR", self.tmp.name):
+            self.assertTrue(self.searcher.execute_top_n(2, digest=False))
+            self.assertEqual(len(searches), 2 * len(self.module.CATEGORIES_TO_SEARCH))
+            # 再実行: 銘柄の特定と完了済みのカテゴリは検索しない
+            failing.clear()
+            searches.clear()
+            self.assertTrue(self.searcher.execute_top_n(2, digest=False))
+            self.assertEqual((finds, searches), ([2], [("6758", "basic_info")]))
+            # restart: ジャーナルを破棄して最初から
+            searches.clear()
+            self.assertTrue(self.searcher.execute_top_n(2, digest=False, restart=True))
+            self.assertEqual(finds, [2, 2])
+            self.assertEqual(len(searches), 2 * len(self.module.CATEGORIES_TO_SEARCH))
+
+    def test_over_budget_sweep_shard_is_deferred_not_dead(self):
+        runs = []
+
+        def check_budget(searcher):
+            runs.append((searcher.run_id, searcher.budget_limits))
+            return False
+
+        queue = SQLiteJobQueue(os.path.join(self.tmp.name, "jobs.db"), max_attempts=1, retry_delay=0)
+        enqueue_sweep(queue, [[{"法人名": "トヨタ", "証券コード": "7203"}]], "sweep-2025-03-31")
+        # 日付を跨いで処理しても投入した巡回の予算で判定する
+        with mock.patch.dict(self.module.JOURNAL_CONFIG, {"dir": self.tmp.name}), \
+                mock.patch.dict(os.environ, {"GENNOTE_RUN_ID": "2025-04-01"}), \
+                mock.patch.object(self.module.StockSearcherPosterFull, "_readmit_budget", autospec=True,
+                                  side_effect=check_budget):
+            JobWorker(queue, worker_id="node").drain()
+        # 日次バッチと別枠の予算で判定し、超過しても試行回数を使い切らない
+        self.assertEqual(runs, [("sweep-2025-03-31", self.module.SWEEP_CONFIG["budget"])])
+        self.assertEqual(queue.counts(), {job_queue.PENDING: 1})
+
+    def test_sweep_shard_runs_full_model_until_its_own_budget_is_spent(self):
+        from config import BASE_CONFIG, BUDGET_CONFIG
+        from search_base import SearchBase
+
+        run_id = "sweep-2025-03-31"
+        self.addCleanup(SearchBase._budgets.pop, run_id, None)
+        tokens_per_stock = len(self.module.CATEGORY_GROUPS) * BUDGET_CONFIG["estimated_tokens_per_call"]
+        models = []
+
+        def fetch_details(journal, stock_name, ticker_code, stage_prefix=""):
+            models.append(self.searcher.model)
+            self.searcher._consume_budget({"prompt_tokens": tokens_per_stock})
+            return {}, {"basic_info": {"category": "basic_info"}}
+
+        self.searcher._fetch_details = fetch_details
+        stocks = [{"法人名": f"銘柄{code}", "証券コード": code} for code in ("1301", "1302", "1303", "1304")]
+        budget = {"token_budget": tokens_per_stock * 3.5, "cost_budget": 0, "time_budget": 0, "reserve": {}}
+        with mock.patch.dict(BUDGET_CONFIG, {"db_path": os.path.join(self.tmp.name, "budget.db")}), \
+                mock.patch.dict(self.module.SWEEP_CONFIG, {"budget": budget}), \
+                mock.patch.dict(self.module.JOURNAL_CONFIG, {"dir": self.tmp.name}), \
+                mock.patch.object(self.module, "OUTPUT_DIR", self.tmp.name):
+            with self.assertRaises(job_queue.JobDeferred):
+                self.searcher.execute_sweep_shard(f"{run_id}:0000", stocks)
+        # 4銘柄目の見積りで上限を超えるまでは劣化させずに実行する
+        self.assertEqual(models, [BASE_CONFIG["model"]] * 3)
+
+
+@needs_http
+class ImportTimeTest(unittest.TestCase):
+    def import_times(self, module):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=SCRIPTS_DIR, capture_output=True, text=True, timeout=60,
+        )
+        self.assertEqual(completed.returncode, 0, completed.stderr[-2000:])
+        times = {}
+        for line in completed.stderr.splitlines():
+            parts = line.split("|")
+            if len(parts) == 3 and parts[1].strip().isdigit():
+                times[parts[2].strip()] = int(parts[1])
+        return times
+
+    def test_entry_points_stay_within_budget(self):
+        for module, budget in IMPORT_BUDGETS_US.items():
+            with self.subTest(module=module):
+                times = self.import_times(module)
+                loaded = [name for name in HEAVY_MODULES if name in times]
+                self.assertEqual(loaded, [], f"{module} が重い依存を読み込んでいます")
+                self.assertLessEqual(times[module], budget)
+
+
+if __name__ == "__main__":
+    unittest.main()